@@ -0,0 +1,156 @@
+# Calendar Aggregation Engine
+# Ice measure analysis tools
+
+# This module reduces per-timestep series to per-day, per-month and time-of-day statistics with grouped NumPy
+# reductions over the calendar arrays of a timeindex.TimeIndex (dd.time), so any run and any timestep length is
+# handled the same way. Groups are integer label arrays; every reduction takes an optional boolean mask selecting the
+# timesteps to include.
+#
+#   d = daily(cal, kw)			# per day: max, argmax (timestep index), tod [hr], sum, mean, count
+#   m = monthly(cal, kw)		# per month (Jan = 0), same fields
+#   p = average_day(cal, kw, cal.weekday_mask())		# (12, 24) month x hour mean profile
+#   c = profile_cube(cal, kw, [wkdy, ~wkdy, week_mask(cal)])	# (12, 3, 24 * ts_per_hr) month x day type x tod
+#
+# Empty groups return NaN (argmax -1) so partial-year and DR-month runs keep a fixed month axis.
+
+import numpy as np
+
+
+def group_count(groups, n_groups, mask = None):
+
+    if mask is not None:
+        groups = groups[mask]
+    return np.bincount(groups, minlength = n_groups)
+
+
+def group_sum(values, groups, n_groups, mask = None):
+
+    values = np.asarray(values, dtype = np.float64)
+    if mask is not None:
+        values, groups = values[mask], groups[mask]
+    return np.bincount(groups, weights = values, minlength = n_groups)
+
+
+def group_mean(values, groups, n_groups, mask = None):
+
+    count = group_count(groups, n_groups, mask)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return np.where(count > 0, group_sum(values, groups, n_groups, mask) / count, np.nan)
+
+
+def group_max(values, groups, n_groups, mask = None):
+
+    # Max and first argmax (index into values) per group
+    return group_extreme(np.maximum, values, groups, n_groups, mask)
+
+
+def group_min(values, groups, n_groups, mask = None):
+
+    # Min and first argmin (index into values) per group
+    return group_extreme(np.minimum, values, groups, n_groups, mask)
+
+
+def group_extreme(ufunc, values, groups, n_groups, mask = None):
+
+    values = np.asarray(values, dtype = np.float64)
+    idx = np.arange(len(values))
+    if mask is not None:
+        values, groups, idx = values[mask], groups[mask], idx[mask]
+
+    start = -np.inf if ufunc is np.maximum else np.inf
+    ext = np.full(n_groups, start)
+    ufunc.at(ext, groups, values)
+
+    # First timestep of each group that reaches the extreme (idx is increasing)
+    arg = np.full(n_groups, -1)
+    hit = values == ext[groups]
+    g, first = np.unique(groups[hit], return_index = True)
+    arg[g] = idx[hit][first]
+
+    ext[arg < 0] = np.nan
+    return ext, arg
+
+
+def day_groups(cal):
+
+    # Consecutive day labels across month and year ends
+    day = cal.day_number()
+    return day, int(day[-1]) + 1 if len(day) else 0
+
+
+def month_groups(cal):
+
+    return (cal.month - 1).astype(np.intp), 12
+
+
+def hour_groups(cal, native = False):
+
+    # Time of day bins: hour (24) or the native timestep (24 * ts_per_hr)
+    if native:
+        return (cal.hour.astype(np.intp) * cal.ts_per_hr + cal.minute // cal.ts_minutes), 24 * cal.ts_per_hr
+    return cal.hour.astype(np.intp), 24
+
+
+def calendar_stats(cal, values, groups, n_groups, mask = None):
+
+    mx, arg = group_max(values, groups, n_groups, mask)
+    count = group_count(groups, n_groups, mask)
+    total = group_sum(values, groups, n_groups, mask)
+    safe = np.maximum(arg, 0)
+    tod = np.where(arg >= 0, cal.hour[safe] + cal.minute[safe] / 60, np.nan)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+    return {'max': mx, 'argmax': arg, 'tod': tod, 'sum': total, 'mean': mean, 'count': count}
+
+
+def daily(cal, values, mask = None):
+
+    groups, n = day_groups(cal)
+    return calendar_stats(cal, values, groups, n, mask)
+
+
+def monthly(cal, values, mask = None):
+
+    groups, n = month_groups(cal)
+    return calendar_stats(cal, values, groups, n, mask)
+
+
+def average_day(cal, values, mask = None, native = False):
+
+    # Month x time-of-day mean profile, NaN where a month has no selected timesteps
+    months, n_m = month_groups(cal)
+    tod, n_t = hour_groups(cal, native)
+    return group_mean(values, months * n_t + tod, n_m * n_t, mask).reshape(n_m, n_t)
+
+
+def profile_cube(cal, values, day_types, native = True):
+
+    # Month x day type x time-of-day mean profiles in one pass. day_types is a list of boolean masks, each either per
+    # timestep or per day (length = number of days, e.g. billing days); masks may overlap. native = False bins by hour.
+    values = np.asarray(values, dtype = np.float64)
+    days, n_days = day_groups(cal)
+    masks = np.array([np.asarray(m, dtype = bool)[days] if len(m) == n_days and n_days != len(values)
+                      else np.asarray(m, dtype = bool) for m in day_types]).reshape(len(day_types), len(values))
+
+    months, n_m = month_groups(cal)
+    tod, n_t = hour_groups(cal, native)
+    n_d = len(masks)
+
+    d, t = np.nonzero(masks)
+    labels = (months[t] * n_d + d) * n_t + tod[t]
+    size = n_m * n_d * n_t
+    count = np.bincount(labels, minlength = size)
+    total = np.bincount(labels, weights = values[t], minlength = size)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return np.where(count > 0, total / count, np.nan).reshape(n_m, n_d, n_t)
+
+
+def week_mask(cal, start = (0, 7), end = (5, 7)):
+
+    # Timesteps from (day of week, hour) start up to end, e.g. the default Monday 7am to Saturday 7am week
+    pos = cal.dow.astype(np.int32) * 24 + cal.hour
+    a = start[0] * 24 + start[1]
+    b = end[0] * 24 + end[1]
+    if a <= b:
+        return (pos >= a) & (pos < b)
+    return (pos >= a) | (pos < b)
@@ -0,0 +1,71 @@
+# Chiller Runtime and COP Statistics
+# Ice measure analysis tools
+
+# This module reports chiller runtime, cooling and electricity totals, energy weighted COP and part load ratio (PLR)
+# histograms for any number of period masks in one call. Series may be one chiller (timesteps,) or every chiller of a
+# plant stacked as (chillers, timesteps); all masks and chillers are reduced together with matrix products and one
+# bincount per mask.
+#
+#   st = chiller_stats(elec_kw, cool_kw, ts_per_hr, {'year': None, 'occ': in_dchg & wkdy}, on = 7.0, capacity = 1600)
+#   st['occ']['cop'], st['occ']['runtime'], st['year']['cop_total'], st['year']['plr_hist']
+#
+# A chiller counts as running where its cooling rate is above on [kW]. Runtime [hr], PLR and cop use running timesteps
+# only; cooling and elec [kWh] are totals over the whole period, and cop_total = cooling / elec includes the standby
+# electricity of the timesteps the chiller is off.
+
+import numpy as np
+
+
+def chiller_stats(elec, cool, ts_per_hr, masks = None, on = 0.0, capacity = None, plr_bins = 10):
+
+    # elec: chiller electric power [kW], cool: evaporator cooling rate [kW], same shape
+    # masks: dict of name -> boolean timestep mask (None = every timestep)
+    # capacity: nominal cooling capacity [kW], scalar or one per chiller - enables the PLR histogram
+    elec = np.asarray(elec, dtype = np.float64)
+    cool = np.asarray(cool, dtype = np.float64)
+    single = elec.ndim == 1
+    elec = np.atleast_2d(elec)
+    cool = np.atleast_2d(cool)
+    C, n = cool.shape
+
+    if masks is None:
+        masks = {'all': None}
+    names = list(masks.keys())
+    M = np.array([np.ones(n, dtype = bool) if m is None else np.asarray(m, dtype = bool) for m in masks.values()])
+    Mf = M.astype(np.float64)
+
+    running = cool > on
+    run_f = running.astype(np.float64)
+
+    # (chillers, masks) reductions
+    runtime = run_f @ Mf.T / ts_per_hr
+    cooling = cool @ Mf.T / ts_per_hr
+    energy = elec @ Mf.T / ts_per_hr
+    run_cool = (cool * run_f) @ Mf.T
+    run_elec = (elec * run_f) @ Mf.T
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        cop = np.where(run_elec > 0, run_cool / run_elec, np.nan)
+        cop_total = np.where(energy > 0, cooling / energy, np.nan)
+
+    # Part load ratio histogram of the running timesteps, bins of equal width from 0 to 1 (PLR > 1 in the last bin)
+    hist = None
+    edges = np.linspace(0, 1, plr_bins + 1)
+    if capacity is not None:
+        cap = np.broadcast_to(np.asarray(capacity, dtype = np.float64), (C,))
+        plr = cool / cap[:, None]
+        bins = np.clip((plr * plr_bins).astype(np.intp), 0, plr_bins - 1)
+        hist = np.zeros((C, len(names), plr_bins))
+        for k in range(len(names)):
+            c, t = np.nonzero(running & M[k])
+            hist[:, k] = np.bincount(c * plr_bins + bins[c, t], minlength = C * plr_bins).reshape(C, plr_bins) \
+                / ts_per_hr
+
+    out = {}
+    for k, name in enumerate(names):
+        res = {'runtime': runtime[:, k], 'cooling': cooling[:, k], 'elec': energy[:, k], 'cop': cop[:, k],
+               'cop_total': cop_total[:, k],
+               'plr_hist': None if hist is None else hist[:, k], 'plr_edges': edges}
+        if single:
+            res = {key: (v if key == 'plr_edges' or v is None else v[0]) for key, v in res.items()}
+        out[name] = res
+    return out
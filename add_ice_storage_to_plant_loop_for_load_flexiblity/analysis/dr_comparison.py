@@ -12,13 +12,19 @@
 import os
 import sys
 import calendar
-import esoreader
 import pandas as pd
 import numpy as np
-import plotly
 import plotly.graph_objs as go
 from plotly import subplots
 
+# External Functions
+from esocache import load_eso
+import plotting
+import results
+import multirun
+from rundata import RunData
+import seriesstore
+
 # [Name of .eso file, Ice Capacity [ton-hrs]]
 runs = [#['SSB15_Sep',0,'Baseline'],
 		#['SS47L15_SEP',2000,'Standard Operation'],
@@ -38,25 +44,30 @@ f6 = False		#Pumps and Fans ** Turn on F2 for full plot **
 f7 = False		#Max Demand Curves
 f8 = False		#Average Daily Electric Demand Profiles
 f9 = False		#Runtime and Average COP Values
-
-# Define Run Period - Must match esos
+plot_points = 5000		#Max Points per Plotted Trace, LTTB Downsampled (None = Full Resolution)
+gl_points = 10000		#Traces Above This Many Points are Drawn with WebGL
+result_format = 'csv'	#Result Files: 'csv' (text) or 'npy' (binary), each with a .json manifest (results.py)
+processes = None		#Worker Processes for the Runs (None = one per CPU, 1 = serial)
+run_cache = True		#Reuse Per-Run Results Until the ESO or Analysis Code Changes (runcache/)
+shared_store = None		#Shared-Memory Series Store Name (seriesstore.py) - None = Load Privately
+
+# Define Run Period - Must match esos (timestep index is read from the eso time records)
+year = 2006
 run = [pd.datetime(2006,9,1,0), pd.datetime(2006,9,30,23,59)]
 
 # Define Ouput Windows
 out19 = pd.date_range(start = pd.datetime(2006,9,19,0), end = pd.datetime(2006,9,20,11,59), freq = '15min')
 out21 = pd.date_range(start = pd.datetime(2006,9,21,0), end = pd.datetime(2006,9,22,11,59), freq = '15min')
 
-# Define Timestep
-ts_per_hr = 4
+# Shared Series Store - every analysis run with the same store name reuses one in-memory copy of the ESO columns
+loader = seriesstore.SeriesStore.open(shared_store).load_eso if shared_store else load_eso
 
 # X Axis Values
 x_m = ['September']
 x_dy = pd.date_range(start = run[0], end = run[1], freq = '1D')
 x_hr = pd.date_range(start = run[0], end = run[1], freq = '1H')
-x_ts = pd.date_range(start = run[0], end = run[1], freq = '15min')	# Must update if using diff. timestep!
 x_ld_dy = np.linspace(1,31,31)
 x_ld_hr = np.linspace(1,31*24,31*24)
-x_ld_ts = np.linspace(1,31*24*ts_per_hr,31*24*ts_per_hr)
 x_24 = np.linspace(0,23,24)
 
 # Set Discharge, Charge, and On-Peak Windows
@@ -114,15 +125,44 @@ m_max_kw = []
 avg_sep = []
 avg_may = []
 avg_feb = []
+dr_out = {}
 ## END Set Up Iterations and Define Empty Lists-------------------------------------------------------------------------
 
 ## Perform Iterations---------------------------------------------------------------------------------------------------
-for i in range(len(runs)):
+# Body for run i, executed for every run by the multi-run driver below
+def dr_run(i):
+
 	print(runs[i][0])
 	print(' Loading ESO Data...')
-	dd, data = esoreader.read(paths[i])
+
+	# Variables Required from the ESO for the Selected Figures - (Frequency, Key, Variable)
+	selectors = []
+	if f1:
+		selectors.append(('TimeStep', chill_name, 'Chiller Evaporator Cooling Rate'))
+		if runs[i][1] != 0:
+			selectors.append(('TimeStep', ice_name, 'Ice Thermal Storage Cooling Discharge Rate'))
+	if f2:
+		selectors += [('TimeStep', None, 'Electricity:Facility'),
+					('TimeStep', chill_name, 'Chiller Electric Energy')]
+	if f3 and runs[i][1] != 0:
+		selectors.append(('TimeStep', ice_name, 'Ice Thermal Storage End Fraction'))
+	if f5:
+		selectors += [('TimeStep', 'CHILLED WATER LOOP SUPPLY INLET NODE', 'System Node Temperature'),
+					('TimeStep', 'CHILLED WATER LOOP SUPPLY OUTLET NODE', 'System Node Temperature')]
+	if f6:
+		selectors += [('TimeStep', None, 'Fans:Electricity'),
+					('TimeStep', None, 'Pumps:Electricity')]
+
+	dd, data = loader(paths[i], selectors)
+	run_data = RunData(dd, data)
 	print(' Data Load Complete.\n Performing Calculations...')
 
+	# Timestep Index from the ESO Time Records
+	cal = dd.time
+	ts_per_hr = cal.ts_per_hr
+	x_ts = cal.timestamps(year)
+	x_ld_ts = np.linspace(1, len(x_ts), len(x_ts))
+
 	# Reset Select Variables
 	pl_dchg = []
 	pl_chg = []
@@ -135,8 +175,7 @@ for i in range(len(runs)):
 		if runs[i][1] != 0:
 			# Ice Cooling Rate [W -> tons]
 			key = dd.index['TimeStep', ice_name, 'Ice Thermal Storage Cooling Discharge Rate']
-			vals = data[key]
-			vals = [k * 0.0002843451 for k in vals]		#tons
+			vals = run_data.get(key, 'tons')
 
 			# Ice Cooling Rate Line Plot
 			ice_cool.append(go.Scatter(x = x_ts, y = vals,
@@ -153,9 +192,8 @@ for i in range(len(runs)):
 
 		# Chiller Cooling Rate [W -> Tons]
 		key =  dd.index['TimeStep', chill_name, 'Chiller Evaporator Cooling Rate']
-		vals = data[key]
-		cooling_total = sum(vals) / 1000	# kW
-		vals = [k * 0.0002843451 for k in vals]	# tons
+		cooling_total = sum(run_data.get(key)) / 1000	# kW
+		vals = run_data.get(key, 'tons')
 
 		# Chiller Cooling Rate Line Plot
 		ch_cool.append(go.Scatter(x = x_ts, y = vals,
@@ -177,7 +215,7 @@ for i in range(len(runs)):
 	if f2:
 		# Power - Facility [J -> kW] (timestep data)
 		key = dd.index['TimeStep', None, 'Electricity:Facility']
-		kw_f = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+		kw_f = run_data.get(key, 'kW')
 		elec.append(go.Scatter(x = x_ts, y = kw_f,
 							   name = runs[i][2] + ' Facility Electricity Demand [kW]',
 							   legendgroup = str(i),
@@ -186,7 +224,7 @@ for i in range(len(runs)):
 
 	    # Electricity - Chillers [J -> kW]
 		key = dd.index['TimeStep', chill_name, 'Chiller Electric Energy']
-		kw_c = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+		kw_c = run_data.get(key, 'kW')
 		ch_elec.append(go.Scatter(x = x_ts, y = kw_c,
 								  name = runs[i][2] + ' Chiller Demand [kW]',
 								  legendgroup = str(i),
@@ -196,6 +234,10 @@ for i in range(len(runs)):
 		# Total Facility Electricity for Run Period
 		print(' Run Period Facility Electricity: ', (sum(kw_f) / ts_per_hr), ' kWh.')
 
+		# Facility Demand Over the 9/21 Output Window
+		out = np.flatnonzero(x_ts.isin(out21))
+		dr_out[runs[i][0]] = {'hour': cal.hour[out], 'minute': cal.minute[out], 'facility_kw': np.asarray(kw_f)[out]}
+
 		# Total Chiller Electricity for Run Period
 		elec_chiller = sum(kw_c)
 		print(' Run Period Chiller Electricity [kWh]: ', elec_chiller / ts_per_hr)
@@ -246,7 +288,7 @@ for i in range(len(runs)):
 	if f6:
 		# Power - Fans [J -> kW] (timestep data)
 		key = dd.index['TimeStep', None, 'Fans:Electricity']
-		kw_fans = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+		kw_fans = run_data.get(key, 'kW')
 		fans.append(go.Scatter(x = x_ts, y = kw_fans,
 								name = runs[i][2] + ' Total Fan Power [kWe]',
 								legendgroup = str(i),
@@ -254,23 +296,29 @@ for i in range(len(runs)):
 
 		# Power - Pumps [J -> kW] (timestep data)
 		key = dd.index['TimeStep', None, 'Pumps:Electricity']
-		kw_pumps = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+		kw_pumps = run_data.get(key, 'kW')
 		pumps.append(go.Scatter(x = x_ts, y = kw_pumps,
 								name = runs[i][2] + ' Total Pump Power [kWe]',
 								legendgroup = str(i),
 								hoverlabel = dict(namelength = -1)))
 	# END F6: Pumps and Fans=========================
 
+# Process the Runs in a Process Pool (multirun.py) - Traces and Results are Merged Back in Run Order
+run_outputs = ['elec', 'pl_elec', 'pumps', 'fans', 'b_elec', 'ch_elec', 'ch_cool', 'ice_cool', 'ice_chrg', 'ice_soc',
+			   'ch_sp', 'ice_sp', 'supply_temp', 'return_temp', 'ch_a', 'ice_a', 'chg_a', 'd_soc_avail', 'ld_chill',
+			   'ld_p', 'ld_f', 'ld_p_c', 'ld_p_d', 'ld_p_o', 'ld_p_p', 'd_max_kw', 'd_tod_kw', 'm_max_kw', 'avg_sep',
+			   'avg_may', 'avg_feb', 'dr_out']
+multirun.run_all(dr_run, range(len(runs)), {name: globals()[name] for name in run_outputs},
+				 inputs = lambda i: [paths[i]], labels = lambda i: runs[i][0], processes = processes,
+				 cache_dir = filepath + '/runcache' if run_cache else None,
+				 max_points = plot_points, gl_points = gl_points)
+## END Perform Iterations-----------------------------------------------------------------------------------------------
 
-
-print("Writing Elec Output 9/21 - Transfer to Excel")
 # Output (last run) to Data File
-file1 = open('dr_kwe.txt', 'w')
-file1.write(str(runs[0]) + '\n')
-for i in range(len(kw_f)):
-	if x_ts[i] in out21:
-		file1.write(str(x_ts[i].hour) + ':' + str(x_ts[i].minute) + '  ' + str(kw_f[i]) + '\n')
-file1.close
+if runs[-1][0] in dr_out:
+	print("Writing Elec Output 9/21 - Transfer to Excel")
+	results.write_columns('dr_kwe', dr_out[runs[-1][0]], units = {'hour': 'hr', 'minute': 'min', 'facility_kw': 'kW'},
+						  fmt = result_format, meta = {'run': runs[-1][0]})
 
 
 ## Create Figures-------------------------------------------------------------------------------------------------------
@@ -298,7 +346,7 @@ if f1:
 		fig.append_trace(ch_a[i],1,1)
 
 	fig['layout'].update(template = standard_template)
-	plotly.offline.plot(fig, filename = 'dr_rates_soc.html')
+	plotting.plot(fig, filename = 'dr_rates_soc.html', max_points = plot_points, gl_points = gl_points)
 # END F1: Cooling Rates==========================
 
 # F2: Electricity Profiles=======================
@@ -314,7 +362,7 @@ if f2:
 
 	#fig['layout'].update(title = title_text)
 	fig['layout'].update(template = standard_template)
-	plotly.offline.plot(fig, filename = 'dr_elec.html')
+	plotting.plot(fig, filename = 'dr_elec.html', max_points = plot_points, gl_points = gl_points)
 # END F2: Electricity Profiles===================
 
 # F3: Ice Usage==================================
@@ -330,7 +378,7 @@ if f3:
 			fig.append_trace(ch_elec[i],2,1)
 
 	fig['layout'].update(template = standard_template)
-	plotly.offline.plot(fig, filename = 'dr_soc.html')
+	plotting.plot(fig, filename = 'dr_soc.html', max_points = plot_points, gl_points = gl_points)
 # END F3: Ice Usage==============================
 
 
@@ -346,7 +394,7 @@ if f5:
 		fig.append_trace(return_temp[i],1,1)
 
 	fig['layout'].update(template = standard_template)
-	plotly.offline.plot(fig, filename = 'dr_temps.html')
+	plotting.plot(fig, filename = 'dr_temps.html', max_points = plot_points, gl_points = gl_points)
 # END F5: Return and Supply Water Temps==========
 
 # F6: Pumps and Fans=============================
@@ -365,7 +413,7 @@ if f6:
 			fig.append_trace(ch_elec[i],3,1)
 
 	fig['layout'].update(template = standard_template, height = 1000)
-	plotly.offline.plot(fig, filename = 'pumps_fans.html')
+	plotting.plot(fig, filename = 'pumps_fans.html', max_points = plot_points, gl_points = gl_points)
 # END F6: Pumps and Fans=========================
 
 ## END Create Figures---------------------------------------------------------------------------------------------------
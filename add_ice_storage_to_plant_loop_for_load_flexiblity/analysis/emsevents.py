@@ -0,0 +1,100 @@
+# EMS Limiter Events
+# Ice measure analysis tools
+
+# This module turns the cumulative 'Chiller Limit Counter' EMS output written by measure.rb into limiter events with
+# a difference / run-length encoding of the counter, for one run or a (runs, timesteps) stack at once. The counter
+# only grows while the Chiller_Limiter program caps the chiller leaving water setpoint, so a timestep is limited when
+# the counter increases over it; consecutive limited timesteps form one event.
+#
+#   flag = limiter_flags(counter)						# 0/1 per timestep, as plotted by ice_comparison
+#   ev = limiter_events(counter, ch_kw, ts_per_hr, limit = lim_kw)	# one record per event
+#   ev['start'], ev['end'] (exclusive), ev['duration'] [hr], ev['peak'], ev['peak_idx'], ev['limit']
+#   s = event_stats(cal, ev)							# per-day and per-month event counts, hours and peaks
+#
+# The series passed as values (e.g. chiller cooling or electric rate [kW]) gives the event peak; limit (the 'Chiller
+# Limited Capacity' EMS output, same units) is read at the peak timestep. Events are counted on the day/month they
+# start. The 'run' field numbers the rows of a stacked (runs, timesteps) counter (0 for a single run); pass
+# event_stats(cal, ev, runs = R) for statistics with a leading run axis.
+
+import numpy as np
+
+from calstats import day_groups, month_groups, group_count, group_sum, group_max
+
+EVENT_DTYPE = [('run', np.int32), ('start', np.int64), ('end', np.int64), ('steps', np.int64),
+               ('duration', np.float64), ('peak', np.float64), ('peak_idx', np.int64), ('limit', np.float64)]
+
+
+def limiter_flags(counter):
+
+    # Timestep t is limited when the counter grew during t (the counter is reset to 0 at the start of the run)
+    counter = np.asarray(counter, dtype = np.float64)
+    return (np.diff(counter, axis = -1, prepend = 0) > 0).astype(np.int8)
+
+
+def run_edges(flags):
+
+    # Start and end (exclusive) of each run of nonzero flags along the last axis -> (rows, starts, ends)
+    flags = np.atleast_2d(np.asarray(flags, dtype = bool))
+    pad = np.zeros((len(flags), 1), dtype = bool)
+    edge = np.diff(np.hstack([pad, flags, pad]).astype(np.int8), axis = 1)
+    rows, starts = np.nonzero(edge == 1)
+    _, ends = np.nonzero(edge == -1)
+    return rows, starts, ends
+
+
+def limiter_events(counter, values = None, ts_per_hr = 4, limit = None):
+
+    counter = np.atleast_2d(np.asarray(counter, dtype = np.float64))
+    R, n = counter.shape
+    flags = limiter_flags(counter).astype(bool)
+    rows, starts, ends = run_edges(flags)
+
+    ev = np.zeros(len(starts), dtype = EVENT_DTYPE)
+    ev['run'] = rows
+    ev['start'] = starts
+    ev['end'] = ends
+    ev['steps'] = ends - starts
+    ev['duration'] = ev['steps'] / ts_per_hr
+    ev['peak'] = np.nan
+    ev['peak_idx'] = -1
+    ev['limit'] = np.nan
+
+    if values is not None and len(ev):
+        # Label every limited timestep with its event and take a grouped max over the flattened runs
+        values = np.broadcast_to(np.asarray(values, dtype = np.float64), (R, n)).ravel()
+        idx = np.flatnonzero(flags.ravel())
+        first = np.zeros(R * n, dtype = np.int64)
+        first[rows * n + starts] = 1
+        labels = np.cumsum(first)[idx] - 1
+        peak, arg = group_max(values[idx], labels, len(ev))
+        flat = idx[arg]
+        ev['peak'] = peak
+        ev['peak_idx'] = flat % n
+        if limit is not None:
+            ev['limit'] = np.broadcast_to(np.asarray(limit, dtype = np.float64), (R, n)).ravel()[flat]
+    return ev
+
+
+def event_stats(cal, events, runs = None):
+
+    # Per-day and per-month event count, limited hours, longest event [hr] and peak, grouped by the event start.
+    # runs = number of stacked runs (leading axis on every statistic), None for a single run
+    multi = runs is not None
+    runs = runs if multi else 1
+    run = events['run']
+
+    stats = {}
+    for period, (groups, n_g) in (('daily', day_groups(cal)), ('monthly', month_groups(cal))):
+        labels = run.astype(np.intp) * n_g + groups[events['start']]
+        size = runs * n_g
+        dur, _ = group_max(events['duration'], labels, size)
+        peak, _ = group_max(events['peak'], labels, size)
+        s = {'events': group_count(labels, size),
+             'hours': group_sum(events['duration'], labels, size),
+             'longest': np.nan_to_num(dur),
+             'peak': peak}
+        s = {k: v.reshape(runs, n_g) for k, v in s.items()}
+        if not multi:
+            s = {k: v[0] for k, v in s.items()}
+        stats[period] = s
+    return stats
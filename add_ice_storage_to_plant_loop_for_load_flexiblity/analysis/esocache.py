@@ -0,0 +1,177 @@
+# Parsed ESO Cache
+# Ice measure analysis tools
+
+# This module keeps parsed ESO columns on disk so repeated runs of the analysis scripts skip the text parse.
+# Each ESO gets a folder under esocache/ (next to esos/) holding a manifest.json with the file fingerprint and
+# data dictionary, plus one .npy file per report code. The folder is named after the file name, extension included,
+# and a short hash of its directory, so eplusout.eso and eplusout.mtr, or same-named runs in different folders,
+# never share an entry. Cached columns are opened memory-mapped, so a load costs
+# a few milliseconds and only the pages of the variables actually used are read from disk.
+#
+# The fingerprint is the file size, mtime and a blake2b hash of the contents. A size/mtime match is trusted
+# directly. On an mtime change the hash is recomputed; if the contents are unchanged the entry is kept, otherwise
+# the whole entry is discarded and rebuilt. Variables missing from the cache are parsed and added on request.
+# The time records behind dd.time are stored as time.npy and the TimeIndex is rebuilt from them on load.
+#
+#   dd, data = load_eso(path, selectors)		# drop-in for read_eso(), processes = N parses misses in parallel
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+from esoread import DataDictionary, read_eso, select_codes
+from timeindex import TimeIndex
+
+CACHE_VERSION = 2
+
+
+def load_eso(path, selectors = None, cache_dir = None, processes = 1):
+
+    path = os.path.abspath(path)
+    entry = cache_entry(path, cache_dir)
+    manifest = check_manifest(path, entry)
+
+    if manifest is None:
+        # Nothing usable cached - parse the requested variables and start a new entry
+        dd, data = read_eso(path, selectors, processes)
+        manifest = new_manifest(path, dd)
+        store_columns(entry, manifest, data)
+        store_time(entry, manifest, dd.time)
+        return dd, open_columns(entry, list(data.keys()))
+
+    dd = manifest_dd(manifest, entry)
+    codes = select_codes(dd, selectors)
+    missing = [c for c in codes if str(c) not in manifest['columns']]
+
+    if missing:
+        # Parse only the variables that are not cached yet
+        parsed, data = read_eso(path, [tuple(dd.variables[c][:3]) for c in missing], processes)
+        store_columns(entry, manifest, data)
+
+        # Keep the finest time index seen so far (TimeStep over Hourly)
+        if parsed.time is not None and (dd.time is None or dd.time.frequency != 'TimeStep'):
+            store_time(entry, manifest, parsed.time)
+            dd.time = parsed.time
+
+    return dd, open_columns(entry, codes)
+
+
+def cache_entry(path, cache_dir = None):
+
+    # Default location: <parent of esos>/esocache/<eso file name>-<directory hash>/
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.dirname(path)), 'esocache')
+    folder = hashlib.blake2b(os.path.dirname(path).encode(), digest_size = 4).hexdigest()
+    return os.path.join(cache_dir, f'{os.path.basename(path)}-{folder}')
+
+
+def clear_cache(path, cache_dir = None):
+
+    entry = cache_entry(os.path.abspath(path), cache_dir)
+    if os.path.isdir(entry):
+        shutil.rmtree(entry)
+
+
+def file_hash(path, block = 1 << 20):
+
+    h = hashlib.blake2b(digest_size = 20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def check_manifest(path, entry):
+
+    # Return the manifest if the cache entry still describes the file at path, otherwise drop the entry
+    manifest_path = os.path.join(entry, 'manifest.json')
+    if not os.path.isfile(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except ValueError:
+        manifest = {}
+
+    st = os.stat(path)
+    if manifest.get('version') == CACHE_VERSION and manifest.get('size') == st.st_size:
+        if manifest['mtime_ns'] == st.st_mtime_ns:
+            return manifest
+
+        # File touched - keep the entry only if the contents are identical
+        if manifest['hash'] == file_hash(path):
+            manifest['mtime_ns'] = st.st_mtime_ns
+            write_manifest(entry, manifest)
+            return manifest
+
+    shutil.rmtree(entry)
+    return None
+
+
+def new_manifest(path, dd):
+
+    st = os.stat(path)
+    return {'version': CACHE_VERSION,
+            'source': os.path.basename(path),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': file_hash(path),
+            'eso_version': dd.version,
+            'eso_timestamp': dd.timestamp,
+            'variables': {str(id): v for id, v in dd.variables.items()},
+            'columns': {},
+            'time': None}
+
+
+def manifest_dd(manifest, entry):
+
+    dd = DataDictionary(manifest['eso_version'], manifest['eso_timestamp'])
+    dd.variables = {int(id): v for id, v in manifest['variables'].items()}
+    dd.build_index()
+    dd.ids = set(dd.variables.keys())
+
+    if manifest.get('time'):
+        dd.time = TimeIndex(np.load(os.path.join(entry, 'time.npy')), manifest['time'])
+    return dd
+
+
+def write_manifest(entry, manifest):
+
+    # Write-then-rename so an interrupted run never leaves a half written manifest (temp names carry the pid, so
+    # processes filling the same entry at once never write into each other's files)
+    tmp = os.path.join(entry, f'manifest.json.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(entry, 'manifest.json'))
+
+
+def store_columns(entry, manifest, data):
+
+    os.makedirs(entry, exist_ok = True)
+    for code, col in data.items():
+        tmp = os.path.join(entry, f'{code}.{os.getpid()}.tmp.npy')
+        np.save(tmp, np.ascontiguousarray(col))
+        os.replace(tmp, os.path.join(entry, f'{code}.npy'))
+        manifest['columns'][str(code)] = [len(col), str(col.dtype)]
+    write_manifest(entry, manifest)
+
+
+def store_time(entry, manifest, time):
+
+    if time is None:
+        return
+    os.makedirs(entry, exist_ok = True)
+    tmp = os.path.join(entry, f'time.{os.getpid()}.tmp.npy')
+    np.save(tmp, time.records)
+    os.replace(tmp, os.path.join(entry, 'time.npy'))
+    manifest['time'] = time.frequency
+    write_manifest(entry, manifest)
+
+
+def open_columns(entry, codes):
+
+    # Read-only memory maps - no copy is made and pages load on first touch
+    return {c: np.load(os.path.join(entry, f'{c}.npy'), mmap_mode = 'r') for c in codes}
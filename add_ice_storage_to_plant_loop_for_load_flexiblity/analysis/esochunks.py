@@ -0,0 +1,340 @@
+# Out-of-Core Chunked Processing
+# Ice measure analysis tools
+
+# This module runs the analysis stack over ESOs too large to hold in memory (multi-year weather, 1-minute timesteps,
+# zone-level output) one block of timesteps at a time. read_chunks parses the selected variables of up to rows time
+# records per chunk, skipping every other line as esoread does, and array_chunks slices already loaded or esocache
+# memory-mapped columns the same way. The accumulators fold each chunk into partial aggregates that carry across chunk
+# boundaries (a day split between two chunks is still one day), so memory is bounded by the chunk size, the number of
+# days and the load duration merge blocks - not the run length.
+#
+#   day, month = CalendarStats('day'), CalendarStats('month')
+#   cube = ProfileCube(native = True)
+#   ld = DurationCurves(['all', 'dchg'])
+#   ice = DailyMinSOC(ice_cap, [[12, 18]])
+#   for chunk in read_chunks(path, selectors, rows = 35040):
+#       kw = chunk.kw(('TimeStep', None, 'Electricity:Facility'))		# J -> average kW over the timestep
+#       wkdy = chunk.cal.weekday_mask()
+#       day.update(chunk, kw)
+#       month.update(chunk, kw, mask = wkdy)
+#       cube.update(chunk, kw, [wkdy, ~wkdy])
+#       ld.update(chunk, kw, {'dchg': chunk.cal.hour_mask(12, 18) & wkdy})
+#       ice.update(chunk, chunk[('TimeStep', ice_name, 'Ice Thermal Storage End Fraction')])
+#   day.result(), month.result(), cube.result(), ld.result(points = 1000), ice.result()
+#   ld.close()		# removes the sorted runs spilled to disk
+#
+# Results are identical to calstats.daily / monthly / profile_cube / average_day, ldc.duration_curves and
+# icestats.daily_min_soc on the whole run: sums and counts are added in timestep order onto the running totals
+# (np.add.at), extremes keep the first timestep reaching them, and each duration curve is a block-wise merge of the
+# chunks' sorted values. Timestep indices (argmax, argmin) are positions in the whole run, day labels count from its
+# first day. Masks passed to update are per timestep of the chunk - index per-day masks with chunk.days first.
+
+import os
+import shutil
+import tempfile
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from esoread import read_data_dictionary, select_codes, index_codes, parse_data
+from timeindex import TimeIndex
+from calstats import group_max, month_groups, hour_groups
+import icestats
+
+
+class Chunk:
+
+    # One block of timesteps: start = index of its first timestep in the run, cal = TimeIndex of the block,
+    # days = day labels counted from the first day of the run, data = {report code: column}
+    def __init__(self, dd, start, cal, days, data):
+        self.dd = dd
+        self.start = start
+        self.cal = cal
+        self.days = days
+        self.data = data
+
+    def __len__(self):
+        return len(self.cal)
+
+    def __getitem__(self, key):
+        # Report code or (frequency, key, variable) selector
+        if isinstance(key, tuple):
+            key = self.dd.index[key]
+        return self.data[key]
+
+    def kw(self, key):
+        # Energy per timestep [J] -> average power [kW], as the scripts convert it
+        return self[key] * 2.77778e-7 * self.cal.ts_per_hr
+
+
+class LineBlocks:
+
+    # Data lines of an open eso in blocks of at most rows time records, each block starting on a time record
+    def __init__(self, eso, rows):
+        self.eso = eso
+        self.rows = rows
+        self.pending = None
+        self.done = False
+
+    def block(self):
+        n = 0
+        if self.pending is not None:
+            line, self.pending = self.pending, None
+            n = 1
+            yield line
+        for line in self.eso:
+            if line.startswith(b'2,'):
+                if n == self.rows:
+                    self.pending = line		# First line of the next block
+                    return
+                n += 1
+            elif line.startswith(b'End of Data'):
+                break
+            yield line
+        self.done = True
+
+
+def read_chunks(path, selectors = None, rows = 35040):
+
+    # Parse the eso a block at a time - only one chunk of the selected columns is in memory
+    with open(path, 'rb') as eso:
+        dd = read_data_dictionary(eso)
+        codes = select_codes(dd, selectors)
+        stamp_codes = index_codes(dd, codes)
+        if not stamp_codes:
+            raise ValueError('Chunked reads need at least one TimeStep or Hourly variable in the selection.')
+        frequency = dd.variables[stamp_codes[0]][0]
+
+        lines = LineBlocks(eso, rows)
+        start, day0 = 0, None
+        while not lines.done:
+            data, records = parse_data(lines.block(), codes, stamp_codes, capacity = rows)
+            if not len(records):
+                continue
+            cal = TimeIndex(records, frequency)
+            if day0 is None:
+                day0 = int(cal.day_of_sim[0])
+            yield Chunk(dd, start, cal, (cal.day_of_sim - day0).astype(np.int32), data)
+            start += len(cal)
+
+
+def array_chunks(dd, data, rows = 35040):
+
+    # Same chunks from loaded columns (e.g. esocache memory maps - only the pages of each slice are read)
+    cal = dd.time
+    day0 = int(cal.day_of_sim[0]) if len(cal) else 0
+    for start in range(0, len(cal), rows):
+        part = TimeIndex(cal.records[start:start + rows], cal.frequency)
+        yield Chunk(dd, start, part, (part.day_of_sim - day0).astype(np.int32),
+                    {c: col[start:start + rows] for c, col in data.items()})
+
+
+def grow(array, n, fill):
+
+    # Extend the last axis of a running per-day array to at least n entries
+    if array.shape[-1] >= n:
+        return array
+    extra = np.full(array.shape[:-1] + (max(n, 2 * array.shape[-1]) - array.shape[-1],), fill, dtype = array.dtype)
+    return np.concatenate((array, extra), axis = -1)
+
+
+class CalendarStats:
+
+    # Running calstats.daily (period = 'day') or calstats.monthly (period = 'month')
+    def __init__(self, period = 'day'):
+        if period not in ['day', 'month']:
+            raise ValueError(f"Calendar period must be 'day' or 'month', not '{period}'.")
+        self.period = period
+        self.n = 0 if period == 'day' else 12
+        size = 366 if period == 'day' else 12
+        self.max = np.full(size, -np.inf)
+        self.arg = np.full(size, -1, dtype = np.int64)
+        self.tod = np.full(size, np.nan)
+        self.sum = np.zeros(size)
+        self.count = np.zeros(size, dtype = np.int64)
+
+    def update(self, chunk, values, mask = None):
+        values = np.asarray(values, dtype = np.float64)
+        cal = chunk.cal
+        if self.period == 'day':
+            groups = chunk.days.astype(np.intp)
+            self.n = max(self.n, int(groups.max()) + 1)
+            self.max = grow(self.max, self.n, -np.inf)
+            self.arg = grow(self.arg, self.n, -1)
+            self.tod = grow(self.tod, self.n, np.nan)
+            self.sum = grow(self.sum, self.n, 0)
+            self.count = grow(self.count, self.n, 0)
+        else:
+            groups = month_groups(cal)[0]
+
+        idx = np.arange(len(values))
+        if mask is not None:
+            mask = np.asarray(mask, dtype = bool)
+            values, groups, idx = values[mask], groups[mask], idx[mask]
+
+        np.add.at(self.sum, groups, values)
+        np.add.at(self.count, groups, 1)
+
+        # Later chunks only take a group's max if they beat it - ties stay with the earlier timestep
+        mx, arg = group_max(values, groups, len(self.max))
+        hit = mx > self.max
+        local = idx[arg[hit]]
+        self.max[hit] = mx[hit]
+        self.arg[hit] = chunk.start + local
+        self.tod[hit] = cal.hour[local] + cal.minute[local] / 60
+
+    def result(self):
+        n = self.n
+        count = self.count[:n]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            mean = np.where(count > 0, self.sum[:n] / count, np.nan)
+        return {'max': np.where(self.arg[:n] >= 0, self.max[:n], np.nan), 'argmax': self.arg[:n].copy(),
+                'tod': self.tod[:n].copy(), 'sum': self.sum[:n].copy(), 'mean': mean, 'count': count.copy()}
+
+
+class ProfileCube:
+
+    # Running calstats.profile_cube; one day type with native = False gives calstats.average_day as result()[:, 0]
+    def __init__(self, native = True):
+        self.native = native
+        self.shape = None
+
+    def update(self, chunk, values, day_types):
+        values = np.asarray(values, dtype = np.float64)
+        cal = chunk.cal
+        masks = np.array([np.asarray(m, dtype = bool) for m in day_types]).reshape(len(day_types), len(values))
+        months, n_m = month_groups(cal)
+        tod, n_t = hour_groups(cal, self.native)
+        n_d = len(masks)
+
+        if self.shape is None:
+            self.shape = (n_m, n_d, n_t)
+            self.count = np.zeros(n_m * n_d * n_t, dtype = np.int64)
+            self.total = np.zeros(n_m * n_d * n_t)
+        elif self.shape != (n_m, n_d, n_t):
+            raise ValueError('Every chunk needs the same day types and timestep.')
+
+        d, t = np.nonzero(masks)
+        labels = (months[t] * n_d + d) * n_t + tod[t]
+        np.add.at(self.count, labels, 1)
+        np.add.at(self.total, labels, values[t])
+
+    def result(self):
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return np.where(self.count > 0, self.total / self.count, np.nan).reshape(self.shape)
+
+
+def merge_runs(runs, out, block = 1 << 15):
+
+    # Merge ascending sorted runs into out, holding at most one block per run in memory
+    pos = [0] * len(runs)
+    w = 0
+    while True:
+        live = [k for k, r in enumerate(runs) if pos[k] < len(r)]
+        if not live:
+            break
+        heads = {k: np.asarray(runs[k][pos[k]:pos[k] + block]) for k in live}
+
+        # Values up to the lowest block end among the runs with more data left are final
+        ends = [heads[k][-1] for k in live if pos[k] + block < len(runs[k])]
+        limit = min(ends) if ends else None
+        parts = []
+        for k in live:
+            c = len(heads[k]) if limit is None else int(np.searchsorted(heads[k], limit, side = 'right'))
+            parts.append(heads[k][:c])
+            pos[k] += c
+        merged = np.sort(np.concatenate(parts))
+        out[w:w + len(merged)] = merged
+        w += len(merged)
+    return out
+
+
+class DurationCurves:
+
+    # Running ldc.duration_curves: each chunk's values are sorted and spilled to tmp_dir, result() merges them
+    def __init__(self, names, tmp_dir = None, block = 1 << 15):
+        self.names = list(names)
+        self.dir = tempfile.mkdtemp(prefix = 'ldc_', dir = tmp_dir)
+        self.block = block
+        self.runs = [[] for name in self.names]
+
+    def update(self, chunk, values, masks = None):
+        # masks: dict of name -> chunk mask, names without one (or None) take every timestep
+        values = np.asarray(values, dtype = np.float64)
+        masks = masks or {}
+        for k, name in enumerate(self.names):
+            m = masks.get(name)
+            v = values if m is None else values[np.asarray(m, dtype = bool)]
+            path = os.path.join(self.dir, f'{k}_{len(self.runs[k])}.npy')
+            np.save(path, np.sort(-v))		# Descending curve stored as its ascending negative
+            self.runs[k].append(path)
+
+    def curve(self, name, points = None):
+        k = self.names.index(name)
+        runs = [np.load(p, mmap_mode = 'r') for p in self.runs[k]]
+        n = sum(len(r) for r in runs)
+        curve = open_memmap(os.path.join(self.dir, f'curve_{k}.npy'), mode = 'w+', dtype = np.float64, shape = (n,))
+        merge_runs(runs, curve, self.block)
+        np.negative(curve, out = curve)
+
+        if points is None or n <= points:
+            return np.arange(1, n + 1, dtype = np.float64), curve
+
+        # Only the ranks either side of each point are read - interpolating on them matches np.interp on the full curve
+        x = np.linspace(1, n, points)
+        lo = np.floor(x).astype(np.int64) - 1
+        ranks = np.unique(np.concatenate((lo, np.minimum(lo + 1, n - 1))))
+        return x, np.interp(x, ranks + 1.0, curve[ranks])
+
+    def result(self, points = None):
+        # dict of name -> (rank, value); full curves (points = None) are memory maps valid until close()
+        return {name: self.curve(name, points) for name in self.names}
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors = True)
+
+
+class DailyMinSOC:
+
+    # Running icestats.daily_min_soc; soc per update is (timesteps,) or (runs, timesteps) as there
+    def __init__(self, ice_cap, windows = None):
+        self.ice_cap = ice_cap
+        self.windows = windows
+        self.single = None
+        self.n = 0
+
+    def update(self, chunk, soc, windows = None, mask = None):
+        # windows: [start, end] hour pairs or chunk masks (default: the windows given at construction)
+        windows = self.windows if windows is None else windows
+        soc = np.asarray(soc, dtype = np.float64)
+        if self.single is None:
+            self.single = soc.ndim == 1
+            R = len(np.atleast_2d(soc))
+            self.cap = np.broadcast_to(np.asarray(self.ice_cap, dtype = np.float64), (R,))
+            self.min = np.full((R, len(windows), 366), np.inf)
+            self.arg = np.full((R, len(windows), 366), -1, dtype = np.int64)
+            self.tod = np.full((R, len(windows), 366), np.nan)
+
+        # The chunk's own daily minimums, then merged by day - strictly lower values replace earlier ones
+        d = icestats.daily_min_soc(chunk.cal, np.atleast_2d(soc), self.cap, windows, mask)
+        low, arg, tod = [np.moveaxis(d[k], 1, 2) for k in ['min', 'argmin', 'tod']]
+        off = int(chunk.days[0])
+        self.n = max(self.n, off + low.shape[-1])
+        self.min = grow(self.min, self.n, np.inf)
+        self.arg = grow(self.arg, self.n, -1)
+        self.tod = grow(self.tod, self.n, np.nan)
+
+        days = slice(off, off + low.shape[-1])
+        hit = low < self.min[..., days]
+        self.min[..., days][hit] = low[hit]
+        self.arg[..., days][hit] = chunk.start + arg[hit]
+        self.tod[..., days][hit] = tod[hit]
+
+    def result(self):
+        n = self.n
+        arg = self.arg[..., :n].transpose(0, 2, 1)
+        low = np.where(arg >= 0, self.min[..., :n].transpose(0, 2, 1), np.nan)
+        res = {'min': low, 'argmin': arg.copy(), 'tod': self.tod[..., :n].transpose(0, 2, 1).copy(),
+               'unused': low * self.cap[:, None, None]}
+        if self.single:
+            res = {k: v[0] for k, v in res.items()}
+        return res
@@ -0,0 +1,235 @@
+# ESO Column Reader
+# Ice measure analysis tools
+
+# This module reads selected report variables from an EnergyPlus .eso (or .mtr) file directly into float64 NumPy
+# columns. The data dictionary is read first and only the report codes matching the requested (frequency, key,
+# variable) selectors are kept. Every other data line is skipped on its leading report code without being split.
+#
+# The return values mirror esoreader.read() so existing dd.index[...] / data[key] lookups keep working:
+#   dd, data = read_eso(path, [('TimeStep', None, 'Electricity:Facility'),
+#                              ('TimeStep', ice_name, 'Ice Thermal Storage End Fraction')])
+#
+# The report code 2 time records that precede the finest selected frequency (TimeStep, else Hourly) are collected
+# alongside the columns and returned as dd.time, a timeindex.TimeIndex with precomputed calendar arrays.
+#
+# For large sub-hourly files, processes > 1 memory-maps the eso, splits the data section at timestep records
+# (report code 2 lines) and parses each chunk in its own process. The column pieces are joined in file order.
+# Worker processes are forked so the calling script is not re-imported; where fork is unavailable (Windows) the
+# file is parsed serially.
+
+import mmap
+import multiprocessing as mp
+import numpy as np
+
+from timeindex import TimeIndex, parse_time_record, RECORD_FIELDS
+
+
+class DataDictionary:
+
+    # Same layout as esoreader.DataDictionary
+    #   variables = {id: [reporting_frequency, key, variable, unit]}
+    #   index = {(reporting_frequency, key, variable): id}
+    def __init__(self, version = None, timestamp = None):
+        self.version = version
+        self.timestamp = timestamp
+        self.variables = {}
+        self.index = {}
+        self.time = None		# timeindex.TimeIndex of the parsed data, set by read_eso
+
+    def build_index(self):
+        for id, value in self.variables.items():
+            reporting_frequency, key, variable, unit = value
+            self.index[reporting_frequency, key, variable] = id
+
+    def find_variable(self, search):
+        # Case insensitive partial match on the variable name, returns (frequency, key, variable) selectors
+        return [(frequency, key, variable) for frequency, key, variable in self.index.keys()
+                if search.lower() in variable.lower()]
+
+
+def read_eso(path, selectors = None, processes = 1):
+
+    # selectors: list of (frequency, key, variable) tuples, key = None for meters. None reads every variable.
+    # processes: number of worker processes for the data section, 1 parses in this process.
+    with open(path, 'rb') as eso:
+        dd = read_data_dictionary(eso)
+        codes = select_codes(dd, selectors)
+
+        stamp_codes = index_codes(dd, codes)
+
+        if processes > 1 and 'fork' in mp.get_all_start_methods():
+            data, records = parse_parallel(path, eso.tell(), codes, stamp_codes, processes)
+        else:
+            data, records = parse_data(eso, codes, stamp_codes)
+
+    dd.time = TimeIndex(records, dd.variables[stamp_codes[0]][0]) if stamp_codes else None
+    return dd, data
+
+
+def read_data_dictionary(eso):
+
+    # Parse the head of an open (binary) eso file. The file is left positioned at the first data line.
+    version, timestamp = [s.strip() for s in eso.readline().decode('latin-1').split(',')[-2:]]
+    dd = DataDictionary(version, timestamp)
+
+    for raw in eso:
+        line = raw.decode('latin-1').strip()
+        if line == 'End of Data Dictionary':
+            break
+
+        # Report variables end with ' !Frequency', header records (codes 1-6) end with ' ! When ...'
+        if '! ' in line:
+            line = line.split('! ')[0]
+        if ' !' not in line:
+            continue
+        line, frequency = line.split(' !')
+        frequency = frequency.split()[0]		# Daily/Monthly/RunPeriod lines carry a trailing field list
+
+        fields = [f.strip() for f in line.split(',')]
+        if len(fields) >= 4:
+            id, nfields, key, variable = fields[:4]
+        else:
+            id, nfields, variable = fields[:3]
+            key = None		# Meters have no key
+
+        unit = None
+        if '[' in variable:
+            variable, unit = variable.split('[')
+            unit = unit[:-1]
+            variable = variable.strip()
+
+        dd.variables[int(id)] = [frequency, key, variable, unit]
+
+    dd.build_index()
+    dd.ids = set(dd.variables.keys())
+    return dd
+
+
+def select_codes(dd, selectors):
+
+    # Resolve selectors into report codes, preserving the requested order
+    if selectors is None:
+        return sorted(dd.variables.keys())
+
+    codes = []
+    for s in selectors:
+        s = tuple(s)
+        if s not in dd.index:
+            raise KeyError(f'Variable not found in data dictionary: {s}')
+        if dd.index[s] not in codes:
+            codes.append(dd.index[s])
+
+    return codes
+
+
+def index_codes(dd, codes):
+
+    # Codes whose values mark a reported timestep of the index - the finest selected sub-daily frequency
+    for frequency in ['TimeStep', 'Hourly']:
+        found = [c for c in codes if dd.variables[c][0] == frequency]
+        if found:
+            return found
+    return []
+
+
+def parse_data(lines, codes, stamp_codes = (), capacity = 8760):
+
+    # Fill one float64 column per report code from an iterable of raw (bytes) data lines.
+    # Only the first value on each line is kept (Daily/Monthly lines also report min/max and their timestamps).
+    # The time record (code 2) preceding a value of any stamp_codes column is kept as one row of the time index.
+    wanted = {str(c).encode(): n for n, c in enumerate(codes)}
+    cols = [np.empty(capacity) for c in codes]
+    counts = [0] * len(codes)
+
+    stamp_n = {wanted[str(c).encode()] for c in stamp_codes}
+    records = np.empty((capacity, RECORD_FIELDS), dtype = np.int16)
+    n_records = 0
+    pending = None
+
+    for line in lines:
+        comma = line.find(b',')
+        code = line[:comma]
+        n = wanted.get(code)
+        if n is None:
+            if code == b'2':
+                pending = line
+            elif line.startswith(b'End of Data'):
+                break
+            continue
+
+        if pending is not None and n in stamp_n:
+            if n_records == len(records):
+                records = np.concatenate((records, np.empty_like(records)))
+            records[n_records] = parse_time_record(pending)
+            n_records += 1
+            pending = None
+
+        end = line.find(b',', comma + 1)
+        value = float(line[comma + 1:end] if end > 0 else line[comma + 1:])
+
+        k = counts[n]
+        col = cols[n]
+        if k == len(col):
+            # Double the column when full
+            col = np.concatenate((col, np.empty(len(col))))
+            cols[n] = col
+        col[k] = value
+        counts[n] = k + 1
+
+    return {c: trim(cols[n], counts[n]) for n, c in enumerate(codes)}, trim(records, n_records)
+
+
+def trim(col, count):
+
+    # Drop the unused tail of a preallocated column (or record array)
+    if count == len(col):
+        return col
+    return col[:count].copy()
+
+
+def chunk_bounds(mm, start, end, chunks):
+
+    # Split [start, end) into byte ranges that each begin on a timestep record ('2,' at the start of a line)
+    bounds = [start]
+    for k in range(1, chunks):
+        target = max(start + k * (end - start) // chunks, bounds[-1])
+        b = mm.find(b'\n2,', target, end)
+        if b < 0:
+            break
+        if b + 1 > bounds[-1]:
+            bounds.append(b + 1)
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def chunk_lines(mm, start, stop):
+
+    mm.seek(start)
+    readline = mm.readline
+    while mm.tell() < stop:
+        yield readline()
+
+
+def parse_chunk(path, start, stop, codes, stamp_codes):
+
+    # Worker: parse one byte range of the data section
+    with open(path, 'rb') as eso:
+        with mmap.mmap(eso.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+            return parse_data(chunk_lines(mm, start, stop), codes, stamp_codes, capacity = 1024)
+
+
+def parse_parallel(path, data_start, codes, stamp_codes, processes):
+
+    with open(path, 'rb') as eso:
+        with mmap.mmap(eso.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+            end = mm.rfind(b'\nEnd of Data', data_start)
+            end = len(mm) if end < 0 else end + 1
+            bounds = chunk_bounds(mm, data_start, end, processes)
+
+    with mp.get_context('fork').Pool(min(processes, len(bounds))) as pool:
+        pieces = pool.starmap(parse_chunk, [(path, a, b, codes, stamp_codes) for a, b in bounds])
+
+    # Join the column pieces in file order
+    data = {c: np.concatenate([p[0][c] for p in pieces]) for c in codes}
+    records = np.concatenate([p[1] for p in pieces])
+    return data, records
@@ -10,20 +10,31 @@
 import os
 import sys
 import calendar
-import esoreader
 import pandas as pd
 import numpy as np
-import plotly
 import plotly.graph_objs as go
 from plotly import subplots
 
 # External Functions
-from performance import ice_performance
+from esocache import load_eso
+from flexcalc import shed_flex, add_flex, convert_series
+from flexindex import FlexIndex
+from rundata import RunData
+import flexsweep
+import flexstream
+import plotting
+import seriesstore
 
 # Program Control
 exp = False		#Export Results
 f1 = False		#Plot Results for Flex
 add = True		#Perform Load Add Calcs
+sweep = False	#Perform Parameter Sweep over sweep_grid (writes flex_sweep.csv)
+stream = False	#Replay the Analysis Period through the Streaming Estimator (flexstream.py)
+plot_points = 5000		#Max Points per Plotted Trace, LTTB Downsampled (None = Full Resolution)
+gl_points = 10000		#Traces Above This Many Points are Drawn with WebGL
+shared_store = None		#Shared-Memory Series Store Name (seriesstore.py) - None = Load Privately
+compact = False			#Compact Storage - float32 Series and Traces, int8 Flex Flags (~10x less memory)
 
 #-----------------------------------------------------------------------------------------------------------------------
 ## Model and Analysis Parameter Definitions
@@ -37,66 +48,85 @@ ice_cap = 2000					#ton-hours
 chiller_cap = 347				#tons
 chiller_COP = 2.80				#nominal chiller COP
 min_cap = 0.15 * chiller_cap	#min PLR * nominal chiller capacity
-descriptor = 'Secondary School in CZ 2A'
+chg_temps = [-3.88, -1.1]		#Brine entering/leaving the tank while charging [C] (measure default setpoint 25 F)
 
-# Load File
-print('Loading File: ' + filename)
-dd, data = esoreader.read(filepath + filename)
+# Parameter Sweep Grid - every combination is evaluated on the loaded data (see flexsweep.py)
+sweep_grid = {'ice_cap': [1000, 1500, 2000, 2500, 3000],			#ton-hours
+			'chiller_cap': [250, 300, 347, 400, 450],				#tons
+			'chiller_COP': [2.4, 2.6, 2.8, 3.0, 3.2],
+			'min_plr': [0.10, 0.15]}
+descriptor = 'Secondary School in CZ 2A'
 
 # Define Chiller/Ice Tank Names for ESO Data Directory Inspection
 ice_name = 'THERMAL STORAGE ICE DETAILED 1'
 chill_name = '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON'
 
-# Define Run Period
-run_start = pd.datetime(2006,1,1,0)				#Hour 0 on Jan 1
-run_end = pd.datetime(2006,12,31,23,59)			#Hour 23:59 on Dec 31
-ts_per_hr = 4									#15 minute simulation timestep !!!! Adjust date_range objects too!
-x_ts = pd.date_range(start = run_start, end = run_end, freq = '15min')		#Vector of timestamps for simulation run pd
+# Variables Required from the ESO - (Frequency, Key, Variable)
+selectors = [('TimeStep', None, 'Electricity:Facility'),
+			('TimeStep', None, 'Electricity:HVAC'),
+			('TimeStep', None, 'Cooling:Electricity'),
+			('TimeStep', None, 'Pumps:Electricity'),
+			('TimeStep', None, 'Fans:Electricity'),
+			('TimeStep', chill_name, 'Chiller Electric Energy'),
+			('TimeStep', None, 'Electricity:Plant'),
+			('TimeStep', ice_name, 'Ice Thermal Storage Ancillary Electric Energy'),
+			('TimeStep', chill_name, 'Chiller Evaporator Cooling Rate'),
+			('TimeStep', ice_name, 'Ice Thermal Storage Cooling Discharge Rate'),
+			('TimeStep', ice_name, 'Ice Thermal Storage Cooling Charge Rate'),
+			('TimeStep', ice_name, 'Ice Thermal Storage End Fraction'),
+			('TimeStep', 'Environment', 'Site Outdoor Air Drybulb Temperature'),
+			('TimeStep', 'Environment', 'Site Outdoor Air Wetbulb Temperature'),
+			('TimeStep', 'CHILLED WATER LOOP SUPPLY INLET NODE', 'System Node Temperature'),
+			('TimeStep', 'CHILLED WATER LOOP SETPOINT SCHEDULE (NEW)', 'Schedule Value')]
+
+# Shared Series Store - every analysis run with the same store name reuses one in-memory copy of the ESO columns
+loader = seriesstore.SeriesStore.open(shared_store).load_eso if shared_store else load_eso
+
+# Load File - Selected Variables Only (cached in esocache/ after the first run)
+print('Loading File: ' + filename)
+dd, data = loader(filepath + filename, selectors)
+run_data = RunData(dd, data)						#Variables in any unit: run_data.get(key, 'kW')
+
+# Define Run Period - Timestep Index Built from the ESO Time Records
+year = 2006										#Calendar year of the run period (not stored in the eso)
+cal = dd.time									#Calendar arrays: month, day, hour, minute, dow, day_of_year, holiday
+ts_per_hr = cal.ts_per_hr						#Simulation timesteps per hour, read from the eso
+x_ts = cal.timestamps(year)						#Vector of timestamps for simulation run pd
 
 # Define Analysis Peirod
-an_start = pd.datetime(2006,1,1,0)				#Analysis Start Hour
-an_end = pd.datetime(2006,12,31,17)			#Analysis Finish Hour
-an_pd = []										#Index range of analysis period - empty
-idx = 0
-for x in x_ts:
-	if x == an_start:
-		an_pd.append(idx)
-	if x == an_end:
-		an_pd.append(idx)
-	idx += 1
-
-x_an = pd.date_range(start = x_ts[an_pd[0]], end = x_ts[an_pd[1]], freq = '15min')	#Timestamp vector - for plotting
+an_start = pd.Timestamp(2006,1,1,0)				#Analysis Start Hour
+an_end = pd.Timestamp(2006,12,31,17)			#Analysis Finish Hour
+an_pd = [x_ts.get_loc(an_start), x_ts.get_loc(an_end)]		#Index range of analysis period
+
+x_an = x_ts[an_pd[0]:an_pd[1] + 1]				#Timestamp vector - for plotting
 print(x_an[0])
 
 # Define Occupied Hours and Days
 occ_flag = 0
 occ_hrs = [7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]		#Occupied from 08:00 through 20:00 (Pandas Hours Range from 0-23)
 occ_days = [0, 1, 2, 3, 4]		#Excludes Sat and Sun
+occ = np.isin(cal.dow, occ_days) & np.isin(cal.hour, occ_hrs)		#Occupied timestep mask
 
 # Define Flex Windows - number of future hours over which flexibilty is required
 window = [0.5, 1, 2, 3, 4, 5, 6]
 
-# Define Variables and Arrays for Load Shed Calcs
-kw_tr = [[None for i in range(len(x_an))] for j in range(len(window))]
-kw_future_tr = [[None for i in range(len(x_an))] for j in range(len(window))]
-kwh_tr = [[None for i in range(len(x_an))] for j in range(len(window))]
-post_flex_soc_tr = [[None for i in range(len(x_an))] for j in range(len(window))]
-no_flex_soc_tr = [[None for i in range(len(x_an))] for j in range(len(window))]
-occ_counter = 0
-no_rate_counter = [0 for j in range(len(window))]
-no_soc_counter =[0 for j in range(len(window))]
-total_counter = [0 for j in range(len(window))]
-flex_counter = [0 for j in range(len(window))]
-flex_future_counter = [0 for j in range(len(window))]
-occ_flex_counter = [0 for j in range(len(window))]
-avg_flex = [0 for j in range(len(window))]
-avg_flex_future = [0 for j in range(len(window))]
-avg_occ_flex = [0 for j in range(len(window))]
-avg_kwh_flex = [0 for j in range(len(window))]
+# Ad-hoc Flex Queries - (start timestamp, horizon [hr]) pairs for any horizon, answered by flexindex.FlexIndex
+queries = []		#e.g. [(pd.Timestamp(2006,7,14,13), 2.5)]
+
+# Storage Types - float lists and float64 traces, or float32 arrays for both (calculations run in float64 either way)
+series_type = np.float32 if compact else None
+trace_type = np.float32 if compact else np.float64
+
+# Define Trace Arrays for Load Shed Calcs (NaN = no value, plotted as a gap)
+kw_tr = np.full((len(window), len(x_an)), np.nan, dtype = trace_type)
+kw_future_tr = np.full((len(window), len(x_an)), np.nan, dtype = trace_type)
+kwh_tr = np.full((len(window), len(x_an)), np.nan, dtype = trace_type)
+post_flex_soc_tr = np.full((len(window), len(x_an)), np.nan, dtype = trace_type)
+no_flex_soc_tr = np.full((len(window), len(x_an)), np.nan, dtype = trace_type)
 
 #Define Variables and Arrays for Load Add Clacs
-add = [[None for i in range(len(x_an))] for j in range(len(window))]
-add_occ = [[None for i in range(len(x_an))] for j in range(len(window))]
+add_tr = np.full((len(window), len(x_an)), np.nan, dtype = trace_type)
+add_occ_tr = np.full((len(window), len(x_an)), np.nan, dtype = trace_type)
 add_counter = [0 for j in range(len(window))]
 add_occ_counter = [0 for j in range(len(window))]
 avg_add = [0 for j in range(len(window))]
@@ -107,47 +137,47 @@ avg_add_occ = [0 for j in range(len(window))]
 
 #facility electric energy [J -> kW]
 key = dd.index['TimeStep', None, 'Electricity:Facility']
-pwr_facil = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_facil = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #HVAC electric energy [J -> kWh]
 key = dd.index['TimeStep', None, 'Electricity:HVAC']
-pwr_hvac = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_hvac = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #cooling electric energy [J -> kW]
 key = dd.index['TimeStep', None, 'Cooling:Electricity']
-pwr_cool = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_cool = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #pump electric energy [J -> kW]
 key = dd.index['TimeStep', None, 'Pumps:Electricity']
-pwr_pump = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_pump = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #fan electric energy [J -> kW]
 key = dd.index['TimeStep', None, 'Fans:Electricity']
-pwr_fan = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_fan = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #chiller electric energy [J -> kW] - incl condenser unit
 key = dd.index['TimeStep', chill_name, 'Chiller Electric Energy']
-pwr_chill = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_chill = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #plant total electric energy [J -> kW] - all Plants!
 key = dd.index['TimeStep', None, 'Electricity:Plant']
-pwr_plant = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_plant = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #ice tank ancillary electric energy [J -> kW]
 key = dd.index['TimeStep', ice_name, 'Ice Thermal Storage Ancillary Electric Energy']
-pwr_ice = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+pwr_ice = convert_series(run_data.get(key, 'kW'), dtype = series_type)
 
 #chiller cooling rate [W -> tons]
 key = dd.index['TimeStep', chill_name, 'Chiller Evaporator Cooling Rate']
-rate_chill = [w * 0.0002843451 for w in data[key]]
+rate_chill = convert_series(run_data.get(key, 'tons'), dtype = series_type)
 
 #ice tank cooling rate [W -> tons]
 key = dd.index['TimeStep', ice_name, 'Ice Thermal Storage Cooling Discharge Rate']
-rate_dchg = [w * 0.0002843451 for w in data[key]]
+rate_dchg = convert_series(run_data.get(key, 'tons'), dtype = series_type)
 
 #ice tank charging rate [W -> tons]
 key = dd.index['TimeStep', ice_name, 'Ice Thermal Storage Cooling Charge Rate']
-rate_chg = [w * 0.0002843451 for w in data[key]]
+rate_chg = convert_series(run_data.get(key, 'tons'), dtype = series_type)
 
 #ice state of charge [-]
 key = dd.index['TimeStep', ice_name, 'Ice Thermal Storage End Fraction']
@@ -169,16 +199,13 @@ return_temp = data[key]
 key = dd.index['TimeStep', 'CHILLED WATER LOOP SETPOINT SCHEDULE (NEW)', 'Schedule Value']
 supply_temp = data[key]
 
-#facility electric power w/o chiller [kW]
-pwr_facil_wo_chill = [pwr_facil[i] - pwr_chill[i] for i in range(len(pwr_facil))]
+# Compact Storage - float32 copies of the series used as read from the eso
+if compact:
+	soc, tdb, twb, return_temp, supply_temp = [np.asarray(v, dtype = np.float32)
+											   for v in [soc, tdb, twb, return_temp, supply_temp]]
 
-#total cooling rate - chiller and ice [tons]
-rate_cool = [0] * len(rate_chill)
-for i in range(len(rate_chill)):
-	if rate_chg[i] == 0:
-		rate_cool[i] = rate_chill[i] + rate_dchg[i]
-	else:
-		rate_cool[i] = rate_chill[i] - rate_chg[i]
+#facility electric power w/o chiller [kW]
+pwr_facil_wo_chill = np.subtract(pwr_facil, pwr_chill)
 
 print(' Data Successfully Loaded.\n')
 
@@ -186,166 +213,43 @@ print(' Data Successfully Loaded.\n')
 ## Calculations
 print('Performing Calculations')
 
-# Iterate Over Every Timestep in Analysis Period
-for t in range(an_pd[0], an_pd[1]):
-
-	# Determine if t is in occupied hour
-	if x_ts[t].dayofweek in occ_days and x_ts[t].hour in occ_hrs:
-		occ_flag = 1
-		occ_counter += 1
-	else:
-		occ_flag = 0
-
-	# Iterate Analysis over Every Flex Window
-	for w in window:
-
-		e_flag = 0			# Sufficient energy in ice tank flag
-		p_flag = 0			# Sufficient discharge capacity (power) flag
-		flag = [0, 0, 0]	# Charge/discharge indicator flag (start, peak, end)
-
-		# Determine Number of Timesteps in Analysis Period
-		steps = int(w * ts_per_hr)
-
-		# Integrate and Find Max Cooling and Electric Loads
-		c = 0
-		load_cool_to_pk = 0
-		e = 0
-		e_no_chill = 0
-		load_e_no_chill = 0
-		load_cool = 0		# Total cooling energy required over analysis period [ton-hours]
-		pk_cool = 0			# Peak cooling rate required over analysis period [tons]
-		pk_c_ts = 0			# Timestep index of peak cooling rate [-]
-		load_elec = 0		# Total facility energy required over analysis period [kWh]
-		pk_elec = 0			# Peak facility power required over analysis period [kW]
-		pk_e_ts = 0			# Timestep index of peak facility power [-]
-
-		#(Chiller Cooling Rate + Ice Cooling Rate) * ts [ton-hours]
-		c = rate_cool[t:t+steps]						# Subsection of total cooling load (provided) profile [tons]
-		load_cool = sum(c) / ts_per_hr					# Convert tons into ton-hours of cooling
-		pk_cool = max(c)								# Max tons of cooling in analysis period
-		pk_c_ts = t + c.index(pk_cool) + 1				# Timestep of max cooling
-		load_cool_to_pk = sum(rate_cool[t:pk_c_ts])		# Cooling load up to peak cooling timestep
-
-		#Facility Power * ts [kWh]
-		e = pwr_facil[t:t+steps]						# Subsection of facility power curve [kW]
-		e_no_chill = pwr_facil_wo_chill[t:t+steps]		# Subsection of facility power w/o chiller curve [kW]
-		load_elec = sum(e) / ts_per_hr					# Convert kW into kWh values using timesteps/hour
-		load_e_no_chill = sum(e_no_chill) / ts_per_hr	# Convert kW into kWh values
-		pk_elec = max(e)								# Max kW for facility in analysis period
-		pk_e_ts = t + e.index(pk_elec) + 1				# Timestep of max kW
-
-		# Check Cooling Energy Capacity Remaining
-		avail_cap = ice_cap * soc[t]
-		if avail_cap > load_cool:
-			soc_at_end = (avail_cap - load_cool) / ice_cap
-			e_flag = 1
-		else:
-			no_soc_counter[window.index(w)] += 1
-
-		# Set Charge/Discharge Flag
-		idx = 0
-		for i in [t, pk_c_ts, t+steps]:
-			if rate_chg[i] > 0:
-				flag[idx] = 1
-			elif rate_dchg[i] > 0:
-				flag[idx] = 0
-			else:
-				flag[idx] = -1
-
-		# Check Cooling Rate Ice Can Provide
-		soc_at_peak = (avail_cap - load_cool_to_pk) / ice_cap
-		max_dchg = [0, 0, 0]		# @ start, peak, and end
-		max_dchg[0] = ice_performance(soc[t], return_temp[t], supply_temp[t], ice_cap, 0)
-		max_dchg[1] = ice_performance(soc_at_peak, return_temp[pk_c_ts], supply_temp[pk_c_ts], ice_cap, 0)
-		max_dchg[2] = ice_performance(soc_at_end, return_temp[t+steps], supply_temp[t+steps], ice_cap, 0)
-
-		# If cooling rates can meet start, max, and average, then there is no cooling rate restriction on the DR shed
-		# All units in tons
-		if (max_dchg[0] + max_dchg[2]) / 2 * w >= load_cool \
-		and max_dchg[1] > pk_cool and max_dchg[2] > c[-1]:
-			p_flag = 1
-		else:
-			no_rate_counter[window.index(w)] += 1
-
-		# If ice can meet both energy and rate requirements, remove chiller power from load to calculate flex potential
-		if e_flag and p_flag:
-
-			#Total flex possible counter
-			total_counter[window.index(w)] += 1
-
-			# Calculate the projected kWh shaved over analysis window
-			kwh_flex = load_elec - load_e_no_chill
-
-			# Calc kW reduction relative to current timestep and to analysis window
-			new_max_kw = max(pwr_facil_wo_chill[t:t+steps])
-			kw_flex = pwr_facil[t] - new_max_kw
-			kw_flex_future = pk_elec - new_max_kw
-
-			# Do not include periods when no kW reduction is provided (relative to pk_elec)
-			if kw_flex_future <= 0:
-				kw_flex_future = 0
-			else:
-				flex_future_counter[window.index(w)] += 1
-				avg_flex_future[window.index(w)] += kw_flex_future
-
-				# Calculate shed flex during occupied hours only
-				if occ_flag == 1:
-					occ_flex_counter[window.index(w)] += 1
-					avg_occ_flex[window.index(w)] += kw_flex_future
-					avg_kwh_flex[window.index(w)] += kwh_flex
-
-			# Calculate flexibility relative to current timestep power as well
-			if kw_flex <= 0:
-				kw_flex = 0
-			else:
-				flex_counter[window.index(w)] += 1
-				avg_flex[window.index(w)] += kw_flex
-
-		else:	# No flexiblity assumed if ITS cannot meet rate or energy requirements
-			kw_flex = 0
-			kw_flex_future = 0
-			kwh_flex = 0
-
-		# Update trace variables for shed plots
-		kw_tr[window.index(w)][(t-an_pd[0])] = -kw_flex
-		kw_future_tr[window.index(w)][(t-an_pd[0])] = kw_flex_future
-		kwh_tr[window.index(w)][(t-an_pd[0])] = kwh_flex
-		post_flex_soc_tr[window.index(w)][(t-an_pd[0])] = soc_at_end
-		no_flex_soc_tr[window.index(w)][(t-an_pd[0])] = soc[t+steps]
-
-		if add:
-			# Average cooling required over analysis period
-			c_bar = sum(c) / steps			# average tons
-
-			# Average cooling provided by chiller over analysis period (excluding charging!)
-			c_chill = []
-			for z in range(t,t+steps):
-				c_chill.append(rate_chill[z] - rate_chg[z])
-			c_bar_chill = sum(c_chill) / steps		# average tons
-
-			# If chiller capacity is nominally sufficient, add load based on nominal COP (convert tons to kW)
-			if c > c_chill:
-				add_counter[window.index(w)] += 1
-				if c_bar_chill <= chiller_cap:
-					add[window.index(w)][(t-an_pd[0])] = (c_bar - c_bar_chill) / 0.2843451 / chiller_COP
-				elif c_bar_chill > chiller_cap:
-					add[window.index(w)][(t-an_pd[0])] = (chiller_cap - c_bar_chill) / 0.2843451 / chiller_COP
-
-				if occ_flag:
-					add_occ_counter[window.index(w)] += 1
-					if c_bar_chill <= chiller_cap:
-						add_occ[window.index(w)][(t-an_pd[0])] = (c_bar - c_bar_chill) / 0.2843451 / chiller_COP
-					elif c_bar_chill > chiller_cap:
-						add_occ[window.index(w)][(t-an_pd[0])] = (chiller_cap - c_bar_chill) / 0.2843451 / chiller_COP
-				else:
-					add_occ[window.index(w)][(t-an_pd[0])] = 0
-
-				# Calc the average add terms
-				avg_add[window.index(w)] += add[window.index(w)][(t-an_pd[0])]
-				avg_add_occ[window.index(w)] += add_occ[window.index(w)][(t-an_pd[0])]
-
-			elif c <= c_chill:
-				add[window.index(w)][(t-an_pd[0])] = 0
+# Occupied Timesteps in Analysis Period
+occ_counter = np.count_nonzero(occ[an_pd[0]:an_pd[1]])
+
+# Load Shed Flexibility - All Timesteps and Windows at Once (see flexcalc.py)
+shed = shed_flex(pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp, occ,
+				ice_cap, window, ts_per_hr, an_pd[0], an_pd[1], dtype = trace_type)
+
+n_an = an_pd[1] - an_pd[0]
+kw_tr[:, :n_an] = shed['kw_tr']
+kw_future_tr[:, :n_an] = shed['kw_future_tr']
+kwh_tr[:, :n_an] = shed['kwh_tr']
+post_flex_soc_tr[:, :n_an] = shed['post_flex_soc_tr']
+no_flex_soc_tr[:, :n_an] = shed['no_flex_soc_tr']
+flex_flags = shed['flags']		#int8 (window x timestep) flexcalc.FLAG_* bits behind the counters below
+
+no_rate_counter = shed['no_rate_counter'].tolist()
+no_soc_counter = shed['no_soc_counter'].tolist()
+total_counter = shed['total_counter'].tolist()
+flex_counter = shed['flex_counter'].tolist()
+flex_future_counter = shed['flex_future_counter'].tolist()
+occ_flex_counter = shed['occ_flex_counter'].tolist()
+avg_flex = shed['avg_flex'].tolist()
+avg_flex_future = shed['avg_flex_future'].tolist()
+avg_occ_flex = shed['avg_occ_flex'].tolist()
+avg_kwh_flex = shed['avg_kwh_flex'].tolist()
+
+# Load Add Flexibility - Chiller Picks Up Ice Discharge and Charges the Tank (see flexcalc.py)
+if add:
+	load_add = add_flex(rate_chill, rate_dchg, rate_chg, soc, chg_temps[0], chg_temps[1], occ, ice_cap, chiller_cap,
+						chiller_COP, window, ts_per_hr, an_pd[0], an_pd[1], min_cap, dtype = trace_type)
+
+	add_tr[:, :n_an] = load_add['add']
+	add_occ_tr[:, :n_an] = load_add['add_occ']
+	add_counter = load_add['add_counter'].tolist()
+	add_occ_counter = load_add['add_occ_counter'].tolist()
+	avg_add = load_add['avg_add'].tolist()
+	avg_add_occ = load_add['avg_add_occ'].tolist()
 
 # Calculate the Average Flexibility Provided by ITS
 for i in range(len(window)):
@@ -368,10 +272,10 @@ for i in range(len(window)):
 print('Flex Counter:', [(i / ts_per_hr) for i in flex_counter])
 print('Average Flex:', avg_flex)
 print('Average Flex (Future):', avg_flex_future)
-print('Total Hours:', len(x_an) / 4)
+print('Total Hours:', len(x_an) / ts_per_hr)
 print('Occupied Flex Counter:', [(i / ts_per_hr) for i in occ_flex_counter])
 print('Average Occupied Flex:', avg_occ_flex)
-print('Occupied Hours:', occ_counter / 4)
+print('Occupied Hours:', occ_counter / ts_per_hr)
 print('Total Yes Flex Count:', [(i / ts_per_hr) for i in total_counter])
 print('No Rate Count:', [(i / ts_per_hr) for i in no_rate_counter])
 print('No SOC Count:', [(i / ts_per_hr) for i in no_soc_counter])
@@ -381,6 +285,31 @@ print('Average Occ Add kW:', avg_add_occ)
 print('Add Hours:', add_counter)
 print('Add Occupied Hours:', add_occ_counter)
 
+if queries:
+	idx = FlexIndex(pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp, ice_cap,
+					ts_per_hr)
+	for q_start, q_hr in queries:
+		q = idx.query(x_ts.get_loc(q_start), q_hr)
+		print(f'Query {q_start}, {q_hr} Hr - kW Flex: {q["kw_flex"]}, kW Flex (Future): {q["kw_future"]}, '
+			f'kWh Flex: {q["kwh_flex"]}')
+
+
+if sweep:
+	print('Running Parameter Sweep:', np.prod([len(v) for v in sweep_grid.values()]), 'Design Points')
+	sweep_series = {'pwr_facil': pwr_facil, 'pwr_chill': pwr_chill, 'rate_chill': rate_chill, 'rate_dchg': rate_dchg,
+					'rate_chg': rate_chg, 'soc': soc, 'return_temp': return_temp, 'supply_temp': supply_temp,
+					'chg_temps': chg_temps}
+	sweep_table = flexsweep.sweep(sweep_series, sweep_grid, window, ts_per_hr, an_pd[0], an_pd[1], occ)
+	sweep_table.to_csv('flex_sweep.csv', index = False, float_format = '%.4g')
+
+if stream:
+	fs = flexstream.FlexStream(window, ts_per_hr, ice_cap, chiller_cap, chiller_COP, min_cap, chg_temps,
+							   stop = an_pd[1] - an_pd[0])		#Count window starts in the analysis period only
+	pd_end = an_pd[1] + int(max(window) * ts_per_hr) + 1		#Stream through the end of the longest window
+	for res in flexstream.replay(fs, *[v[an_pd[0]:pd_end] for v in [pwr_facil, pwr_chill, rate_chill, rate_dchg,
+								rate_chg, soc, return_temp, supply_temp, occ]]):
+		pass
+	print('Streaming Estimator Summary:', fs.summary())
 
 print(' Calculations Complete.\n')
 
@@ -434,13 +363,13 @@ for i in range(len(post_flex_soc_tr)):
 										legendgroup = i))
 
 add_trace = []
-for i in range(len(add)):
-	add_trace.append(go.Scatter(x = x_an, y = add[i], name = f'{window[i]} Hr Add',
+for i in range(len(add_tr)):
+	add_trace.append(go.Scatter(x = x_an, y = add_tr[i], name = f'{window[i]} Hr Add',
 										legendgroup = i))
 
-pwr_trace = go.Scatter(x = x_an, y = pwr_facil[an_pd[0]:an_pd[1]], name = 'Facil Pwr [kW]')
+pwr_trace = go.Scatter(x = x_an, y = pwr_facil[an_pd[0]:an_pd[1] + 1], name = 'Facil Pwr [kW]')
 
-chill_trace = go.Scatter(x = x_an, y = pwr_chill[an_pd[0]:an_pd[1]], name = 'Chiller Pwr [kW]')
+chill_trace = go.Scatter(x = x_an, y = pwr_chill[an_pd[0]:an_pd[1] + 1], name = 'Chiller Pwr [kW]')
 
 # Fig 1
 if f1:
@@ -467,7 +396,7 @@ if f1:
 		fig.append_trace(post_flex_soc_trace[i],5,1)
 
 	#fig['layout'].update(template = standard_template, showlegend = False)
-	plotly.offline.plot(fig, filename = 'flex.html')
+	plotting.plot(fig, filename = 'flex.html', max_points = plot_points, gl_points = gl_points)
 
 # Add Plot
 fig = subplots.make_subplots(rows = 1, cols = 1, shared_xaxes = True)
@@ -476,7 +405,7 @@ fig.append_trace(pwr_trace,1,1)
 for i in range(len(add_trace)):
 	fig.append_trace(add_trace[i],1,1)
 
-plotly.offline.plot(fig, filename = 'addflex.html')
+plotting.plot(fig, filename = 'addflex.html', max_points = plot_points, gl_points = gl_points)
 
 # Add and Shed Plot - Bounding!
 fig = subplots.make_subplots(rows = 1, cols = 1, shared_xaxes = True)
@@ -484,7 +413,7 @@ fig = subplots.make_subplots(rows = 1, cols = 1, shared_xaxes = True)
 fig.append_trace(add_trace[1],1,1)
 fig.append_trace(kw_trace[1],1,1)
 
-plotly.offline.plot(fig, filename = 'flexbound.html')
+plotting.plot(fig, filename = 'flexbound.html', max_points = plot_points, gl_points = gl_points)
 
 
 print(' Figures Complete.\n')
@@ -0,0 +1,273 @@
+# Vectorized Load Flexibility Engine
+# Ice measure analysis tools
+
+# This module computes the load shed and load add flexibility of flex.py for every timestep of the analysis period
+# and every flex window at once. Window sums come from cumulative sums and window max/argmax from a sliding-window
+# maximum (van Herk / Gil-Werman: block prefix and suffix maxima), so the cost is O(n) NumPy work per window instead
+# of re-slicing the series in Python at every (timestep, window) pair.
+#
+# The shed results follow the original per-timestep loop exactly, including its conventions:
+#   - the peak cooling timestep is one past the first maximum of the window (pk_c_ts = t + argmax + 1)
+#   - cooling up to the peak is summed in tons (not divided by ts_per_hr)
+#   - when the tank cannot cover the window energy, soc_at_end keeps the value of the previous (t, window) step
+#
+# Compact storage: convert_series(..., dtype = np.float32) keeps a series as a float32 array instead of a list of
+# floats, and dtype = np.float32 on shed_flex / add_flex returns float32 traces. The calculations still run in
+# float64. shed_flex also returns the per-timestep checks as one int8 array of FLAG_* bits per window.
+
+import numpy as np
+
+from performance import ice_performance_array
+
+# shed_flex 'flags' bits
+FLAG_ENERGY = 1		# tank holds the cooling energy of the window
+FLAG_RATE = 2		# ice discharge rate covers the window start, peak and end
+FLAG_FLEX = 4		# current kW flex > 0
+FLAG_FUTURE = 8		# future kW flex > 0
+FLAG_OCC = 16		# future kW flex > 0 at an occupied timestep
+
+
+def convert_series(values, factors = (), dtype = None):
+
+    # values * each factor in turn, in float64 (as the scripts' [j * a * b for j in ...] conversions)
+    # dtype = None returns a list of floats, np.float32 a compact array
+    x = np.asarray(values, dtype = np.float64)
+    for f in factors:
+        x = x * f
+    if dtype is None:
+        return x.tolist()
+    return x.astype(dtype)
+
+
+def rolling_sum(x, steps):
+
+    # Sums of x[t:t+steps] for t = 0 ... n-steps
+    s = np.concatenate(([0.0], np.cumsum(x, dtype = np.float64)))
+    return s[steps:] - s[:-steps]
+
+
+def rolling_max(x, steps):
+
+    # Max and first argmax of x[t:t+steps] for t = 0 ... n-steps
+    x = np.asarray(x, dtype = np.float64)
+    n = len(x)
+    if steps == 1:
+        return x.copy(), np.arange(n)
+
+    # Split into blocks of length steps - any window spans the tail of one block and the head of the next
+    nb = -(-n // steps)
+    xb = np.concatenate((x, np.full(nb * steps - n, -np.inf))).reshape(nb, steps)
+    idx = np.arange(nb * steps).reshape(nb, steps)
+
+    # Prefix max within each block, argmax = last position that set a new strict maximum
+    pre = np.maximum.accumulate(xb, axis = 1)
+    new = np.ones(xb.shape, dtype = bool)
+    new[:, 1:] = xb[:, 1:] > pre[:, :-1]
+    pre_arg = np.maximum.accumulate(np.where(new, idx, 0), axis = 1)
+
+    # Suffix max within each block, ties move the argmax left so the first occurrence wins
+    xr = xb[:, ::-1]
+    suf = np.maximum.accumulate(xr, axis = 1)
+    new = np.ones(xb.shape, dtype = bool)
+    new[:, 1:] = xr[:, 1:] >= suf[:, :-1]
+    suf_arg = np.minimum.accumulate(np.where(new, idx[:, ::-1], nb * steps), axis = 1)[:, ::-1].ravel()
+    suf = suf[:, ::-1].ravel()
+    pre = pre.ravel()
+    pre_arg = pre_arg.ravel()
+
+    m = n - steps + 1
+    left, left_arg = suf[:m], suf_arg[:m]
+    right, right_arg = pre[steps - 1:steps - 1 + m], pre_arg[steps - 1:steps - 1 + m]
+    take_left = left >= right
+    return np.where(take_left, left, right), np.where(take_left, left_arg, right_arg)
+
+
+def cooling_rate(rate_chill, rate_dchg, rate_chg):
+
+    # Cooling provided to the loop [tons]: chiller plus ice discharge, or chiller less ice charging
+    rate_chill = np.asarray(rate_chill, dtype = np.float64)
+    rate_chg = np.asarray(rate_chg, dtype = np.float64)
+    return np.where(rate_chg == 0, rate_chill + np.asarray(rate_dchg, dtype = np.float64), rate_chill - rate_chg)
+
+
+def ffill(values, valid):
+
+    # Forward fill values where valid is False (NaN before the first valid entry)
+    pos = np.where(valid, np.arange(len(values)), -1)
+    pos = np.maximum.accumulate(pos)
+    out = np.where(pos >= 0, values[np.maximum(pos, 0)], np.nan)
+    return out
+
+
+def shed_flex(pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp, occ,
+              ice_cap, window, ts_per_hr, start, stop, dtype = np.float64):
+
+    # Load shed flexibility for timesteps start ... stop-1 and every window [hr]
+    # Series are per-timestep arrays over the whole run: power [kW], cooling rates [tons], soc [-], temps [C].
+    # Returns a dict of (window x timestep) traces and per-window counters/sums named as in flex.py. The avg_*
+    # entries are sums - divide by the matching counters as flex.py does. Traces are returned as dtype.
+    pwr_facil = np.asarray(pwr_facil, dtype = np.float64)
+    pwr_facil_wo_chill = pwr_facil - np.asarray(pwr_chill, dtype = np.float64)
+    rate_cool = cooling_rate(rate_chill, rate_dchg, rate_chg)
+    soc = np.asarray(soc, dtype = np.float64)
+    return_temp = np.asarray(return_temp, dtype = np.float64)
+    supply_temp = np.asarray(supply_temp, dtype = np.float64)
+    occ = np.asarray(occ, dtype = bool)
+
+    n_all = len(pwr_facil)
+    steps_all = [int(w * ts_per_hr) for w in window]
+    if stop - 1 + max(steps_all) >= n_all:
+        raise ValueError('Analysis period plus the longest flex window runs past the end of the data.')
+
+    t = np.arange(start, stop)
+    n = len(t)
+    W = len(window)
+    S_cool = np.concatenate(([0.0], np.cumsum(rate_cool)))
+
+    out = {name: np.zeros((W, n), dtype = dtype) for name in ['kw_tr', 'kw_future_tr', 'kwh_tr', 'no_flex_soc_tr']}
+    out['soc_at_end'] = np.zeros((W, n))
+    flags = np.zeros((W, n), dtype = np.int8)
+    e_ok = np.zeros((W, n), dtype = bool)
+    m_start = ice_performance_array(soc[t], return_temp[t], supply_temp[t], ice_cap, 0)
+    parts = []
+
+    for i, (w, steps) in enumerate(zip(window, steps_all)):
+        end = t + steps
+
+        # Cooling over the window [tons, ton-hours] and its peak
+        load_cool = rolling_sum(rate_cool, steps)[t] / ts_per_hr
+        pk_cool, pk_arg = rolling_max(rate_cool, steps)
+        pk_cool = pk_cool[t]
+        pk_c_ts = pk_arg[t] + 1
+        load_cool_to_pk = S_cool[pk_c_ts] - S_cool[t]
+
+        # Facility power over the window [kW, kWh]
+        load_elec = rolling_sum(pwr_facil, steps)[t] / ts_per_hr
+        load_e_no_chill = rolling_sum(pwr_facil_wo_chill, steps)[t] / ts_per_hr
+        pk_elec = rolling_max(pwr_facil, steps)[0][t]
+        new_max_kw = rolling_max(pwr_facil_wo_chill, steps)[0][t]
+
+        # Cooling energy remaining in the tank
+        avail_cap = ice_cap * soc[t]
+        e_ok[i] = avail_cap > load_cool
+        out['soc_at_end'][i] = (avail_cap - load_cool) / ice_cap
+        soc_at_peak = (avail_cap - load_cool_to_pk) / ice_cap
+        parts.append((w, steps, end, load_cool, pk_cool, pk_c_ts, soc_at_peak, load_elec, load_e_no_chill, pk_elec,
+                      new_max_kw))
+        out['no_flex_soc_tr'][i] = soc[end]
+
+    # soc_at_end carries over from the previous (timestep, window) pass when the energy check fails
+    flat = ffill(out['soc_at_end'].T.ravel(), e_ok.T.ravel())
+    soc_at_end = flat.reshape(n, W).T
+
+    res = {'no_rate_counter': np.zeros(W, dtype = int), 'no_soc_counter': np.zeros(W, dtype = int),
+           'total_counter': np.zeros(W, dtype = int), 'flex_counter': np.zeros(W, dtype = int),
+           'flex_future_counter': np.zeros(W, dtype = int), 'occ_flex_counter': np.zeros(W, dtype = int),
+           'avg_flex': np.zeros(W), 'avg_flex_future': np.zeros(W), 'avg_occ_flex': np.zeros(W),
+           'avg_kwh_flex': np.zeros(W)}
+
+    for i, (w, steps, end, load_cool, pk_cool, pk_c_ts, soc_at_peak, load_elec, load_e_no_chill, pk_elec,
+            new_max_kw) in enumerate(parts):
+
+        # Cooling rate the ice can provide at the start, peak, and end of the window
+        m_peak = ice_performance_array(soc_at_peak, return_temp[pk_c_ts], supply_temp[pk_c_ts], ice_cap, 0)
+        m_end = ice_performance_array(soc_at_end[i], return_temp[end], supply_temp[end], ice_cap, 0)
+        with np.errstate(invalid = 'ignore'):
+            p_ok = ((m_start + m_end) / 2 * w >= load_cool) & (m_peak > pk_cool) & (m_end > rate_cool[end - 1])
+
+        ok = e_ok[i] & p_ok
+        kwh_flex = np.where(ok, load_elec - load_e_no_chill, 0)
+        kw_flex = np.where(ok, pwr_facil[t] - new_max_kw, 0)
+        kw_future = np.where(ok, pk_elec - new_max_kw, 0)
+        fut = kw_future > 0
+        cur = kw_flex > 0
+        kw_future = np.where(fut, kw_future, 0)
+        kw_flex = np.where(cur, kw_flex, 0)
+        occ_fut = fut & occ[t]
+        flags[i] = (FLAG_ENERGY * e_ok[i] + FLAG_RATE * p_ok + FLAG_FLEX * cur + FLAG_FUTURE * fut
+                    + FLAG_OCC * occ_fut)
+
+        res['no_soc_counter'][i] = np.count_nonzero(~e_ok[i])
+        res['no_rate_counter'][i] = np.count_nonzero(~p_ok)
+        res['total_counter'][i] = np.count_nonzero(ok)
+        res['flex_future_counter'][i] = np.count_nonzero(fut)
+        res['flex_counter'][i] = np.count_nonzero(cur)
+        res['occ_flex_counter'][i] = np.count_nonzero(occ_fut)
+        res['avg_flex'][i] = np.sum(kw_flex)
+        res['avg_flex_future'][i] = np.sum(kw_future)
+        res['avg_occ_flex'][i] = np.sum(kw_future[occ_fut])
+        res['avg_kwh_flex'][i] = np.sum(kwh_flex[occ_fut])
+
+        out['kw_tr'][i] = -kw_flex
+        out['kw_future_tr'][i] = kw_future
+        out['kwh_tr'][i] = kwh_flex
+
+    res['kw_tr'] = out['kw_tr']
+    res['kw_future_tr'] = out['kw_future_tr']
+    res['kwh_tr'] = out['kwh_tr']
+    res['post_flex_soc_tr'] = soc_at_end.astype(dtype, copy = False)
+    res['no_flex_soc_tr'] = out['no_flex_soc_tr']
+    res['flags'] = flags
+    return res
+
+
+def add_flex(rate_chill, rate_dchg, rate_chg, soc, chg_supply_temp, chg_return_temp, occ, ice_cap, chiller_cap,
+             chiller_COP, window, ts_per_hr, start, stop, min_cap = 0, dtype = np.float64):
+
+    # Load add flexibility [kW] for timesteps start ... stop-1 and every window [hr]
+    # Added load is chiller work the plant could take on over the window:
+    #   - shift: cooling the ice was providing is picked back up by the chiller, up to chiller_cap
+    #   - charge: spare chiller capacity used to charge the tank, limited by the charge rate curve at the current SOC
+    #     and by the room left in the tank at the end of the window
+    # chg_supply_temp / chg_return_temp are the brine temperatures entering/leaving the tank while charging [C].
+    # Timesteps where the chiller would run below min_cap [tons] (min PLR) after the added load add nothing.
+    # Returns (window x timestep) add and add_occ traces as dtype, plus per-window counters and sums named as in flex.py.
+    rate_chill = np.asarray(rate_chill, dtype = np.float64)
+    rate_chg = np.asarray(rate_chg, dtype = np.float64)
+    rate_cool = cooling_rate(rate_chill, rate_dchg, rate_chg)
+    soc = np.asarray(soc, dtype = np.float64)
+    occ = np.asarray(occ, dtype = bool)
+
+    n_all = len(rate_cool)
+    steps_all = [int(w * ts_per_hr) for w in window]
+    if stop - 1 + max(steps_all) >= n_all:
+        raise ValueError('Analysis period plus the longest flex window runs past the end of the data.')
+
+    # Per-timestep headroom [tons]
+    served = np.minimum(rate_cool, chiller_cap)
+    shift = np.maximum(served - (rate_chill - rate_chg), 0)
+    spare = np.maximum(chiller_cap - served - rate_chg, 0)
+    chg_max = ice_performance_array(soc, chg_return_temp, chg_supply_temp, ice_cap, 1)
+    charge = np.minimum(spare, np.maximum(chg_max - rate_chg, 0))
+    runs = served + rate_chg + charge >= min_cap
+    shift = np.where(runs, shift, 0)
+    charge = np.where(runs, charge, 0)
+
+    t = np.arange(start, stop)
+    W = len(window)
+    res = {'add': np.zeros((W, len(t)), dtype = dtype), 'add_occ': np.zeros((W, len(t)), dtype = dtype),
+           'add_counter': np.zeros(W, dtype = int), 'add_occ_counter': np.zeros(W, dtype = int),
+           'avg_add': np.zeros(W), 'avg_add_occ': np.zeros(W)}
+
+    for i, (w, steps) in enumerate(zip(window, steps_all)):
+
+        # Energy over the window [ton-hours]
+        e_shift = rolling_sum(shift, steps)[t] / ts_per_hr
+        e_charge = rolling_sum(charge, steps)[t] / ts_per_hr
+
+        # Tank room at the end of the window once the shifted discharge stays in the tank
+        room = np.maximum((1 - soc[t + steps]) * ice_cap - e_shift, 0)
+        e_add = e_shift + np.minimum(e_charge, room)
+
+        # Average added chiller power over the window [tons -> kW]
+        add = e_add / w / 0.2843451 / chiller_COP
+        add_occ = np.where(occ[t], add, 0)
+
+        res['add'][i] = add
+        res['add_occ'][i] = add_occ
+        res['add_counter'][i] = np.count_nonzero(add > 0)
+        res['add_occ_counter'][i] = np.count_nonzero(add_occ > 0)
+        res['avg_add'][i] = np.sum(add)
+        res['avg_add_occ'][i] = np.sum(add_occ)
+
+    return res
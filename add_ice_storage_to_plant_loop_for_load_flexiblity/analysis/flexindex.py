@@ -0,0 +1,129 @@
+# Flex Query Index
+# Ice measure analysis tools
+
+# This module answers ad-hoc shed flexibility queries - "starting at timestep t, over an h hour horizon" - for any
+# horizon, not only the window list of flex.py. Range maxima come from sparse tables (max and first argmax over every
+# power-of-two span, combined from two overlapping blocks) and range sums from prefix sums, all built once. A query
+# is then a handful of array lookups, so batches of (start, horizon) pairs are answered without rescanning the series.
+#
+#   idx = FlexIndex(pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp, ice_cap,
+#                   ts_per_hr)
+#   q = idx.query(t, 2.5)						# scalars
+#   q = idx.query(t_array, horizon_array)		# batch, broadcast together
+#
+# Query results use the flex.py definitions (kW flex is reported as a positive reduction) and apply the same ice
+# energy and discharge rate checks as flexcalc.shed_flex, so a query at one of the flex.py windows reproduces its
+# kw_tr / kw_future_tr / kwh_tr values.
+
+import numpy as np
+
+from performance import ice_performance_array
+from flexcalc import cooling_rate
+
+
+class SparseTable:
+
+    # O(n log n) build, O(1) range max with the first occurrence argmax
+    # arg[k, i] = first argmax of x[i:i + 2**k] (rows are padded with zeros past n - 2**k)
+    def __init__(self, x):
+        self.x = np.asarray(x, dtype = np.float64)
+        n = len(self.x)
+        levels = max(int(n).bit_length(), 1)
+        self.arg = np.zeros((levels, n), dtype = np.int32)
+        self.arg[0] = np.arange(n)
+        for k in range(1, levels):
+            span = 1 << (k - 1)
+            a = self.arg[k - 1, :n - 2 * span + 1]
+            b = self.arg[k - 1, span:n - span + 1]
+            self.arg[k, :n - 2 * span + 1] = np.where(self.x[a] >= self.x[b], a, b)
+
+    def argmax(self, start, stop):
+        # First argmax of x[start:stop] (stop > start), start and stop broadcast together
+        start = np.asarray(start)
+        stop = np.asarray(stop)
+        k = np.frexp(stop - start)[1] - 1		# floor(log2(length)), exact for integers
+        a = self.arg[k, start]
+        b = self.arg[k, stop - np.left_shift(1, k)]
+        return np.where(self.x[a] >= self.x[b], a, b)
+
+    def max(self, start, stop):
+        return self.x[self.argmax(start, stop)]
+
+
+class FlexIndex:
+
+    def __init__(self, pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp,
+                 ice_cap, ts_per_hr):
+        self.pwr_facil = np.asarray(pwr_facil, dtype = np.float64)
+        self.pwr_facil_wo_chill = self.pwr_facil - np.asarray(pwr_chill, dtype = np.float64)
+        self.rate_cool = cooling_rate(rate_chill, rate_dchg, rate_chg)
+        self.soc = np.asarray(soc, dtype = np.float64)
+        self.return_temp = np.asarray(return_temp, dtype = np.float64)
+        self.supply_temp = np.asarray(supply_temp, dtype = np.float64)
+        self.ice_cap = ice_cap
+        self.ts_per_hr = ts_per_hr
+
+        # Range max tables
+        self.max_facil = SparseTable(self.pwr_facil)
+        self.max_wo_chill = SparseTable(self.pwr_facil_wo_chill)
+        self.max_cool = SparseTable(self.rate_cool)
+
+        # Prefix sums (leading zero so sum(x[a:b]) = S[b] - S[a])
+        self.sum_facil = np.concatenate(([0.0], np.cumsum(self.pwr_facil)))
+        self.sum_wo_chill = np.concatenate(([0.0], np.cumsum(self.pwr_facil_wo_chill)))
+        self.sum_cool = np.concatenate(([0.0], np.cumsum(self.rate_cool)))
+
+        # Discharge rate available at every timestep with no flex event
+        self.m_now = ice_performance_array(self.soc, self.return_temp, self.supply_temp, ice_cap, 0)
+
+    def __len__(self):
+        return len(self.pwr_facil)
+
+    def query(self, start, horizon):
+
+        # start: timestep index, horizon: [hr]. Returns a dict of arrays (or scalars):
+        #   kw_flex: current kW reduction, kw_future: reduction of the peak kW over the horizon,
+        #   kwh_flex: chiller kWh avoided over the horizon, post_flex_soc: SOC at the end if the shed happens,
+        #   ok: ice can carry the full cooling load over the horizon (energy and rate)
+        t = np.asarray(start, dtype = np.int64)
+        steps = (np.asarray(horizon, dtype = np.float64) * self.ts_per_hr).astype(np.int64)
+        t, steps = np.broadcast_arrays(t, steps)
+        if np.any(steps < 1):
+            raise ValueError('Flex horizon must cover at least one timestep.')
+        if np.any(t < 0) or np.any(t + steps >= len(self)):
+            raise ValueError('Query start plus horizon runs past the end of the data.')
+        end = t + steps
+        hours = steps / self.ts_per_hr
+
+        # Cooling over the horizon and its peak
+        load_cool = (self.sum_cool[end] - self.sum_cool[t]) / self.ts_per_hr
+        pk_c_ts = self.max_cool.argmax(t, end) + 1
+        pk_cool = self.rate_cool[pk_c_ts - 1]
+        load_cool_to_pk = self.sum_cool[pk_c_ts] - self.sum_cool[t]
+
+        # Ice energy and discharge rate checks (as flexcalc.shed_flex)
+        avail_cap = self.ice_cap * self.soc[t]
+        e_ok = avail_cap > load_cool
+        soc_at_end = (avail_cap - load_cool) / self.ice_cap
+        soc_at_peak = (avail_cap - load_cool_to_pk) / self.ice_cap
+        m_peak = ice_performance_array(soc_at_peak, self.return_temp[pk_c_ts], self.supply_temp[pk_c_ts],
+                                       self.ice_cap, 0)
+        m_end = ice_performance_array(soc_at_end, self.return_temp[end], self.supply_temp[end], self.ice_cap, 0)
+        with np.errstate(invalid = 'ignore'):
+            p_ok = (((self.m_now[t] + m_end) / 2 * hours >= load_cool) & (m_peak > pk_cool)
+                    & (m_end > self.rate_cool[end - 1]))
+        ok = e_ok & p_ok
+
+        # Electric flex
+        new_max_kw = self.max_wo_chill.max(t, end)
+        pk_elec = self.max_facil.max(t, end)
+        kwh = ((self.sum_facil[end] - self.sum_facil[t]) - (self.sum_wo_chill[end] - self.sum_wo_chill[t])) \
+            / self.ts_per_hr
+        kw_flex = np.where(ok, self.pwr_facil[t] - new_max_kw, 0)
+        kw_future = np.where(ok, pk_elec - new_max_kw, 0)
+
+        return {'kw_flex': np.maximum(kw_flex, 0),
+                'kw_future': np.maximum(kw_future, 0),
+                'kwh_flex': np.where(ok, kwh, 0),
+                'post_flex_soc': np.where(e_ok, soc_at_end, np.nan),
+                'ok': ok}
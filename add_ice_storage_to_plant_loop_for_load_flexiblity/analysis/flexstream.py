@@ -0,0 +1,246 @@
+# Streaming Flex Estimator
+# Ice measure analysis tools
+
+# This module runs the flex.py calculations on a live feed, one timestep at a time. Only the last (longest window + 2)
+# timesteps are kept in ring buffers, so memory is bounded regardless of how long the stream runs. Window sums come
+# from running prefix sums and window maxima from one monotonic deque per series (all windows end at the same
+# timestep, so every window max is a binary search in the same deque). The deques are preallocated index arrays with
+# head/tail positions, so each update costs O(1) amortized per series plus O(log steps) per window.
+#
+# Flex at timestep t needs the data of its whole window, so the result for a window of steps timesteps refers to the
+# start t = newest - steps. Push measured data to get flex after the fact, or push a forecast ahead of real time to
+# get flex for the coming window.
+#
+#   fs = FlexStream(window, ts_per_hr, ice_cap, chiller_cap, chiller_COP, min_cap, chg_temps)
+#   for each timestep: fs.update(pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp,
+#                                supply_temp, occ)
+#   fs.flex()				# latest result per window
+#   fs.summary()			# running counters and averages, as printed by flex.py
+#
+# stop limits the counters to windows (and occupied timesteps) starting before that many timesteps into the stream,
+# e.g. the length of an analysis period replayed with the extra data its last windows need.
+#
+# Shed/add values match flexcalc.shed_flex / add_flex for the same timesteps. The no rate counter can differ where the
+# tank energy check also fails, since the batch loop carried a stale end-of-window SOC into that rate check.
+
+import numpy as np
+
+from performance import ice_performance_array
+
+
+class FlexStream:
+
+    def __init__(self, window, ts_per_hr, ice_cap, chiller_cap = None, chiller_COP = None, min_cap = 0,
+                 chg_temps = (-3.88, -1.1), stop = None):
+        self.window = list(window)
+        self.ts_per_hr = ts_per_hr
+        self.steps = np.array([int(w * ts_per_hr) for w in window])
+        self.hours = self.steps / ts_per_hr
+        self.max_steps = int(self.steps.max())
+        self.size = self.max_steps + 2		# window, its end point, and the prefix sum before the window
+        self.ice_cap = ice_cap
+        self.chiller_cap = chiller_cap		# None skips the load add calcs
+        self.chiller_COP = chiller_COP
+        self.min_cap = min_cap
+        self.chg_temps = chg_temps
+        self.stop = stop		# None counts every window start
+        self.n = 0
+
+        # Ring buffers indexed by timestep % size, prefix sums P[i] = sum of x[0:i] at i % size
+        ring = ['pwr_facil', 'wo_chill', 'rate_cool', 'soc', 'return_temp', 'supply_temp']
+        self.ring = {k: np.zeros(self.size) for k in ring}
+        self.occ = np.zeros(self.size, dtype = bool)
+        prefix = ['facil', 'wo_chill', 'cool', 'shift', 'charge']
+        self.prefix = {k: np.zeros(self.size) for k in prefix}
+        self.total = {k: 0.0 for k in prefix}
+
+        # Monotonic deques of timestep indices (values non-increasing front to back, first maximum kept in front),
+        # stored as buf[head:tail] and moved back to the front of buf when tail reaches its end
+        self.deques = {k: [np.zeros(2 * self.size, dtype = np.int64), 0, 0]
+                       for k in ['pwr_facil', 'wo_chill', 'rate_cool']}
+
+        W = len(self.window)
+        self.counters = {k: np.zeros(W, dtype = int) for k in ['no_rate_counter', 'no_soc_counter', 'total_counter',
+                         'flex_counter', 'flex_future_counter', 'occ_flex_counter', 'add_counter', 'add_occ_counter']}
+        self.sums = {k: np.zeros(W) for k in ['avg_flex', 'avg_flex_future', 'avg_occ_flex', 'avg_kwh_flex',
+                     'avg_add', 'avg_add_occ']}
+        self.occ_counter = 0
+        self.last = None
+
+    def update(self, pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp,
+               occ = False):
+
+        # Push one timestep: power [kW], cooling rates [tons], soc [-], loop temps [C], occupied flag
+        t = self.n
+        k = t % self.size
+        rate_cool = rate_chill + rate_dchg if rate_chg == 0 else rate_chill - rate_chg
+
+        r = self.ring
+        r['pwr_facil'][k] = pwr_facil
+        r['wo_chill'][k] = pwr_facil - pwr_chill
+        r['rate_cool'][k] = rate_cool
+        r['soc'][k] = soc
+        r['return_temp'][k] = return_temp
+        r['supply_temp'][k] = supply_temp
+        self.occ[k] = occ
+        self.occ_counter += bool(occ) and (self.stop is None or t < self.stop)
+
+        # Load add headroom at this timestep [tons] (as flexcalc.add_flex)
+        shift = charge = 0.0
+        if self.chiller_cap is not None:
+            served = min(rate_cool, self.chiller_cap)
+            spare = max(self.chiller_cap - served - rate_chg, 0)
+            chg_max = ice_performance_array(soc, self.chg_temps[1], self.chg_temps[0], self.ice_cap, 1)
+            charge = min(spare, max(chg_max - rate_chg, 0))
+            if served + rate_chg + charge >= self.min_cap:
+                shift = max(served - (rate_chill - rate_chg), 0)
+            else:
+                charge = 0.0
+
+        # Prefix sums up to and including this timestep
+        for name, x in [('facil', pwr_facil), ('wo_chill', pwr_facil - pwr_chill), ('cool', rate_cool),
+                        ('shift', shift), ('charge', charge)]:
+            self.total[name] += x
+            self.prefix[name][(t + 1) % self.size] = self.total[name]
+
+        # Windows end (exclusive) at the newest timestep - add the previous one to the max deques
+        if t > 0:
+            for name, dq in self.deques.items():
+                buf, head, tail = dq
+                x = r[name]
+                v = x[(t - 1) % self.size]
+                while tail > head and x[buf[tail - 1] % self.size] < v:
+                    tail -= 1
+                if tail == len(buf):
+                    buf[:tail - head] = buf[head:tail]
+                    head, tail = 0, tail - head
+                buf[tail] = t - 1
+                tail += 1
+                while buf[head] < t - 1 - self.max_steps:
+                    head += 1
+                dq[1], dq[2] = head, tail
+
+        self.n = t + 1
+        if t >= self.steps.min():
+            self.last = self.evaluate()
+        return self.last
+
+    def window_max(self, name, start):
+        # First maximum of series name over [start, newest) for every window start - returns (max, index)
+        buf, head, tail = self.deques[name]
+        dq = buf[head:tail]
+        idx = dq[np.searchsorted(dq, start)]
+        return self.ring[name][idx % self.size], idx
+
+    def window_sum(self, name, start, end):
+        return self.prefix[name][end % self.size] - self.prefix[name][start % self.size]
+
+    def evaluate(self):
+
+        # Flex for the window starting at newest - steps, for every window with enough data
+        end = self.n - 1
+        valid = self.steps <= end
+        start = np.where(valid, end - self.steps, end - 1)
+        size = self.size
+        r = self.ring
+        ts_per_hr = self.ts_per_hr
+        ice_cap = self.ice_cap
+
+        # Cooling over the window and its peak
+        load_cool = self.window_sum('cool', start, end) / ts_per_hr
+        pk_cool, pk = self.window_max('rate_cool', start)
+        pk_c_ts = pk + 1
+        load_cool_to_pk = self.window_sum('cool', start, pk_c_ts)
+
+        # Tank energy and discharge rate checks
+        avail_cap = ice_cap * r['soc'][start % size]
+        e_ok = avail_cap > load_cool
+        soc_at_end = (avail_cap - load_cool) / ice_cap
+        soc_at_peak = (avail_cap - load_cool_to_pk) / ice_cap
+
+        # Discharge rate at the start, peak and end of every window in one curve evaluation
+        W = len(start)
+        at = np.concatenate((start, pk_c_ts, np.full(W, end))) % size
+        m = ice_performance_array(np.concatenate((r['soc'][start % size], soc_at_peak, soc_at_end)),
+                                  r['return_temp'][at], r['supply_temp'][at], ice_cap, 0)
+        m_start, m_peak, m_end = m[:W], m[W:2 * W], m[2 * W:]
+        with np.errstate(invalid = 'ignore'):
+            p_ok = (((m_start + m_end) / 2 * self.hours >= load_cool) & (m_peak > pk_cool)
+                    & (m_end > r['rate_cool'][(end - 1) % size]))
+        ok = e_ok & p_ok
+
+        # Electric flex
+        new_max_kw = self.window_max('wo_chill', start)[0]
+        pk_elec = self.window_max('pwr_facil', start)[0]
+        kwh = (self.window_sum('facil', start, end) - self.window_sum('wo_chill', start, end)) / ts_per_hr
+        kwh_flex = np.where(ok, kwh, 0)
+        kw_flex = np.maximum(np.where(ok, r['pwr_facil'][start % size] - new_max_kw, 0), 0)
+        kw_future = np.maximum(np.where(ok, pk_elec - new_max_kw, 0), 0)
+        occ = self.occ[start % size]
+        fut = kw_future > 0
+        occ_fut = fut & occ
+
+        counted = valid if self.stop is None else valid & (start < self.stop)
+        res = {'start': np.where(valid, start, -1), 'ok': ok & valid, 'kw_flex': kw_flex, 'kw_future': kw_future,
+               'kwh_flex': kwh_flex, 'post_flex_soc': np.where(e_ok, soc_at_end, np.nan)}
+
+        c = self.counters
+        s = self.sums
+        c['no_soc_counter'] += counted & ~e_ok
+        c['no_rate_counter'] += counted & ~p_ok
+        c['total_counter'] += counted & ok
+        c['flex_counter'] += counted & (kw_flex > 0)
+        c['flex_future_counter'] += counted & fut
+        c['occ_flex_counter'] += counted & occ_fut
+        s['avg_flex'] += np.where(counted, kw_flex, 0)
+        s['avg_flex_future'] += np.where(counted, kw_future, 0)
+        s['avg_occ_flex'] += np.where(counted & occ_fut, kw_future, 0)
+        s['avg_kwh_flex'] += np.where(counted & occ_fut, kwh_flex, 0)
+
+        # Load add - chiller picks up the ice discharge and charges the tank (as flexcalc.add_flex)
+        if self.chiller_cap is not None:
+            e_shift = self.window_sum('shift', start, end) / ts_per_hr
+            e_charge = self.window_sum('charge', start, end) / ts_per_hr
+            room = np.maximum((1 - r['soc'][end % size]) * ice_cap - e_shift, 0)
+            add = (e_shift + np.minimum(e_charge, room)) / self.hours / 0.2843451 / self.chiller_COP
+            add_occ = np.where(occ, add, 0)
+            res['add'] = add
+            res['add_occ'] = add_occ
+            c['add_counter'] += counted & (add > 0)
+            c['add_occ_counter'] += counted & (add_occ > 0)
+            s['avg_add'] += np.where(counted, add, 0)
+            s['avg_add_occ'] += np.where(counted, add_occ, 0)
+
+        return res
+
+    def flex(self):
+        # Latest result per window (None until the shortest window has data)
+        if self.last is None:
+            return None
+        return {f'{w} Hr': {k: v[i] for k, v in self.last.items()} for i, w in enumerate(self.window)}
+
+    def summary(self):
+        # Running counters [timesteps] and averages, divided as in flex.py
+        c = self.counters
+        s = self.sums
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            out = {k: v.tolist() for k, v in c.items()}
+            out['avg_flex'] = np.where(c['flex_counter'] != 0, s['avg_flex'] / c['flex_counter'], 0).tolist()
+            out['avg_flex_future'] = np.where(c['flex_future_counter'] != 0,
+                                              s['avg_flex_future'] / c['flex_future_counter'], 0).tolist()
+            out['avg_occ_flex'] = np.where(c['occ_flex_counter'] != 0,
+                                           s['avg_occ_flex'] / c['occ_flex_counter'], 0).tolist()
+            out['avg_kwh_flex'] = np.where(c['occ_flex_counter'] != 0,
+                                           s['avg_kwh_flex'] / c['occ_flex_counter'], 0).tolist()
+            out['avg_add'] = np.where(c['add_counter'] != 0, s['avg_add'] / c['add_counter'], 0).tolist()
+            out['avg_add_occ'] = np.where(c['add_occ_counter'] != 0,
+                                          s['avg_add_occ'] / c['add_occ_counter'], 0).tolist()
+        out['occ_counter'] = self.occ_counter
+        return out
+
+
+def replay(stream, pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp, occ):
+
+    # Feed recorded series (e.g. loaded from an eso) through a FlexStream one timestep at a time, yielding each result
+    for row in zip(pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc, return_temp, supply_temp, occ):
+        yield stream.update(*[float(v) for v in row[:-1]], bool(row[-1]))
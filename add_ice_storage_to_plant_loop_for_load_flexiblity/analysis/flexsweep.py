@@ -0,0 +1,106 @@
+# Flex Parameter Sweep
+# Ice measure analysis tools
+
+# This module evaluates the flex.py metrics over a grid of design parameters on one loaded dataset. Load shed
+# results depend only on ice_cap and load add results on (ice_cap, chiller_cap, min PLR); added kW scales with
+# 1/COP, so every COP of the grid is broadcast from one add evaluation. One shed task per ice_cap and one add task per
+# (ice_cap, chiller_cap, min PLR) share a pool of forked processes that inherit the series from the parent instead of
+# receiving a copy per task.
+#
+#   table = sweep(series, grid, window, ts_per_hr, an_pd[0], an_pd[1], occ)
+#   table.to_csv('flex_sweep.csv', index = False)
+#
+# series: dict of the flex.py per-timestep arrays (pwr_facil, pwr_chill, rate_chill, rate_dchg, rate_chg, soc,
+# return_temp, supply_temp) plus chg_temps. grid: dict of ice_cap, chiller_cap, chiller_COP, min_plr value lists.
+# The table has one row per grid point and window with the averages and counters ([hr]) printed by flex.py.
+
+import itertools
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+from flexcalc import shed_flex, add_flex
+
+SERIES = ['pwr_facil', 'pwr_chill', 'rate_chill', 'rate_dchg', 'rate_chg', 'soc', 'return_temp', 'supply_temp']
+
+worker_args = None		# (series, window, ts_per_hr, start, stop, occ) inherited by forked workers
+
+
+def sweep(series, grid, window, ts_per_hr, start, stop, occ, processes = None):
+
+    global worker_args
+    arrays = {k: np.asarray(series[k], dtype = np.float64) for k in SERIES}
+    arrays['chg_temps'] = series['chg_temps']
+    worker_args = (arrays, window, ts_per_hr, start, stop, np.asarray(occ, dtype = bool))
+
+    ice_caps = list(grid['ice_cap'])
+    add_keys = list(itertools.product(ice_caps, grid['chiller_cap'], grid['min_plr']))
+
+    if processes is None:
+        processes = mp.cpu_count()
+    processes = min(processes, len(ice_caps) + len(add_keys))
+    if processes > 1 and 'fork' in mp.get_all_start_methods():
+        with mp.get_context('fork').Pool(processes) as pool:
+            shed = pool.map_async(sweep_shed, ice_caps)
+            added = pool.starmap_async(sweep_add, add_keys)
+            shed, added = shed.get(), added.get()
+    else:
+        shed = [sweep_shed(ice_cap) for ice_cap in ice_caps]
+        added = [sweep_add(*key) for key in add_keys]
+    worker_args = None
+
+    # One row per grid point and window, in grid order
+    shed = dict(zip(ice_caps, shed))
+    W = len(window)
+    n_occ = np.count_nonzero(occ[start:stop])
+    rows = []
+    for (ice_cap, chiller_cap, min_plr), add in zip(add_keys, added):
+        for cop in grid['chiller_COP']:
+            rows.append(pd.DataFrame({'ice_cap': ice_cap, 'chiller_cap': chiller_cap, 'chiller_COP': cop,
+                                      'min_plr': min_plr, 'window': window, **shed[ice_cap],
+                                      'add_hr': add['add_hr'],
+                                      'avg_add': add['avg_add'] / cop,
+                                      'add_occ_hr': add['add_occ_hr'],
+                                      'avg_add_occ': add['avg_add_occ'] / cop,
+                                      'occ_hr': np.full(W, n_occ / ts_per_hr)}))
+
+    return pd.concat(rows, ignore_index = True)
+
+
+def sweep_shed(ice_cap):
+
+    # Load shed columns of one ice_cap
+    series, window, ts_per_hr, start, stop, occ = worker_args
+    s = series
+    shed = shed_flex(s['pwr_facil'], s['pwr_chill'], s['rate_chill'], s['rate_dchg'], s['rate_chg'], s['soc'],
+                     s['return_temp'], s['supply_temp'], occ, ice_cap, window, ts_per_hr, start, stop)
+    return {'flex_hr': shed['flex_counter'] / ts_per_hr,
+            'avg_flex': mean(shed['avg_flex'], shed['flex_counter']),
+            'avg_flex_future': mean(shed['avg_flex_future'], shed['flex_future_counter']),
+            'occ_flex_hr': shed['occ_flex_counter'] / ts_per_hr,
+            'avg_occ_flex': mean(shed['avg_occ_flex'], shed['occ_flex_counter']),
+            'avg_kwh_flex': np.where(shed['flex_counter'] != 0,
+                                     mean(shed['avg_kwh_flex'], shed['occ_flex_counter']), 0),
+            'total_flex_hr': shed['total_counter'] / ts_per_hr,
+            'no_rate_hr': shed['no_rate_counter'] / ts_per_hr,
+            'no_soc_hr': shed['no_soc_counter'] / ts_per_hr}
+
+
+def sweep_add(ice_cap, chiller_cap, min_plr):
+
+    # Load add columns of one (ice_cap, chiller_cap, min PLR) at COP = 1, scaled to each COP by the caller
+    series, window, ts_per_hr, start, stop, occ = worker_args
+    s = series
+    added = add_flex(s['rate_chill'], s['rate_dchg'], s['rate_chg'], s['soc'], s['chg_temps'][0],
+                     s['chg_temps'][1], occ, ice_cap, chiller_cap, 1, window, ts_per_hr, start, stop,
+                     min_plr * chiller_cap)
+    return {'add_hr': added['add_counter'] / ts_per_hr,
+            'avg_add': mean(added['avg_add'], added['add_counter']),
+            'add_occ_hr': added['add_occ_counter'] / ts_per_hr,
+            'avg_add_occ': mean(added['avg_add_occ'], added['add_occ_counter'])}
+
+
+def mean(total, count):
+
+    # Sum / count, 0 where the count is 0 (as the flex.py averaging loop)
+    return np.where(count != 0, total / np.maximum(count, 1), 0)
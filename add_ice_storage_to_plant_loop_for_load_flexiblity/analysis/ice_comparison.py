@@ -12,13 +12,26 @@
 import os
 import sys
 import calendar
-import esoreader
 import pandas as pd
 import numpy as np
-import plotly
 import plotly.graph_objs as go
 from plotly import subplots
 
+# External Functions
+from esocache import load_eso
+import calstats
+import ldc
+import icestats
+import chillerstats
+import emsevents
+import runcompare
+import peakindex
+import plotting
+import results
+import multirun
+from rundata import RunData
+import seriesstore
+
 # [Name of .eso file, Ice Capacity [ton-hrs], Description]
 runs = [#['SS47L15_6_68', 2000, 'Ice - 60% Chiller, 68% Limiter'],
 		['SS47L15_6_70', 2000, 'Ice - 60% Chiller, 70% Limiter'],
@@ -28,9 +41,13 @@ runs = [#['SS47L15_6_68', 2000, 'Ice - 60% Chiller, 68% Limiter'],
 		#['SSB15', 0, 'Baseline']]
 		#['SS-Base',0,'Baseline:']]
 
-#Set Timestep
-ts_per_hr = 4
+#Set Calendar Year - Timestep and Timestamps are Read from the ESO Time Records
+year = 2006
 ems = False
+ems_capacity = False		#Runs also report the 'Chiller Limited Capacity' EMS output (measure.rb)
+processes = None			#Worker Processes for the Ice Runs (None = one per CPU, 1 = serial)
+run_cache = True			#Reuse Per-Run Results Until the ESO or Analysis Code Changes (runcache/)
+shared_store = None			#Shared-Memory Series Store Name (seriesstore.py) - None = Load Privately
 
 f1 = False		#Cooling Rates and Ice SoC
 f2 = False		#Stacked Area Plot Totalling Ice and Chiller Cooling Rates - Unnecessary, already wrapped into fig 1
@@ -41,18 +58,23 @@ f6 = True		#Load Duration Curves
 f7 = False		#Max Demand Curves
 f8 = False		#Average Daily Electric Demand Profiles
 f9 = True		#Runtime and Average COP Values - KEEP ON
+compare = True	#Peak Reduction, Energy Penalty and On-Peak Shift of Every Run vs the Baseline (last run)
+native_profiles = False		#Average Day Profiles at the Native Timestep (False = Hourly)
+ld_points = None			#Points per Load Duration Curve Trace (None = Every Timestep)
+n_peaks = 5					#Top Facility Peaks Listed per Month and Year
+peak_spacing = 24			#Minimum Time Between Listed Peaks [hr]
+plot_points = 5000		#Max Points per Plotted Trace, LTTB Downsampled (None = Full Resolution)
+gl_points = 10000		#Traces Above This Many Points are Drawn with WebGL
+result_format = 'csv'	#Result Files: 'csv' (text) or 'npy' (binary), each with a .json manifest (results.py)
+
+# Shared Series Store - every analysis run with the same store name reuses one in-memory copy of the ESO columns
+loader = seriesstore.SeriesStore.open(shared_store).load_eso if shared_store else load_eso
 
 # X Axis Values
 x_m = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-x_dy = pd.date_range(start = pd.datetime(2006,1,1,0), end = pd.datetime(2006,12,31,23,59), freq = '1D')
 x_hr = pd.date_range(start = pd.datetime(2006,1,1,0), end = pd.datetime(2006,12,31,23,59), freq = '1H')
-x_ts = pd.date_range(start = pd.datetime(2006,1,1,0), end = pd.datetime(2006,12,31,23,59), freq = '15min')
-#x_ts = x_hr
 x_ld_dy = np.linspace(1,365,365)
 x_ld_hr = np.linspace(1,365*24,365*24)
-x_ld_ts = np.linspace(1,365*24*ts_per_hr,365*24*ts_per_hr)
-#x_24 = np.linspace(0,23.75,24*ts_per_hr)
-x_24 = np.linspace(0,23,24)
 
 # Set Discharge, Charge, and On-Peak Windows
 #dchg = [12, 18]
@@ -82,6 +104,11 @@ ice_name = 'THERMAL STORAGE ICE DETAILED 1'
 #chill_name = '90.1-2010 WATERCOOLED  CENTRIFUGAL CHILLER 0 618TONS 0.6KW/TON'		#Large Office
 chill_name = '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON'		#Secondary School
 
+# Chillers for Runtime and COP Statistics (list every chiller of a multi-chiller plant)
+chill_names = [chill_name]
+chiller_on = 2.0		#Cooling rate above which a chiller counts as running [tons]
+chill_caps = [456]		#Nominal Cooling Capacity of Each Chiller in chill_names [tons] - PLR Histograms (None = skip)
+
 # Plot Title Text
 title_text = 'Secondary School in CZ 2A'
 #title_text = 'Large Office in CZ 5B'
@@ -123,27 +150,59 @@ avg_sep = []
 avg_may = []
 avg_feb = []
 limiter = []
+elec_out = {}
+ld_out = {}
+profile_out = {}
+
+## Ice Tank Runs - Body for Run i, Executed for Every Ice Run by the Multi-Run Driver Below
+def ice_run(i):
 
-## Ice Tank Runs
-for i in range(len(runs)-1):
-	#break
 	print(runs[i][0])
 	print(' Loading ESO Data...')
-	dd, data = esoreader.read(paths[i])
+
+	# Variables Required from the ESO for the Selected Figures - (Frequency, Key, Variable)
+	selectors = []
+	if f1 or f2 or f4 or f9:
+		selectors += [('TimeStep', ice_name, 'Ice Thermal Storage Cooling Discharge Rate'),
+					('TimeStep', ice_name, 'Ice Thermal Storage Cooling Charge Rate'),
+					('TimeStep', ice_name, 'Ice Thermal Storage End Fraction'),
+					('TimeStep', chill_name, 'Chiller Evaporator Cooling Rate')]
+		if ems:
+			selectors += [('TimeStep', 'EMS', 'Chiller Limit Counter'),
+						('TimeStep', chill_name, 'Chiller Electric Energy')]
+		if ems and ems_capacity:
+			selectors.append(('TimeStep', 'EMS', 'Chiller Limited Capacity'))
+	if f3 or f6 or f7 or f8 or f9:
+		selectors += [('TimeStep', None, 'Electricity:Facility'),
+					('TimeStep', None, 'Electricity:Plant'),
+					('TimeStep', chill_name, 'Chiller Electric Energy')]
+	if f9:
+		for name in chill_names:
+			selectors += [('TimeStep', name, 'Chiller Evaporator Cooling Rate'),
+						('TimeStep', name, 'Chiller Electric Energy')]
+	if f5:
+		selectors += [('TimeStep', 'CHILLED WATER LOOP SUPPLY INLET NODE', 'System Node Temperature'),
+					('TimeStep', 'CHILLED WATER LOOP SUPPLY OUTLET NODE', 'System Node Temperature')]
+
+	dd, data = loader(paths[i], selectors)
+	run_data = RunData(dd, data)
 	print(' Data Load Complete.\n Performing Calculations...')
 
-	# Reset Select Variables
-	pl_dchg = []
-	pl_chg = []
-	pl_pk = []
-	pl_off = []
+	# Timestep Index and Calendar Masks from the ESO Time Records
+	cal = dd.time
+	ts_per_hr = cal.ts_per_hr
+	x_ts = cal.timestamps(year)
+	x_dy = cal.days(year)
+	wkdy = cal.weekday_mask(wknd)				# Weekday timesteps
+	in_dchg = cal.hour_mask(dchg[0], dchg[1])	# Discharge window hours
+	in_chg = cal.hour_mask(chg[0], chg[1])		# Charge window hours
+	in_peak = cal.hour_mask(peak[0], peak[1])	# On-peak hours
 
 	# Data for Figures 1, 2, and 4:
 	if f1 or f2 or f4 or f9:
 		# Ice Cooling Rate [W -> tons]
 		key = dd.index['TimeStep', ice_name, 'Ice Thermal Storage Cooling Discharge Rate']
-		vals = data[key]
-		vals = [k * 0.0002843451 for k in vals]		#tons
+		vals = run_data.get(key, 'tons')
 		ice_cool.append(go.Scatter(x = x_ts, y = vals,
 								   name = runs[i][2] + ' Ice Cooling Rate [tons]',
 								   #line = dict(color = '#b50b24', width = 1.5),
@@ -158,8 +217,7 @@ for i in range(len(runs)-1):
 
 	    # Ice Charging Rate [W]
 		key = dd.index['TimeStep', ice_name, 'Ice Thermal Storage Cooling Charge Rate']
-		vals = data[key]
-		vals = [k * 0.0002843451 for k in vals]		#tons
+		vals = run_data.get(key, 'tons')
 		ice_chrg.append(go.Scatter(x = x_ts, y = vals,
 								   legendgroup = str(i),
 								   #line = dict(color = '#b50b24', width = 1.5),
@@ -181,19 +239,14 @@ for i in range(len(runs)-1):
 								  #line = dict(color = '#b50b24', width = 1.5),
 								  hoverlabel = dict(namelength = -1)))
 
-	    # Find Min Daily Ice SOC - Ensure x_ts aligns with .eso timestamps
-		#(must reformulate for smaller reporting timesteps and longer simulation run periods)
-		day_min_soc = [1.0] * 365	#set for July only
-		for j in range(len(soc)):
-			idx = int(x_ts[j].dayofyear) - 1
-			if dchg[0] <= x_ts[j].hour < dchg[1]:
-				if soc[j] < day_min_soc[idx]:
-					day_min_soc[idx] = soc[j]
+	    # Find Min Daily Ice SOC During the Discharge Window - one entry per day in the run period
+		ice_days = icestats.daily_min_soc(cal, soc, runs[i][1], [dchg])
+		day_min_soc = ice_days['min'][:, 0]
 
-		print(' Minimum Annual SOC: ', min(day_min_soc))
+		print(' Minimum Annual SOC: ', np.nanmin(day_min_soc))
 
 		# Unused Ice Energy [Ton-Hours]
-		unused = [round(j * runs[i][1],0) for j in day_min_soc]
+		unused = np.round(ice_days['unused'][:, 0], 0)
 		d_soc_avail.append(go.Bar(x = x_dy, y = unused,
 		 						  name = runs[i][2] + ' Unused Ice Capacity [Ton-Hours]',
 								  opacity = 0.6, text = unused, textposition = 'auto',
@@ -204,11 +257,7 @@ for i in range(len(runs)-1):
 
 	    # Chiller Cooling Rate [W -> Tons]
 		key =  dd.index['TimeStep', chill_name, 'Chiller Evaporator Cooling Rate']
-		vals = data[key]
-		cooling_total = sum(vals) / 1000	# kW
-		cooling_chiller = vals
-		vals = [k * 0.0002843451 for k in vals]	# tons
-		l1 = len(vals)
+		vals = run_data.get(key, 'tons')
 		ch_cool.append(go.Scatter(x = x_ts, y = vals,
 								  legendgroup = str(i),
 								  name = runs[i][2] + ' Chiller Cooling Rate [tons]',
@@ -222,32 +271,39 @@ for i in range(len(runs)-1):
 						 name = runs[i][2] + ' Chiller Cooling Rate [tons]',
 						 hoverlabel = dict(namelength = -1)))
 
-		vals = [x for x in vals if x > 2] # The chiller never goes to 0, Min is ~1.3kW Cooling Rate. (??)
-		l2 = len(vals)
-		print(' Chiller Runtime Hours: ', l2/l1*8760)
-		print(' Chiller Total Annual Cooling [kWh]: ', cooling_total / ts_per_hr)
-
 		if ems:
 			# Chiller Limiter Counter
 			key = dd.index['TimeStep', 'EMS', 'Chiller Limit Counter']
-			vals = data[key]
-			limiter_flag = [0] * len(vals)
-			for idx in range(len(vals) - 1):
-				if vals[idx + 1] - vals[idx] > 0:
-					limiter_flag[idx] = 1
+			counter = data[key]
+			limiter_flag = emsevents.limiter_flags(counter)
 
 			limiter.append(go.Scatter(x = x_ts, y = limiter_flag,
 									legendgroup = str(i),
 									name = runs[i][2] + ' Chiller Limiter [-]',
 									hoverlabel = dict(namelength = -1)))
 
-			print(' Limiter Count [Zone Timesteps]: ', sum(limiter_flag))
+			print(' Limiter Count [Zone Timesteps]: ', limiter_flag.sum())
+
+			# Limiter Events - Peak Chiller Demand [kW] During Each Event
+			ch_kw = run_data.get(('TimeStep', chill_name, 'Chiller Electric Energy'), 'kW')
+			lim_kw = None
+			if ems_capacity:
+				lim_kw = run_data.get(('TimeStep', 'EMS', 'Chiller Limited Capacity'), 'kW', source = 'W')
+			events = emsevents.limiter_events(counter, ch_kw, ts_per_hr, limit = lim_kw)
+			ev_stats = emsevents.event_stats(cal, events)
+			print(' Limiter Events: ', len(events))
+			if len(events):
+				print(' Longest Limiter Event [hr]: ', events['duration'].max())
+				print(' Peak Chiller Demand During Limiting [kW]: ', events['peak'].max())
+			print(' Limiter Days: ', np.count_nonzero(ev_stats['daily']['events']))
+			print(' Monthly Limiter Events: ', ev_stats['monthly']['events'])
+			print(' Monthly Limiter Hours: ', ev_stats['monthly']['hours'])
 
 	# Data for Figures 3, 6, 7, 8, and 9:
 	if f3 or f6 or f7 or f8 or f9:
 	    # Power - Facility [kW] (timestep data)
 		key = dd.index['TimeStep', None, 'Electricity:Facility']
-		kw = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+		kw = run_data.get(key, 'kW')
 		elec.append(go.Scatter(x = x_ts, y = kw,
 							   name = runs[i][2] + ' Facility Electricity Demand [kW]',
 							   legendgroup = str(i),
@@ -256,86 +312,26 @@ for i in range(len(runs)-1):
 
 		print(' Annual Facility Electricity: ', (sum(kw) / ts_per_hr), ' kWh.')
 
-		file1 = open('elec_ice.txt','w')
-		for z in kw:
-			file1.write(str(z) + '\n')
-		file1.close
-
-		# Find Max Daily kW (timestep data)
-		daily_kw_max = [-1.0] * 365
-		daily_kw_tod = [99] * 365
-		monthly_kw_max = [0.0] * 12
-		#average_weekdays = [[0.0 for h in range(24*ts_per_hr)] for m in range(12)]
-		average_weekdays = [[0.0 for h in range(24)] for m in range(12)]
-		num_weekday_steps = [0 for m in range(12)]
-		average_weekend = [[0.0 for h in range(24)] for m in range(12)]
-		num_wknd_steps = [0 for m in range(12)]
-		average_7to7 = [[0.0 for h in range(24)] for m in range(12)]
-		num_7to7_steps = [0 for m in range(12)]
-
-		for k in range(len(kw)):
-			idx = (x_ts[k].dayofyear) - 1
-			if daily_kw_max[idx] < kw[k]:
-				daily_kw_max[idx] = round(kw[k], 1)
-				daily_kw_tod[idx] = x_ts[k].hour + (x_ts[k].minute / 60)
-			mdx = x_ts[k].month - 1
-			if monthly_kw_max[mdx] < kw[k]:
-				monthly_kw_max[mdx] = int(round(kw[k], 0))
-
-			# Determine "Average" Day for Each Month
-			ddx = x_ts[k].day - 1
-			dow = x_ts[k].dayofweek
-			#tdx = x_ts[k].hour*ts_per_hr + (x_ts[k].minute/15)
-			#tdx = int(tdx)
-			tdx = x_ts[k].hour
-			if dow not in wknd:
-				#num_weekday_steps[mdx] = num_weekday_steps[mdx] + (1 / (24*ts_per_hr))
-				num_weekday_steps[mdx] = num_weekday_steps[mdx] + (1 / 24)
-				average_weekdays[mdx][tdx] = average_weekdays[mdx][tdx] + kw[k]
-			if dow in wknd:
-				num_wknd_steps[mdx] = num_wknd_steps[mdx] + (1 / 24)
-				average_weekend[mdx][tdx] = average_weekend[mdx][tdx] + kw[k]
-
-			#Perform M-Sat 7am-7am Monthly Averaging
-			if dow != wknd[1]:
-				if dow == 0 and tdx >= 7:
-					num_7to7_steps[mdx] = num_7to7_steps[mdx] + (1 / 24)
-					average_7to7[mdx][tdx] = average_7to7[mdx][tdx] + kw[k]
-				elif dow == wknd[0] and tdx < 7:
-					num_7to7_steps[mdx] = num_7to7_steps[mdx] + (1 / 24)
-					average_7to7[mdx][tdx] = average_7to7[mdx][tdx] + kw[k]
-				elif dow in [1,2,3,4]:
-					num_7to7_steps[mdx] = num_7to7_steps[mdx] + (1 / 24)
-					average_7to7[mdx][tdx] = average_7to7[mdx][tdx] + kw[k]
-
-		for m in range(12):
-			average_weekdays[m] = [v / num_weekday_steps[m] for v in average_weekdays[m]]
-			average_weekend[m] = [v / num_wknd_steps[m] for v in average_weekend[m]]
-			average_7to7[m] = [v / num_7to7_steps[m] for v in average_7to7[m]]
-
-		print(' Max Annual Demand [kW]: ', max(monthly_kw_max))
-
-		filename4 = 'avg_profiles_' + runs[i][0] + '.txt'
-		file4 = open(filename4,'w')
-		file4.write(runs[i][0] + ' Average Daily Profiles by Month \n')
-		for m in range(12):
-			file4.write(str(m) + ' ')
-			for t in range(len(average_weekdays[m])):
-				file4.write(str(round(average_weekdays[m][t],2)) + ' ')
-			file4.write('\n')
-		file4.write('\n Weekend Profiles \n')
-		for m in range(12):
-			file4.write(str(m) + ' ')
-			for t in range(len(average_weekend[m])):
-				file4.write(str(round(average_weekend[m][t],2)) + ' ')
-			file4.write('\n')
-		file4.write('\n 7-7 Profiles \n')
-		for m in range(12):
-			file4.write(str(m) + ' ')
-			for t in range(len(average_7to7[m])):
-				file4.write(str(round(average_7to7[m][t],2)) + ' ')
-			file4.write('\n')
-		file4.close
+		elec_out[runs[i][0]] = kw
+
+		# Find Max Daily and Monthly kW (timestep data) - grouped reductions over the calendar arrays
+		kw_day = calstats.daily(cal, kw)
+		daily_kw_max = np.round(kw_day['max'], 1)
+		daily_kw_tod = kw_day['tod']
+		kw_month = calstats.monthly(cal, kw)
+		monthly_kw_max = [None if np.isnan(v) else int(v) for v in np.round(kw_month['max'], 0)]
+
+		# Determine "Average" Day for Each Month - Weekdays, Weekends, and M-Sat 7am-7am (month x day type x time of day)
+		profiles = calstats.profile_cube(cal, kw, [wkdy, ~wkdy, calstats.week_mask(cal, (0, 7), (wknd[0], 7))],
+										native = native_profiles)
+		average_weekdays = profiles[:, 0]
+		average_weekend = profiles[:, 1]
+		average_7to7 = profiles[:, 2]
+		x_24 = np.arange(profiles.shape[2]) * 24 / profiles.shape[2]
+
+		print(' Max Annual Demand [kW]: ', int(round(np.nanmax(kw_month['max']), 0)))
+
+		profile_out[runs[i][0]] = (profiles, np.round(x_24, 2))
 
 		d_max_kw.append(go.Scatter(x = x_dy, y = daily_kw_max,
 								   name = runs[i][2] + ' Daily Max Demand [kW]',
@@ -364,83 +360,63 @@ for i in range(len(runs)-1):
 								  name = runs[i][2] + ' February [kW]'))
 
 	    # Facility Load Duration Curves - Timestep Data [kW]
-		kw.sort(reverse = True)
-		ld_f.append(go.Scatter(x = x_ld_ts, y = kw,
+		x_ld, y_ld = ldc.duration_curve(kw, points = ld_points)
+		ld_f.append(go.Scatter(x = x_ld, y = y_ld,
 							   name = runs[i][2] + ' Facility Electricity Demand [kW]',
 							   legendgroup = str(i),
 							   #line = dict(color = '#b50b24', width = 1.5),
 							   hoverlabel = dict(namelength = -1)))
 
-		b = np.array(kw)
-		filename5 = 'ld_' + runs[i][0] + '.txt'
-		file5 = open(filename5,'w')
-		for z in b:
-			file5.write(str(z) + '\n')
-		file5.close
+		b = ldc.duration_curve(kw)[1]
+		ld_out[runs[i][0]] = b
 
-		a = np.linspace(0,8760*ts_per_hr,8760*ts_per_hr)
+		a = np.linspace(0, len(b), len(b))
 		A = np.vstack([a, np.ones(len(a))]).T
 		lin_fit = np.linalg.lstsq(A, b, rcond = None)
 		print('', lin_fit[0])
 
 	    # Electricity Demand - Plant [kW]
 		key = dd.index['TimeStep', None, 'Electricity:Plant']
-		kw = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+		kw = run_data.get(key, 'kW')
 		pl_elec.append(go.Scatter(x = x_ts, y = kw,
 								  name = runs[i][2] + ' Plant Electricity Demand [kW]',
 								  legendgroup = str(i),
 								  #line = dict(color = '#b50b24', width = 1.5),
 								  hoverlabel = dict(namelength = -1)))
 
-		for k in range(len(kw)):
-			# Discharge Period Plant Loads
-			if dchg[0] <= x_ts[k].hour < dchg[1]:
-				if x_ts[k].dayofweek not in wknd:
-					pl_dchg.append(kw[k])
-			# Charge Period Plant Loads
-			elif x_ts[k].hour >= chg[0] or x_ts[k].hour < chg[1]:
-				pl_chg.append(kw[k])
-
-			# Peak Period Plant Loads
-			if peak[0] <= x_ts[k].hour < peak[1]:
-				if x_ts[k].dayofweek not in wknd:
-					pl_pk.append(kw[k])
-			# Off Peak Periods Plant Loads
-			else:
-				pl_off.append(kw[k])
-
 	    # Plant Load Duration Curves - Timestep Data [kW]
-		kw.sort(reverse = True)
-		pl_dchg.sort(reverse = True)
-		pl_chg.sort(reverse = True)
-		pl_pk.sort(reverse = True)
-		pl_off.sort(reverse = True)
-
-		ld_p.append(go.Scatter(x = x_ld_ts, y = kw,
+		ld_plant = ldc.duration_curves(kw, {'all': None,
+											'dchg': in_dchg & wkdy,		# Discharge Period Plant Loads (weekdays)
+											'chg': ~in_dchg & in_chg,	# Charge Period Plant Loads
+											'pk': in_peak & wkdy,		# Peak Period Plant Loads (weekdays)
+											'off': ~in_peak},			# Off Peak Periods Plant Loads
+										points = ld_points)
+
+		ld_p.append(go.Scatter(x = ld_plant['all'][0], y = ld_plant['all'][1],
 							   name = runs[i][2] + ' Plant Electricity Demand [kW]',
 							   legendgroup = str(i),
 							   #line = dict(color = '#b50b24', width = 1.5),
 							   hoverlabel = dict(namelength = -1)))
 
-		ld_p_d.append(go.Scatter(x = x_ld_ts, y = pl_dchg,
+		ld_p_d.append(go.Scatter(x = ld_plant['dchg'][0], y = ld_plant['dchg'][1],
 							   name = runs[i][2] + ' Plant Electricity Demand During Discharge [kW]',
 							   legendgroup = str(i),
 							   #line = dict(color = '#b50b24', width = 1.5),
 							   hoverlabel = dict(namelength = -1)))
 
-		ld_p_c.append(go.Scatter(x = x_ld_ts, y = pl_chg,
+		ld_p_c.append(go.Scatter(x = ld_plant['chg'][0], y = ld_plant['chg'][1],
 							   name = runs[i][2] + ' Plant Electricity Demand During Charge [kW]',
 							   legendgroup = str(i),
 							   #line = dict(color = '#b50b24', width = 1.5),
 							   hoverlabel = dict(namelength = -1)))
 
-		ld_p_p.append(go.Scatter(x = x_ld_ts, y = pl_pk,
+		ld_p_p.append(go.Scatter(x = ld_plant['pk'][0], y = ld_plant['pk'][1],
 							   name = runs[i][2] + ' Plant Electricity Demand During Peak [kW]',
 							   legendgroup = str(i),
 							   #line = dict(color = '#b50b24', width = 1.5),
 							   hoverlabel = dict(namelength = -1)))
 
-		ld_p_o.append(go.Scatter(x = x_ld_ts, y = pl_off,
+		ld_p_o.append(go.Scatter(x = ld_plant['off'][0], y = ld_plant['off'][1],
 							   name = runs[i][2] + ' Plant Electricity Demand During Off-Peak [kW]',
 							   legendgroup = str(i),
 							   #line = dict(color = '#b50b24', width = 1.5),
@@ -448,44 +424,40 @@ for i in range(len(runs)-1):
 
 	    # Electricity - Chillers [kW]
 		key = dd.index['TimeStep', chill_name, 'Chiller Electric Energy']
-		kw = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+		kw = run_data.get(key, 'kW')
 		ch_elec.append(go.Scatter(x = x_ts, y = kw,
 								  name = runs[i][2] + ' Chiller Demand [kW]',
 								  legendgroup = str(i),
 								  #line = dict(color = '#b50b24', width = 1.5),
 								  hoverlabel = dict(namelength = -1)))
 
-		# Total Chiller Electricity for Run Period
-		elec_chiller = sum(kw)
-		print(' Chiller Annual Electricity [kWh]: ', elec_chiller / ts_per_hr)
-		avg_cop = cooling_total / elec_chiller
-		print(' Average Chiller COP (full year): ', avg_cop)
-
-		# Chiller Average COP During Occupied Hours
-		occ_elec_chiller = 0
-		occ_cooling = 0
-		occ_runtime = 0
-
-		for k in range(len(kw)):
-			if dchg[0] <= x_ts[k].hour < dchg[1]:
-				if x_ts[k].dayofweek not in wknd:
-					if cooling_chiller[k] > 0:
-						occ_elec_chiller += kw[k]
-						occ_cooling += cooling_chiller[k] / 1000
-						occ_runtime += 1 / ts_per_hr
-
-		occ_cop = occ_cooling/occ_elec_chiller
-		print(' Average Chiller COP During Occupied Hours: ', occ_cop)
-		print(' Chiller Runtime During Occupied Hours: ', occ_runtime)
-
 	    # Chiller Load Duration Curves - TimeStep Data [kW]
-		kw.sort(reverse = True)
-		ld_chill.append(go.Scatter(x = x_ld_ts, y = kw,
+		x_ld, y_ld = ldc.duration_curve(kw, points = ld_points)
+		ld_chill.append(go.Scatter(x = x_ld, y = y_ld,
 								   name = runs[i][2] + ' Chiller Electricity [kW]',
 								   legendgroup = str(i),
 								   #line = dict(color = '#b50b24', width = 1.5),
 								   hoverlabel = dict(namelength = -1)))
 
+	# Chiller Runtime and COP - Full Run Period and Occupied Hours (weekday discharge window)
+	if f9:
+		for k, name in enumerate(chill_names):
+			cool_kw = run_data.get(('TimeStep', name, 'Chiller Evaporator Cooling Rate'), 'kW')
+			elec_kw = run_data.get(('TimeStep', name, 'Chiller Electric Energy'), 'kW')
+			cap = None if chill_caps is None else chill_caps[k] / 0.2843451		# tons -> kW
+			ch = chillerstats.chiller_stats(elec_kw, cool_kw, ts_per_hr, {'year': None, 'occ': in_dchg & wkdy},
+											on = chiller_on / 0.2843451, capacity = cap)
+			if len(chill_names) > 1:
+				print(' ' + name)
+			print(' Chiller Runtime Hours: ', ch['year']['runtime'])
+			print(' Chiller Total Annual Cooling [kWh]: ', ch['year']['cooling'])
+			print(' Chiller Annual Electricity [kWh]: ', ch['year']['elec'])
+			print(' Average Chiller COP (full year): ', ch['year']['cop_total'])
+			print(' Average Chiller COP During Occupied Hours: ', ch['occ']['cop'])
+			print(' Chiller Runtime During Occupied Hours: ', ch['occ']['runtime'])
+			if cap is not None:
+				print(' Chiller PLR Hours (10% bins, last bin incl. > 100%): ', np.round(ch['year']['plr_hist'], 1))
+
 	# Data for Figure 5
 	if f5:
 	    # Return Temps [C]
@@ -520,39 +492,60 @@ for i in range(len(runs)-1):
 
 	print(' Complete.')
 
+# Process the Ice Runs in a Process Pool (multirun.py) - Traces and Results are Merged Back in Run Order
+run_outputs = ['elec', 'pl_elec', 'b_elec', 'ch_elec', 'ch_cool', 'ice_cool', 'ice_chrg', 'ice_soc', 'ch_sp',
+			   'ice_sp', 'supply_temp', 'return_temp', 'ch_a', 'ice_a', 'chg_a', 'd_soc_avail', 'ld_chill', 'ld_p',
+			   'ld_f', 'ld_p_c', 'ld_p_d', 'ld_p_o', 'ld_p_p', 'd_max_kw', 'd_tod_kw', 'm_max_kw', 'avg_sep',
+			   'avg_may', 'avg_feb', 'limiter', 'elec_out', 'ld_out', 'profile_out']
+multirun.run_all(ice_run, range(len(runs) - 1), {name: globals()[name] for name in run_outputs},
+				 inputs = lambda i: [paths[i]], labels = lambda i: runs[i][0], processes = processes,
+				 cache_dir = filepath + '/runcache' if run_cache else None,
+				 max_points = plot_points, gl_points = gl_points)
+
+# Facility Demand of Every Ice Run - One Column per Run [kW], Load Duration Curves and Average Day Profiles
+if elec_out:
+	results.write_columns('elec_ice', elec_out, units = 'kW', fmt = result_format)
+for name, b in ld_out.items():
+	results.write_columns('ld_' + name, {'facility_kw': b}, units = 'kW', fmt = result_format)
+for name, (profiles, hours) in profile_out.items():
+	results.write_array('avg_profiles_' + name, profiles,
+						[('month', range(1, 13)), ('day_type', ['weekday', 'weekend', 'mon_sat_7to7']), ('hour', hours)],
+						units = 'kW', fmt = result_format, float_format = '%.2f')
+
 ## Baseline Model Variables
 print(runs[-1][0])
 print(' Loading Data...')
-dd, data = esoreader.read(paths[-1])
+selectors = [('TimeStep', chill_name, 'Chiller Evaporator Cooling Rate'),
+			('TimeStep', None, 'Electricity:Facility'),
+			('TimeStep', chill_name, 'Chiller Electric Energy')]
+for name in chill_names:
+	selectors += [('TimeStep', name, 'Chiller Evaporator Cooling Rate'), ('TimeStep', name, 'Chiller Electric Energy')]
+dd, data = loader(paths[-1], selectors)
+run_data = RunData(dd, data)
 print(' Data Load Complete.\n Performing Calculations...')
 
-# Reset Select Variables
-pl_dchg = []
-pl_chg = []
-pl_pk = []
-pl_off = []
-
-# Chiller Cooling Rate [W]
+# Timestep Index and Calendar Masks from the ESO Time Records
+cal = dd.time
+ts_per_hr = cal.ts_per_hr
+x_ts = cal.timestamps(year)
+x_dy = cal.days(year)
+wkdy = cal.weekday_mask(wknd)
+in_dchg = cal.hour_mask(dchg[0], dchg[1])
+in_chg = cal.hour_mask(chg[0], chg[1])
+in_peak = cal.hour_mask(peak[0], peak[1])
+
+# Chiller Cooling Rate [W -> tons]
 key =  dd.index['TimeStep', chill_name, 'Chiller Evaporator Cooling Rate']
-vals = data[key]
-cooling_total = sum(vals) / 1000	# kW - quarter hours
-cooling_chiller = vals
-vals = [k * 0.0002843451 for k in vals]
-l1 = len(vals)
+vals = run_data.get(key, 'tons')
 ch_cool.append(go.Scatter(x = x_ts, y = vals,
 						  name = runs[-1][2] + ' Chiller Evaporator Cooling Rate [tons]',
 						  legendgroup = str(-1),
 					      hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
 						  line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-vals = [x for x in vals if x > 2]
-l2 = len(vals)
-print(' Runtime Hours: ', l2/l1*8760)
-print(' Chiller Total Annual Cooling* [kWh]: ', cooling_total / ts_per_hr)
-
 # Power - Facility [kW]
 key = dd.index['TimeStep', None, 'Electricity:Facility']
-kw = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+kw = run_data.get(key, 'kW')
 elec.append(go.Scatter(x = x_ts, y = kw,
 					   name = runs[-1][2] + ' Facility Electricity Demand [kW]',
 					   legendgroup = str(-1),
@@ -561,86 +554,29 @@ elec.append(go.Scatter(x = x_ts, y = kw,
 
 print(' Annual Facility Electricity: ', (sum(kw) / ts_per_hr), ' kWh.')
 
-file2 = open('elec_base.txt','w')
-for z in kw:
-	file2.write(str(z) + '\n')
-file2.close
-
-# Find Max Daily kW (timestep data)
-daily_kw_max = [-1.0] * 365
-daily_kw_tod = [99] * 365
-monthly_kw_max = [0.0] * 12
-#average_weekdays = [[0.0 for h in range(24*ts_per_hr)] for m in range(12)]
-average_weekdays = [[0.0 for h in range(24)] for m in range(12)]
-num_weekday_steps = [0 for m in range(12)]
-average_weekend = [[0.0 for h in range(24)] for m in range(12)]
-num_wknd_steps = [0 for m in range(12)]
-average_7to7 = [[0.0 for h in range(24)] for m in range(12)]
-num_7to7_steps = [0 for m in range(12)]
-
-for k in range(len(kw)):
-	idx = (x_ts[k].dayofyear) - 1
-	if daily_kw_max[idx] < kw[k]:
-		daily_kw_max[idx] = round(kw[k], 1)
-		daily_kw_tod[idx] = x_ts[k].hour + (x_ts[k].minute / 60)
-	mdx = x_ts[k].month - 1
-	if monthly_kw_max[mdx] < kw[k]:
-		monthly_kw_max[mdx] = int(round(kw[k], 0))
-
-	# Determine "Average" Day for Each Month
-	ddx = x_ts[k].day - 1
-	dow = x_ts[k].dayofweek
-	#tdx = x_ts[k].hour*ts_per_hr + (x_ts[k].minute/15)
-	#tdx = int(tdx)
-	tdx = x_ts[k].hour
-	if dow not in wknd:
-		#num_weekday_steps[mdx] = num_weekday_steps[mdx] + (1 / (24*ts_per_hr))
-		num_weekday_steps[mdx] = num_weekday_steps[mdx] + (1 / 24)
-		average_weekdays[mdx][tdx] = average_weekdays[mdx][tdx] + kw[k]
-	if dow in wknd:
-		num_wknd_steps[mdx] = num_wknd_steps[mdx] + (1 / 24)
-		average_weekend[mdx][tdx] = average_weekend[mdx][tdx] + kw[k]
-
-	#Perform M-Sat 7am-7am Monthly Averaging
-	if dow != wknd[1]:
-		if dow == 0 and tdx >= 7:
-			num_7to7_steps[mdx] = num_7to7_steps[mdx] + (1 / 24)
-			average_7to7[mdx][tdx] = average_7to7[mdx][tdx] + kw[k]
-		elif dow == wknd[0] and tdx < 7:
-			num_7to7_steps[mdx] = num_7to7_steps[mdx] + (1 / 24)
-			average_7to7[mdx][tdx] = average_7to7[mdx][tdx] + kw[k]
-		elif dow in [1,2,3,4]:
-			num_7to7_steps[mdx] = num_7to7_steps[mdx] + (1 / 24)
-			average_7to7[mdx][tdx] = average_7to7[mdx][tdx] + kw[k]
-
-for m in range(12):
-	average_weekdays[m] = [v / num_weekday_steps[m] for v in average_weekdays[m]]
-	average_weekend[m] = [v / num_wknd_steps[m] for v in average_weekend[m]]
-	average_7to7[m] = [v / num_7to7_steps[m] for v in average_7to7[m]]
-
-print(' Max Annual Demand [kW]: ', max(monthly_kw_max))
-
-filename3 = 'avg_profiles_' + runs[-1][0] + '.txt'
-file3 = open(filename3,'w')
-file3.write('Baseline Average Daily Profiles by Month \n')
-for m in range(12):
-	file3.write(str(m) + ' ')
-	for t in range(len(average_weekdays[m])):
-		file3.write(str(round(average_weekdays[m][t],2)) + ' ')
-	file3.write('\n')
-file3.write('\n Weekend Profiles \n')
-for m in range(12):
-	file3.write(str(m) + ' ')
-	for t in range(len(average_weekend[m])):
-		file3.write(str(round(average_weekend[m][t],2)) + ' ')
-	file3.write('\n')
-file3.write('\n 7-7 Profiles \n')
-for m in range(12):
-	file3.write(str(m) + ' ')
-	for t in range(len(average_7to7[m])):
-		file3.write(str(round(average_7to7[m][t],2)) + ' ')
-	file3.write('\n')
-file3.close
+results.write_columns('elec_base', {runs[-1][0]: kw}, units = 'kW', fmt = result_format)
+
+# Find Max Daily and Monthly kW (timestep data) - grouped reductions over the calendar arrays
+kw_day = calstats.daily(cal, kw)
+daily_kw_max = np.round(kw_day['max'], 1)
+daily_kw_tod = kw_day['tod']
+kw_month = calstats.monthly(cal, kw)
+monthly_kw_max = [None if np.isnan(v) else int(v) for v in np.round(kw_month['max'], 0)]
+
+# Determine "Average" Day for Each Month - Weekdays, Weekends, and M-Sat 7am-7am (month x day type x time of day)
+profiles = calstats.profile_cube(cal, kw, [wkdy, ~wkdy, calstats.week_mask(cal, (0, 7), (wknd[0], 7))],
+								native = native_profiles)
+average_weekdays = profiles[:, 0]
+average_weekend = profiles[:, 1]
+average_7to7 = profiles[:, 2]
+x_24 = np.arange(profiles.shape[2]) * 24 / profiles.shape[2]
+
+print(' Max Annual Demand [kW]: ', int(round(np.nanmax(kw_month['max']), 0)))
+
+results.write_array('avg_profiles_' + runs[-1][0], profiles,
+					[('month', range(1, 13)), ('day_type', ['weekday', 'weekend', 'mon_sat_7to7']),
+					 ('hour', np.round(x_24, 2))],
+					units = 'kW', fmt = result_format, float_format = '%.2f')
 
 d_max_kw.append(go.Scatter(x = x_dy, y = daily_kw_max,
 						   name = runs[-1][2] + ' Daily Max Demand [kW]',
@@ -669,21 +605,17 @@ avg_feb.append(go.Scatter(x = x_24, y = average_7to7[1],
 						  line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
 # Facility Load Duration Curves - Timestep Data [kW]
-kw.sort(reverse = True)
-ld_f.append(go.Scatter(x = x_ld_ts, y = kw,
+x_ld, y_ld = ldc.duration_curve(kw, points = ld_points)
+ld_f.append(go.Scatter(x = x_ld, y = y_ld,
 					   name = runs[-1][2] + ' Facility Electricity Demand [kW]',
 					   legendgroup = str(-1),
 					   hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
 					   line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-b = np.array(kw)
-filename6 = 'ld_' + runs[-1][0] + '.txt'
-file6 = open(filename6,'w')
-for z in b:
-	file6.write(str(z) + '\n')
-file6.close
+b = ldc.duration_curve(kw)[1]
+results.write_columns('ld_' + runs[-1][0], {'facility_kw': b}, units = 'kW', fmt = result_format)
 
-a = np.linspace(0,8760*ts_per_hr,8760*ts_per_hr)
+a = np.linspace(0, len(b), len(b))
 A = np.vstack([a, np.ones(len(a))]).T
 #lin_fit = np.linalg.lstsq(A, b, rcond = None)
 #print('', lin_fit[0])
@@ -691,62 +623,42 @@ A = np.vstack([a, np.ones(len(a))]).T
 
 # Electricity Demand - Plant [kW4]
 #key =  dd.index['TimeStep', None, 'Electricity:Plant']
-#kw = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+#kw = run_data.get(key, 'kW')
 #pl_elec.append(go.Scatter(x = x_ts, y = kw,
 #						  name = runs[-1][2] + ' Plant Electricity Demand [kW]',
 #						  legendgroup = str(-1),
 #					      hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
 #						  line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-#for k in range(len(kw)):
-#	# Discharge Period Plant Loads
-#	if dchg[0] <= x_ts[k].hour < dchg[1]:
-#		if x_ts[k].dayofweek not in wknd:
-#			pl_dchg.append(kw[k])
-#	# Charge Period Plant Loads
-#	elif x_ts[k].hour >= chg[0] or x_ts[k].hour < chg[1]:
-#		pl_chg.append(kw[k])
-
-#	# Peak Period Plant Loads
-#	if peak[0] <= x_ts[k].hour < peak[1]:
-#		if x_ts[k].dayofweek not in wknd:
-#			pl_pk.append(kw[k])
-#	# Off Peak Periods Plant Loads
-#	else:
-#		pl_off.append(kw[k])
-
 # Plant Load Duration Curves - Timestep Data [kW]
-#kw.sort(reverse = True)
-#pl_dchg.sort(reverse = True)
-#pl_chg.sort(reverse = True)
-#pl_pk.sort(reverse = True)
-#pl_off.sort(reverse = True)
+#ld_plant = ldc.duration_curves(kw, {'all': None, 'dchg': in_dchg & wkdy, 'chg': ~in_dchg & in_chg,
+#									'pk': in_peak & wkdy, 'off': ~in_peak}, points = ld_points)
 
-#ld_p.append(go.Scatter(x = x_ld_ts, y = kw,
+#ld_p.append(go.Scatter(x = ld_plant['all'][0], y = ld_plant['all'][1],
 #					   name = runs[-1][2] + ' Plant Electricity Demand [kW]',
 #					   legendgroup = str(-1),
 #					   hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
 #					   line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-#ld_p_d.append(go.Scatter(x = x_ld_ts, y = pl_dchg,
+#ld_p_d.append(go.Scatter(x = ld_plant['dchg'][0], y = ld_plant['dchg'][1],
 #					   name = runs[-1][2] + ' Plant Discharge Electricity [kW]',
 #					   legendgroup = str(-1),
 #					   hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
 #					   line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-#ld_p_c.append(go.Scatter(x = x_ld_ts, y = pl_chg,
+#ld_p_c.append(go.Scatter(x = ld_plant['chg'][0], y = ld_plant['chg'][1],
 #					   name = runs[-1][2] + ' Plant Charge Electricity [kW]',
 #					   legendgroup = str(-1),
 #					   hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
 #					   line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-#ld_p_p.append(go.Scatter(x = x_ld_ts, y = pl_pk,
+#ld_p_p.append(go.Scatter(x = ld_plant['pk'][0], y = ld_plant['pk'][1],
 #					   name = runs[-1][2] + ' Plant Peak Electricity [kW]',
 #					   legendgroup = str(-1),
 #					   hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
 #					   line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-#ld_p_o.append(go.Scatter(x = x_ld_ts, y = pl_off,
+#ld_p_o.append(go.Scatter(x = ld_plant['off'][0], y = ld_plant['off'][1],
 #					   name = runs[-1][2] + ' Plant Off-Peak Electricity [kW]',
 #					   legendgroup = str(-1),
 #					   hoverlabel = dict(namelength  = -1), hoveron = 'points+fills',
@@ -754,44 +666,39 @@ A = np.vstack([a, np.ones(len(a))]).T
 
 # Electricity Demand - Chillers [kW]
 key = dd.index['TimeStep', chill_name, 'Chiller Electric Energy']
-kw = [j * 2.77778e-7 * ts_per_hr for j in data[key]]
+kw = run_data.get(key, 'kW')
 ch_elec.append(go.Scatter(x = x_ts, y = kw,
 						  name = runs[-1][2] + ' Chiller Electricity [kW]',
 						  legendgroup = str(-1),
 						  hoverlabel = dict(namelength = -1), hoveron = 'points+fills',
 						  line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
-# Total Chiller Electricity for Run Period
-elec_chiller = sum(kw)
-print(' Chiller Annual Electricity [kWh]: ', elec_chiller / ts_per_hr)
-avg_cop = cooling_total / elec_chiller
-print(' Average Chiller COP (full year): ', avg_cop)
-
-# Chiller Average COP During Occupied Hours
-occ_elec_chiller = 0
-occ_cooling = 0
-occ_runtime = 0
-
-for k in range(len(kw)):
-	if dchg[0] <= x_ts[k].hour < dchg[1]:
-		if x_ts[k].dayofweek not in wknd:
-			if cooling_chiller[k] > 0:
-				occ_elec_chiller += kw[k]
-				occ_cooling += cooling_chiller[k] / 1000
-				occ_runtime += 1 / ts_per_hr
-
-occ_cop = occ_cooling/occ_elec_chiller
-print(' Average Chiller COP During Occupied Hours: ', occ_cop)
-print(' Chiller Runtime During Occupied Hours: ', occ_runtime)
-
 # Chiller Load Duration Curves - TimeStep Data [kW]
-kw.sort(reverse = True)
-ld_chill.append(go.Scatter(x = x_ld_ts, y = kw,
+x_ld, y_ld = ldc.duration_curve(kw, points = ld_points)
+ld_chill.append(go.Scatter(x = x_ld, y = y_ld,
 						   name = runs[-1][2] + ' Chiller Electricity [kW]',
 						   legendgroup = str(-1),
 						   hoverlabel = dict(namelength = -1),
 						   line = dict(color = '#000000', dash = 'dot', width = 1.5)))
 
+# Chiller Runtime and COP - Full Run Period and Occupied Hours (weekday discharge window)
+for k, name in enumerate(chill_names):
+	cool_kw = run_data.get(('TimeStep', name, 'Chiller Evaporator Cooling Rate'), 'kW')
+	elec_kw = run_data.get(('TimeStep', name, 'Chiller Electric Energy'), 'kW')
+	cap = None if chill_caps is None else chill_caps[k] / 0.2843451		# tons -> kW
+	ch = chillerstats.chiller_stats(elec_kw, cool_kw, ts_per_hr, {'year': None, 'occ': in_dchg & wkdy},
+									on = chiller_on / 0.2843451, capacity = cap)
+	if len(chill_names) > 1:
+		print(' ' + name)
+	print(' Chiller Runtime Hours: ', ch['year']['runtime'])
+	print(' Chiller Total Annual Cooling [kWh]: ', ch['year']['cooling'])
+	print(' Chiller Annual Electricity [kWh]: ', ch['year']['elec'])
+	print(' Average Chiller COP (full year): ', ch['year']['cop_total'])
+	print(' Average Chiller COP During Occupied Hours: ', ch['occ']['cop'])
+	print(' Chiller Runtime During Occupied Hours: ', ch['occ']['runtime'])
+	if cap is not None:
+		print(' Chiller PLR Hours (10% bins, last bin incl. > 100%): ', np.round(ch['year']['plr_hist'], 1))
+
 # Return Temps [C]
 #key = dd.index['TimeStep', 'CHILLED WATER LOOP SUPPLY INLET NODE', 'System Node Temperature']
 #return_temp.append(go.Scatter(x = x_ts, y = data[key],
@@ -808,6 +715,33 @@ ld_chill.append(go.Scatter(x = x_ld_ts, y = kw,
 print(' Complete.\n')
 
 
+## Baseline vs Ice Comparison - Every Run Loaded Once, Aligned on the Shared Timestep Index
+if compare:
+	print('Comparing Runs to the Baseline: ' + runs[-1][0])
+	rs = runcompare.RunSet.load(paths, runcompare.default_series(chill_name), [r[0] for r in runs], load = loader)
+	on_pk = rs.cal.hour_mask(peak[0], peak[1]) & rs.cal.weekday_mask(wknd)
+	occ = rs.cal.hour_mask(dchg[0], dchg[1]) & rs.cal.weekday_mask(wknd)
+	summary = rs.summary(-1, peak = on_pk, occ = occ)
+	print(pd.DataFrame(summary, index = rs.names).T.round(2).to_string())
+
+	# Top Facility Peaks per Month and Year, and the Baseline Peaks Each Run Reduced
+	peaks = peakindex.peak_index(rs.cal, rs['facility'], n_peaks, peak_spacing)
+	ts = rs.cal.timestamps(year)
+	month_cmp = peakindex.compare_peaks(peaks['month'], rs['facility'], -1)
+	year_cmp = peakindex.compare_peaks(peaks['year'], rs['facility'], -1)
+	for i in range(len(runs)):
+		print(runs[i][0] + ' Top ' + str(n_peaks) + ' Annual Peaks [kW]:')
+		for k in range(n_peaks):
+			if peaks['year']['idx'][i, 0, k] >= 0:
+				print('  ', ts[peaks['year']['idx'][i, 0, k]], round(peaks['year']['value'][i, 0, k], 1))
+		if i != len(runs) - 1:
+			print(' Baseline Monthly Peaks Reduced: ', np.count_nonzero(month_cmp['reduced'][i]), 'of',
+				  np.count_nonzero(month_cmp['idx'] >= 0))
+			print(' Baseline Annual Peaks Reduced: ', np.count_nonzero(year_cmp['reduced'][i]), 'of',
+				  np.count_nonzero(year_cmp['idx'] >= 0))
+	print(' Complete.\n')
+
+
 ## Create Figures
 print('Creating Figures.\n')
 
@@ -844,7 +778,7 @@ if f1:
 		fig.append_trace(limiter[i],3,1)
 
 	fig['layout'].update(template = standard_template, height = 1000)
-	plotly.offline.plot(fig, filename = 'rates_soc.html')
+	plotting.plot(fig, filename = 'rates_soc.html', max_points = plot_points, gl_points = gl_points)
 
 # Fig 2 - Stacked Area Plot Totalling Ice and Chiller Cooling Rates
 if f2:
@@ -860,7 +794,7 @@ if f2:
 	fig['layout'].update(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
 						 yaxis = dict(showgrid = True, gridcolor = 'rgb(203,203,203)'))
 
-	plotly.offline.plot(fig, filename = 'stacks.html')
+	plotting.plot(fig, filename = 'stacks.html', max_points = plot_points, gl_points = gl_points)
 
 # Fig 3 - Electricity Use Profiles
 if f3:
@@ -875,7 +809,7 @@ if f3:
 
 	#fig['layout'].update(title = title_text)
 	fig['layout'].update(template = standard_template)
-	plotly.offline.plot(fig, filename = 'elec.html')
+	plotting.plot(fig, filename = 'elec.html', max_points = plot_points, gl_points = gl_points)
 
 # Fig 4 - Daily Unused Ice
 if f4:
@@ -889,7 +823,7 @@ if f4:
 		fig.append_trace(ice_soc[i],1,1)
 
 	fig['layout'].update(template = standard_template)
-	plotly.offline.plot(fig, filename = 'unused_ice.html')
+	plotting.plot(fig, filename = 'unused_ice.html', max_points = plot_points, gl_points = gl_points)
 
 # Fig 5 - Return Water Temps
 if f5:
@@ -907,7 +841,7 @@ if f5:
 	for i in range(len(ch_sp)):
 		fig.append_trace(ch_sp[i],1,1)
 
-	plotly.offline.plot(fig, filename = 'return_temps.html')
+	plotting.plot(fig, filename = 'return_temps.html', max_points = plot_points, gl_points = gl_points)
 
 # Fig 6 - Load Duration Curves
 if f6:
@@ -944,7 +878,7 @@ if f6:
 	fig['layout'].update(title = 'Load Duration Curves', template = standard_template)
 	fig.update_xaxes(title_text = 'Number of 15-Minute Timesteps in Year')
 	fig.update_yaxes(title_text = '[kWe]')
-	plotly.offline.plot(fig, filename = 'load_duration.html')
+	plotting.plot(fig, filename = 'load_duration.html', max_points = plot_points, gl_points = gl_points)
 
 # Fig 7 - Max Demand Curves
 if f7:
@@ -960,7 +894,7 @@ if f7:
 	#fig['layout'].update(barmode = 'overlay')
 	fig['layout'].update(title = 'Maximum Facility Monthly Demand', template = standard_template)
 	fig.update_yaxes(title_text = 'kWe')
-	plotly.offline.plot(fig, filename = 'max_kw.html')
+	plotting.plot(fig, filename = 'max_kw.html', max_points = plot_points, gl_points = gl_points)
 
 # Fig 8 - Average Day Electricity Profiles
 if f8:
@@ -981,6 +915,6 @@ if f8:
 	fig['layout'].update(title = title_text, xaxis = dict(dtick = 1), xaxis2 = dict(dtick = 1), xaxis3 = dict(dtick = 1),
 						 height = 1000)
 	fig['layout'].update(template = standard_template)
-	plotly.offline.plot(fig, filename = 'avg_months.html')
+	plotting.plot(fig, filename = 'avg_months.html', max_points = plot_points, gl_points = gl_points)
 
 print('Script Finished.')
@@ -0,0 +1,58 @@
+# Ice Tank Daily Statistics
+# Ice measure analysis tools
+
+# This module finds the daily minimum ice state of charge inside one or more discharge windows, when it occurs, and
+# the ice left unused at that point [ton-hours], with grouped reductions over the calendar arrays of dd.time. Days
+# come from the run's own time records, so leap years, partial-year runs and DR months need no special handling.
+#
+#   d = daily_min_soc(cal, soc, ice_cap, [dchg])						# one run, windows as [start, end] hours
+#   d = daily_min_soc(cal, np.vstack(socs), ice_caps, [[8, 18], [12, 18]])	# runs sharing one calendar at once
+#   d['min'][run, day, window], d['unused'][run, day, window]
+#
+# Windows may also be boolean timestep masks. Windows that wrap past midnight (e.g. [19, 7]) are split at the day
+# boundary, like every other per-day statistic. Days without a timestep in a window return NaN (argmin -1).
+
+import numpy as np
+
+from calstats import day_groups, group_min
+
+
+def window_masks(cal, windows):
+
+    # [start, end] hour pairs or boolean masks -> (windows, timesteps) boolean array
+    return np.array([cal.hour_mask(w[0], w[1]) if len(w) == 2 else np.asarray(w, dtype = bool) for w in windows])
+
+
+def daily_min_soc(cal, soc, ice_cap, windows, mask = None):
+
+    # soc: (timesteps,) or (runs, timesteps); ice_cap: scalar or one per run [ton-hours]
+    # mask: optional timestep mask applied to every window (e.g. weekdays only)
+    soc = np.asarray(soc, dtype = np.float64)
+    single = soc.ndim == 1
+    soc = np.atleast_2d(soc)
+    R, n = soc.shape
+    ice_cap = np.broadcast_to(np.asarray(ice_cap, dtype = np.float64), (R,))
+
+    days, n_days = day_groups(cal)
+    masks = window_masks(cal, windows)
+    if mask is not None:
+        masks &= np.asarray(mask, dtype = bool)
+    W = len(masks)
+
+    # One group per (run, window, day) - a single grouped reduction for every run and window
+    w, t = np.nonzero(masks)
+    base = w * n_days + days[t]
+    labels = (np.arange(R)[:, None] * (W * n_days) + base).ravel()
+    low, arg = group_min(soc[:, t].ravel(), labels, R * W * n_days)
+
+    # Map the flat argmin back to timestep indices
+    arg = np.where(arg >= 0, t[arg % len(t)] if len(t) else arg, -1)
+    low = low.reshape(R, W, n_days).transpose(0, 2, 1)
+    arg = arg.reshape(R, W, n_days).transpose(0, 2, 1)
+
+    safe = np.maximum(arg, 0)
+    tod = np.where(arg >= 0, cal.hour[safe] + cal.minute[safe] / 60, np.nan)
+    res = {'min': low, 'argmin': arg, 'tod': tod, 'unused': low * ice_cap[:, None, None]}
+    if single:
+        res = {k: v[0] for k, v in res.items()}
+    return res
@@ -0,0 +1,43 @@
+# Load Duration Curve Engine
+# Ice measure analysis tools
+
+# This module builds load duration curves (values sorted high to low against their rank) for a series and any number
+# of boolean period masks with NumPy sorts. A curve can be reduced to a fixed number of points spread evenly over its
+# rank axis (linear interpolation between ranks), so plots and stored files stay the same size whatever the length or
+# timestep of the run. The first and last points are always the max and min of the period.
+#
+#   x, y = duration_curve(kw)									# every timestep, x = 1 ... n
+#   curves = duration_curves(kw, {'dchg': in_dchg & wkdy, 'off': ~in_peak}, points = 1000)
+#   x, y = curves['dchg']
+
+import numpy as np
+
+
+def duration_curve(values, mask = None, points = None):
+
+    # Returns (rank, value) arrays; rank is in timesteps so masked curves keep their own length
+    values = np.asarray(values, dtype = np.float64)
+    if mask is not None:
+        values = values[np.asarray(mask, dtype = bool)]
+    curve = -np.sort(-values)
+    rank = np.arange(1, len(curve) + 1, dtype = np.float64)
+
+    if points is None or len(curve) <= points:
+        return rank, curve
+    x = np.linspace(1, len(curve), points)
+    return x, np.interp(x, rank, curve)
+
+
+def duration_curves(values, masks, points = None):
+
+    # masks: dict of name -> boolean mask (None = whole series). Returns dict of name -> (rank, value)
+    return {name: duration_curve(values, mask, points) for name, mask in masks.items()}
+
+
+def duration_quantiles(values, q, mask = None):
+
+    # Load exceeded for the fraction q of the (masked) period, e.g. q = 0.01 -> top 1% load
+    values = np.asarray(values, dtype = np.float64)
+    if mask is not None:
+        values = values[np.asarray(mask, dtype = bool)]
+    return np.quantile(values, 1 - np.asarray(q, dtype = np.float64))
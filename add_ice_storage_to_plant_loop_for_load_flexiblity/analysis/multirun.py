@@ -0,0 +1,172 @@
+# Multi-Run Driver
+# Ice measure analysis tools
+
+# This module runs the per-run body of a comparison script for every run in a process pool and rebuilds the script's
+# shared output containers (trace lists, result dicts) in run order in the parent, as if the runs had been processed
+# one after another. Each task only sends back what it added to those containers - traces already thinned to the
+# plot point budget (plotting.reduce_traces) - together with its captured console output, which the parent prints in
+# run order. Results are cached on disk per run and reused until the run's input files or the analysis code change.
+#
+#   def ice_run(i):								# script body for run i - appends to the global trace lists
+#       ...
+#   multirun.run_all(ice_run, range(len(runs) - 1), {'elec': elec, 'ld_f': ld_f, 'elec_out': elec_out},
+#                    inputs = lambda i: [paths[i]], labels = lambda i: runs[i][0], processes = 4,
+#                    cache_dir = 'runcache', max_points = plot_points)
+#
+# The pool uses the 'fork' start method so the task function and the script's globals are inherited without pickling
+# (the scripts have no __main__ guard); processes = 1, or a platform without fork (Windows), runs the tasks in the
+# parent with the same capture and caching.
+# The cache key covers the input files (size and mtime), the task's label and the source of every .py file next to the
+# running script, so any change to a setting or an analysis module rebuilds every run.
+
+import io
+import os
+import sys
+import glob
+import pickle
+import hashlib
+import contextlib
+import multiprocessing as mp
+
+import plotly.graph_objs as go
+from plotly.basedatatypes import BaseTraceType
+
+import plotting
+
+# Task function and containers for the pool workers - set before the pool forks
+worker_args = None
+
+
+def code_hash(files = None):
+
+    # Hash of the analysis source: every .py file in the running script's directory by default
+    if files is None:
+        root = os.path.dirname(os.path.abspath(sys.argv[0]))
+        files = sorted(glob.glob(os.path.join(root, '*.py')))
+    h = hashlib.blake2b(digest_size = 16)
+    for f in files:
+        with open(f, 'rb') as src:
+            h.update(src.read())
+    return h.hexdigest()
+
+
+def task_key(code, label, inputs):
+
+    h = hashlib.blake2b(code.encode(), digest_size = 16)
+    h.update(repr(label).encode())
+    for path in inputs:
+        st = os.stat(path)
+        h.update(f'{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}'.encode())
+    return h.hexdigest()
+
+
+def cache_file(cache_dir, label, key):
+
+    name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(label))
+    return os.path.join(cache_dir, f'{name}-{key}.pkl')
+
+
+def compact(added, max_points, gl_points):
+
+    # Thin every new trace of the task in one pass so stacked areas keep shared indices across lists
+    items = [(name, k) for name, new in added.items() if isinstance(new, list)
+             for k, t in enumerate(new) if isinstance(t, (BaseTraceType, dict)) and 'y' in t]
+    if not items or max_points is None:
+        return added
+    traces = [added[name][k] for name, k in items]
+    traces = [go.Scatter(**t) if isinstance(t, dict) else t for t in traces]
+    for (name, k), t in zip(items, plotting.reduce_traces(traces, max_points, gl_points)):
+        added[name][k] = t
+    return added
+
+
+def run_task(task):
+
+    func, outputs, max_points, gl_points = worker_args
+    size = {name: len(c) for name, c in outputs.items() if isinstance(c, list)}
+    before = {name: dict(c) for name, c in outputs.items() if isinstance(c, dict)}
+
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        ret = func(task)
+
+    # Everything the task appended or set, removed again so a worker running several tasks sends each item once
+    added = {}
+    for name, c in outputs.items():
+        if isinstance(c, list):
+            added[name] = c[size[name]:]
+            del c[size[name]:]
+        else:
+            added[name] = {k: v for k, v in c.items() if k not in before[name] or v is not before[name][k]}
+            c.clear()
+            c.update(before[name])
+    return {'added': compact(added, max_points, gl_points), 'stdout': out.getvalue(), 'return': ret}
+
+
+def cached_task(args):
+
+    task, path = args
+    res = run_task(task)
+    if path is not None:
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(res, f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    return res
+
+
+def run_all(func, tasks, outputs, inputs = None, labels = None, processes = None, cache_dir = None,
+            max_points = plotting.MAX_POINTS, gl_points = plotting.GL_POINTS):
+
+    # Returns the func return values in task order; outputs are extended/updated in place.
+    # inputs(task) -> files the task reads, labels(task) -> cache file name (default str(task))
+    global worker_args
+    tasks = list(tasks)
+    labels = [str(t) if labels is None else labels(t) for t in tasks]
+
+    # Reuse cached results whose inputs and code are unchanged
+    paths = [None] * len(tasks)
+    done = {}
+    if cache_dir is not None and inputs is not None:
+        os.makedirs(cache_dir, exist_ok = True)
+        code = code_hash() + repr((max_points, gl_points))
+        for k, task in enumerate(tasks):
+            paths[k] = cache_file(cache_dir, labels[k], task_key(code, labels[k], inputs(task)))
+            if os.path.isfile(paths[k]):
+                with open(paths[k], 'rb') as f:
+                    done[k] = pickle.load(f)
+            else:
+                # Drop results of older inputs/code for this run
+                for old in glob.glob(cache_file(cache_dir, labels[k], '*')):
+                    os.remove(old)
+
+    todo = [k for k in range(len(tasks)) if k not in done]
+    worker_args = (func, outputs, max_points, gl_points)
+    if processes is None:
+        processes = os.cpu_count()
+    processes = max(1, min(processes, len(todo)))
+
+    if processes > 1 and 'fork' in mp.get_all_start_methods():
+        pool = mp.get_context('fork').Pool(processes)
+        fresh = pool.imap(cached_task, [(tasks[k], paths[k]) for k in todo])
+    else:
+        pool = None
+        fresh = map(cached_task, [(tasks[k], paths[k]) for k in todo])
+
+    # Merge in task order as results arrive
+    returns = []
+    try:
+        for k in range(len(tasks)):
+            res = done[k] if k in done else next(fresh)
+            print(res['stdout'], end = '')
+            for name, new in res['added'].items():
+                if isinstance(outputs[name], list):
+                    outputs[name].extend(new)
+                else:
+                    outputs[name].update(new)
+            returns.append(res['return'])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return returns
@@ -0,0 +1,98 @@
+# Top-N Peak Index
+# Ice measure analysis tools
+
+# This module finds the N highest peaks of a series per calendar group (month, year or any label array), at least a
+# minimum spacing apart, for one run or a (runs, timesteps) stack. Each group only partially selects the
+# n * (2 * spacing - 1) largest timesteps (np.partition) plus any tied with the smallest of them, which always contain
+# the greedy non-overlapping top N, and picks the peaks from those candidates. Source arrays are never reordered or written to.
+#
+#   p = peak_index(cal, kw, n = 5, spacing_hr = 4)			# p['month']['idx'][month, k], p['year']['value'][0, k]
+#   p = peak_index(cal, rs['facility'], 5, 24)				# leading run axis: p['month']['idx'][run, month, k]
+#   c = compare_peaks(p['month'], rs['facility'], baseline = -1)		# every run at the baseline's peak timesteps
+#
+# Peaks are ordered high to low (ties go to the earlier timestep); groups with fewer than n peaks are padded with
+# index -1 and NaN values. Peaks within spacing timesteps of a higher peak in the same group are skipped.
+
+import numpy as np
+
+from calstats import month_groups
+
+
+def top_peaks(values, groups, n_groups, n = 5, spacing = 1, mask = None):
+
+    # values: (timesteps,) or (runs, timesteps); groups: label per timestep; spacing: minimum peak separation [timesteps]
+    values = np.asarray(values, dtype = np.float64)
+    single = values.ndim == 1
+    values = np.atleast_2d(values)
+    R, T = values.shape
+    spacing = max(int(spacing), 1)
+
+    t = np.arange(T)
+    if mask is not None:
+        t = t[np.asarray(mask, dtype = bool)]
+    labels = (np.arange(R)[:, None] * n_groups + groups[t]).ravel()
+    pos = np.tile(t, R)
+    v = values[:, t].ravel()
+    keep = ~np.isnan(v)
+    labels, pos, v = labels[keep], pos[keep], v[keep]
+
+    # Timesteps of each group, contiguous in one stable ordering
+    order = np.argsort(labels, kind = 'stable')
+    counts = np.bincount(labels, minlength = R * n_groups)
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+
+    idx = np.full((R * n_groups, n), -1, dtype = np.int64)
+    val = np.full((R * n_groups, n), np.nan)
+    k_max = n * (2 * spacing - 1)
+    for g in np.flatnonzero(counts):
+        sel = order[bounds[g]:bounds[g + 1]]
+        gv, gp = v[sel], pos[sel]
+        if len(sel) > k_max:
+            # Every timestep at least as high as the k_max-th value, so ties at the cut-off all stay candidates
+            c = np.flatnonzero(gv >= -np.partition(-gv, k_max - 1)[k_max - 1])
+        else:
+            c = np.arange(len(sel))
+
+        # Candidates high to low, earlier timestep first on ties; take the highest one not too close to a pick
+        c = c[np.lexsort((gp[c], -gv[c]))]
+        cp, cv = gp[c], gv[c]
+        alive = np.ones(len(c), dtype = bool)
+        for k in range(n):
+            j = np.argmax(alive)
+            if not alive[j]:
+                break
+            idx[g, k] = cp[j]
+            val[g, k] = cv[j]
+            alive &= np.abs(cp - cp[j]) >= spacing
+
+    idx = idx.reshape(R, n_groups, n)
+    val = val.reshape(R, n_groups, n)
+    if single:
+        return idx[0], val[0]
+    return idx, val
+
+
+def peak_index(cal, values, n = 5, spacing_hr = 0, mask = None):
+
+    # Top n peaks per month (12 groups, Jan = 0) and for the whole run period (1 group), spacing_hr apart
+    spacing = max(int(round(spacing_hr * cal.ts_per_hr)), 1)
+    periods = {'month': month_groups(cal), 'year': (np.zeros(len(cal), dtype = np.intp), 1)}
+
+    res = {}
+    for period, (groups, n_g) in periods.items():
+        idx, val = top_peaks(values, groups, n_g, n, spacing, mask)
+        safe = np.maximum(idx, 0)
+        tod = np.where(idx >= 0, cal.hour[safe] + cal.minute[safe] / 60, np.nan)
+        res[period] = {'idx': idx, 'value': val, 'tod': tod}
+    return res
+
+
+def compare_peaks(peaks, values, baseline = -1):
+
+    # Every run's value at the baseline run's peak timesteps; reduced = lower than the baseline peak
+    values = np.atleast_2d(np.asarray(values, dtype = np.float64))
+    idx = peaks['idx'][baseline]
+    base = peaks['value'][baseline]
+    at = np.where(idx >= 0, values[:, np.maximum(idx, 0)], np.nan)
+    delta = at - base
+    return {'idx': idx, 'baseline': base, 'value': at, 'delta': delta, 'reduced': delta < 0}
@@ -0,0 +1,128 @@
+# Plot Output Layer
+# Ice measure analysis tools
+
+# This module is a drop-in for plotly.offline.plot that keeps the HTML output of full-year (or 1-minute) runs small
+# enough to open. Line traces longer than max_points are reduced with largest-triangle-three-buckets (LTTB), which
+# keeps the first and last points and, per bucket, the point spanning the largest triangle with its neighbours - so
+# peaks, dips and ramps survive. Stacked area traces (stackgroup) are reduced together on the indices of their stack
+# total so the areas still add up. Traces still above gl_points are drawn with Scattergl (WebGL). plotly.js is written
+# once as plotly.min.js next to the HTML files and referenced from each one instead of being inlined.
+#
+#   plotting.plot(fig, filename = 'flex.html')								# defaults below
+#   plotting.plot(fig, filename = 'elec.html', max_points = None)			# full resolution, WebGL when large
+#   i = lttb(x, y, 2000)													# indices of the kept points
+#
+# Bar, heatmap and other non-scatter traces, and traces already within the budget, are written unchanged.
+
+import numpy as np
+import plotly
+import plotly.graph_objs as go
+
+MAX_POINTS = 5000		# Points kept per line trace (None = full resolution)
+GL_POINTS = 10000		# Traces with more points than this are drawn with Scattergl
+
+# Per-point trace properties that are thinned along with x and y
+POINT_PROPS = ['text', 'hovertext', 'customdata']
+
+
+def lttb(x, y, n):
+
+    # Indices of the n points kept by largest-triangle-three-buckets; x = None uses the point positions
+    y = np.asarray(y, dtype = np.float64)
+    N = len(y)
+    if n is None or n >= N or n < 3:
+        return np.arange(N)
+    x = np.arange(N, dtype = np.float64) if x is None else np.asarray(x, dtype = np.float64)
+
+    # n - 2 buckets over the points between the fixed first and last points
+    edges = np.linspace(1, N - 1, n - 1).astype(np.int64)
+    size = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / size
+    mean_y = np.add.reduceat(y, edges[:-1]) / size
+    mean_x = np.append(mean_x[1:], x[-1])		# average of the following bucket (last point for the final bucket)
+    mean_y = np.append(mean_y[1:], y[-1])
+
+    idx = np.empty(n, dtype = np.int64)
+    idx[0], idx[-1] = 0, N - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[i] - y[a]))
+        a = lo + int(np.argmax(np.where(np.isnan(area), -1, area)))
+        idx[i + 1] = a
+    return idx
+
+
+def x_values(x, n):
+
+    # Numeric x for the triangle areas - datetimes and categories fall back to point positions (uniform timesteps)
+    if x is None:
+        return None
+    x = np.asarray(x)
+    if len(x) < n or not np.issubdtype(x.dtype, np.number):
+        return None
+    return x[:n]		# plotly pairs the first n x values with y and ignores the rest
+
+
+def thin(trace, idx):
+
+    # Copy of a trace's properties keeping only the points at idx - per-point arrays longer than y (as plotly, extra
+    # points are not drawn) are cut at the same indices so they stay paired with y
+    props = trace.to_plotly_json()
+    n = len(props['y'])
+    for key in ['x', 'y'] + POINT_PROPS:
+        v = props.get(key)
+        if v is not None and not isinstance(v, str) and np.ndim(v) == 1 and len(v) >= n:
+            props[key] = np.asarray(v)[idx]
+    return props
+
+
+def reduce_traces(data, max_points = MAX_POINTS, gl_points = GL_POINTS):
+
+    traces = []
+    stacks = {}
+    for t in data:
+        if t.type != 'scatter' or t.y is None:
+            traces.append(t)
+            continue
+
+        if t.stackgroup is not None:
+            # Reduced with the rest of the stack below; Scattergl has no stackgroup support
+            stacks.setdefault(t.stackgroup, []).append(len(traces))
+            traces.append(t)
+            continue
+
+        n = len(t.y)
+        if max_points is not None and n > max_points:
+            props = thin(t, lttb(x_values(t.x, n), t.y, max_points))
+        else:
+            props = t.to_plotly_json()
+        props.pop('type', None)
+
+        if len(props['y']) > gl_points:
+            try:
+                traces.append(go.Scattergl(**props))
+                continue
+            except ValueError:
+                pass		# Property with no WebGL equivalent - keep the SVG trace
+        traces.append(go.Scatter(**props))
+
+    for members in stacks.values():
+        n = len(traces[members[0]].y)
+        if max_points is None or n <= max_points or any(len(traces[m].y) != n for m in members):
+            continue
+        total = np.sum([np.asarray(traces[m].y, dtype = np.float64) for m in members], axis = 0)
+        idx = lttb(x_values(traces[members[0]].x, n), total, max_points)
+        for m in members:
+            props = thin(traces[m], idx)
+            props.pop('type', None)
+            traces[m] = go.Scatter(**props)
+    return traces
+
+
+def plot(fig, filename = 'temp-plot.html', max_points = MAX_POINTS, gl_points = GL_POINTS, **kwargs):
+
+    # Same call as plotly.offline.plot; plotly.js goes to plotly.min.js in the output directory
+    fig = go.Figure(data = reduce_traces(fig.data, max_points, gl_points), layout = fig.layout)
+    kwargs.setdefault('include_plotlyjs', 'directory')
+    return plotly.offline.plot(fig, filename = filename, **kwargs)
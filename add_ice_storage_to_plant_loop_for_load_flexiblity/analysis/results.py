@@ -0,0 +1,108 @@
+# Result File Writers
+# Ice measure analysis tools
+
+# This module writes analysis results in bulk - whole arrays per call through buffered writers - as CSV text or
+# binary .npy, each with a small JSON manifest (same name, .json) describing the columns or axes, units and format.
+# Paths are given without an extension; the format picks it.
+#
+#   write_columns('elec_ice', {'SS47L15': kw1, 'SS48I': kw2}, units = 'kW', fmt = 'csv')	# equal-length columns
+#   write_array('avg_profiles_SS48I', cube, [('month', range(1, 13)), ('day_type', ['weekday', 'weekend']),
+#               ('hour', x_24)], units = 'kW', fmt = 'npy')									# N-d array, last axis as columns
+#   cols = read_columns('elec_ice')														# name -> array, either format
+#
+# CSV files are written with pandas (header row, full precision unless a float_format such as '%.2f' is given). .npy
+# files hold one 2-D float64 (rows, columns) array for write_columns, or the array itself for write_array; the manifest
+# gives the names. Use npy for bulk exports of many runs - it is a single buffered binary write per file.
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+FORMATS = ['csv', 'npy']
+BUFFER = 1 << 20
+
+
+def check_format(fmt):
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Result format must be one of {FORMATS}, not '{fmt}'.")
+
+
+def write_manifest(path, manifest):
+
+    with open(path + '.json', 'w') as f:
+        json.dump(manifest, f, indent = 1)
+
+
+def unit_list(units, names):
+
+    # One unit for every column, or a dict of name -> unit
+    if isinstance(units, dict):
+        return [units.get(n) for n in names]
+    return [units] * len(names)
+
+
+def write_columns(path, columns, units = None, fmt = 'csv', float_format = None, meta = None):
+
+    check_format(fmt)
+    names = [str(n) for n in columns.keys()]
+    data = [np.asarray(c) for c in columns.values()]
+    rows = len(data[0]) if data else 0
+    if any(len(c) != rows for c in data):
+        raise ValueError('All result columns must have the same length.')
+
+    file = path + '.' + fmt
+    if fmt == 'csv':
+        with open(file, 'w', buffering = BUFFER, newline = '') as f:
+            pd.DataFrame(dict(zip(names, data)), columns = names).to_csv(f, index = False, float_format = float_format)
+    else:
+        np.save(file, np.column_stack(data).astype(np.float64) if data else np.empty((0, 0)))
+
+    manifest = {'file': os.path.basename(file), 'format': fmt, 'rows': rows,
+                'columns': [{'name': n, 'unit': u, 'dtype': str(c.dtype)}
+                            for n, u, c in zip(names, unit_list(units, names), data)]}
+    if meta:
+        manifest.update(meta)
+    write_manifest(path, manifest)
+    return file
+
+
+def write_array(path, array, axes, units = None, fmt = 'csv', float_format = None, meta = None):
+
+    # axes: one (name, labels) pair per dimension; CSV rows are every combination of the leading axes
+    check_format(fmt)
+    array = np.asarray(array)
+    axes = [(name, list(labels)) for name, labels in axes]
+    if [len(labels) for _, labels in axes] != list(array.shape):
+        raise ValueError('Axis labels do not match the array shape.')
+
+    file = path + '.' + fmt
+    if fmt == 'csv':
+        index = pd.MultiIndex.from_product([labels for _, labels in axes[:-1]], names = [n for n, _ in axes[:-1]])
+        df = pd.DataFrame(array.reshape(-1, array.shape[-1]), index = index, columns = axes[-1][1])
+        with open(file, 'w', buffering = BUFFER, newline = '') as f:
+            df.to_csv(f, float_format = float_format)
+    else:
+        np.save(file, array)
+
+    manifest = {'file': os.path.basename(file), 'format': fmt, 'shape': list(array.shape), 'unit': units,
+                'dtype': str(array.dtype), 'axes': [{'name': n, 'labels': [str(x) for x in labels]} for n, labels in axes]}
+    if meta:
+        manifest.update(meta)
+    write_manifest(path, manifest)
+    return file
+
+
+def read_columns(path):
+
+    # Columns written by write_columns, as name -> array
+    with open(path + '.json') as f:
+        manifest = json.load(f)
+    names = [c['name'] for c in manifest['columns']]
+    file = os.path.join(os.path.dirname(path), manifest['file'])
+    if manifest['format'] == 'csv':
+        df = pd.read_csv(file)
+        return {n: df[n].to_numpy() for n in names}
+    data = np.load(file)
+    return {n: data[:, k] for k, n in enumerate(names)}
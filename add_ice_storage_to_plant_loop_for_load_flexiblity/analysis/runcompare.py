@@ -0,0 +1,123 @@
+# Run Comparison Engine
+# Ice measure analysis tools
+
+# This module loads the series shared by a set of runs (baseline and ice cases) once into a single float32
+# (series, runs, timesteps) matrix, after checking that every run reports the same run period and timestep. Deltas
+# against a chosen baseline run and the summary metrics of every run are then whole-matrix operations.
+#
+#   rs = RunSet.load(paths, default_series(chill_name))		# names default to the eso file names
+#   rs = RunSet.load(paths, series, names, load = store.load_eso)	# any esocache.load_eso drop-in (seriesstore)
+#   d = rs.delta('facility', baseline = -1)					# (runs, timesteps) run - baseline [kW]
+#   s = rs.summary(-1, peak = on_pk, occ = in_dchg & wkdy)	# dict of (runs,) arrays
+#
+# Series are given as name -> (selector, scale, energy), the selector being the usual (frequency, key, variable)
+# tuple and scale the factor to the reported unit; energy = True marks per-timestep energy outputs, which are also
+# multiplied by the run's ts_per_hr to give average power. The default set is facility, plant and chiller electric
+# power [kW] and the chiller cooling rate [tons].
+#
+# Summary metrics (baseline minus run, so a positive value is a reduction by the ice case):
+#   peak_reduction [kW, %] - annual peak facility demand, peak_window_reduction [kW] - peak demand inside peak
+#   energy_penalty [kWh, %] - added annual facility energy (run minus baseline)
+#   on_peak_shift [kWh] - facility energy moved out of the peak window, chiller_shift [kWh] - same for the chiller
+#   cooling_shift [ton-hours] - chiller cooling moved out of the occupied window
+
+import os
+import numpy as np
+
+from esocache import load_eso
+from rundata import J_TO_KWH, W_TO_TONS
+
+
+def default_series(chill_name):
+
+    return {'facility': (('TimeStep', None, 'Electricity:Facility'), J_TO_KWH, True),
+            'plant': (('TimeStep', None, 'Electricity:Plant'), J_TO_KWH, True),
+            'chiller': (('TimeStep', chill_name, 'Chiller Electric Energy'), J_TO_KWH, True),
+            'cooling': (('TimeStep', chill_name, 'Chiller Evaporator Cooling Rate'), W_TO_TONS, False)}
+
+
+def check_aligned(cal, ref, name):
+
+    # Same run period, timestep and calendar as the first run
+    if len(cal) != len(ref) or cal.ts_per_hr != ref.ts_per_hr:
+        raise ValueError(f'{name}: {len(cal)} timesteps at {cal.ts_per_hr}/hr does not match the first run '
+                         f'({len(ref)} timesteps at {ref.ts_per_hr}/hr).')
+    if not (np.array_equal(cal.month, ref.month) and np.array_equal(cal.day, ref.day)
+            and np.array_equal(cal.hour, ref.hour) and np.array_equal(cal.minute, ref.minute)):
+        raise ValueError(f'{name}: run period does not match the first run.')
+
+
+class RunSet:
+
+    def __init__(self, cal, names, series, values):
+        self.cal = cal
+        self.names = list(names)
+        self.series = list(series)
+        self.values = values			# float32 (series, runs, timesteps)
+
+    @classmethod
+    def load(cls, paths, series, names = None, dtype = np.float32, load = load_eso):
+
+        if names is None:
+            names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+        selectors = [s[0] for s in series.values()]
+        values = None
+        cal = None
+
+        for r, path in enumerate(paths):
+            dd, data = load(path, selectors)
+            if cal is None:
+                cal = dd.time
+                values = np.empty((len(series), len(paths), len(cal)), dtype = dtype)
+            else:
+                check_aligned(dd.time, cal, names[r])
+
+            for k, (selector, scale, energy) in enumerate(series.values()):
+                if energy:
+                    scale = scale * dd.time.ts_per_hr
+                np.multiply(data[dd.index[selector]], scale, out = values[k, r], casting = 'unsafe')
+
+        return cls(cal, names, series.keys(), values)
+
+    def __getitem__(self, name):
+        # (runs, timesteps) view of one series
+        return self.values[self.series.index(name)]
+
+    def delta(self, name, baseline = -1):
+        x = self[name]
+        return x - x[baseline]
+
+    def summary(self, baseline = -1, peak = None, occ = None):
+
+        # peak: on-peak timestep mask (facility demand and shift), occ: occupied mask (cooling shift)
+        n = self.values.shape[2]
+        w = 1 / self.cal.ts_per_hr
+        peak = np.ones(n, dtype = bool) if peak is None else np.asarray(peak, dtype = bool)
+        occ = peak if occ is None else np.asarray(occ, dtype = bool)
+
+        fac = self['facility']
+        pk = fac.max(axis = 1).astype(np.float64)
+        pk_win = fac[:, peak].max(axis = 1).astype(np.float64) if peak.any() else np.full(len(fac), np.nan)
+
+        # Energy totals of every series and run, all timesteps and inside the windows [kWh] (float64 accumulation)
+        total = self.values.sum(axis = 2, dtype = np.float64) * w
+        on_pk = self.values[:, :, peak].sum(axis = 2, dtype = np.float64) * w
+        in_occ = self.values[:, :, occ].sum(axis = 2, dtype = np.float64) * w
+
+        i_fac = self.series.index('facility')
+        res = {'peak_kw': pk,
+               'peak_reduction': pk[baseline] - pk,
+               'peak_reduction_pct': 100 * (pk[baseline] - pk) / pk[baseline],
+               'peak_window_kw': pk_win,
+               'peak_window_reduction': pk_win[baseline] - pk_win,
+               'energy_kwh': total[i_fac],
+               'energy_penalty': total[i_fac] - total[i_fac, baseline],
+               'energy_penalty_pct': 100 * (total[i_fac] - total[i_fac, baseline]) / total[i_fac, baseline],
+               'on_peak_shift': on_pk[i_fac, baseline] - on_pk[i_fac]}
+        if 'chiller' in self.series:
+            k = self.series.index('chiller')
+            res['chiller_shift'] = on_pk[k, baseline] - on_pk[k]
+        if 'cooling' in self.series:
+            k = self.series.index('cooling')
+            res['cooling_shift'] = in_occ[k, baseline] - in_occ[k]
+        return res
@@ -0,0 +1,112 @@
+# Unit-Aware Run Data
+# Ice measure analysis tools
+
+# This module wraps the columns of one loaded run (dd, data from esocache.load_eso or esoread.read_eso) in an
+# accessor that returns any variable in the requested unit. Conversions are vectorized, made on the first request and
+# memoized per (variable, unit). The reporting interval comes from the variable's frequency and, for TimeStep
+# variables, from the eso time records (dd.time), so 60, 15, 5 and 1 minute runs convert alike.
+#
+#   run = RunData(dd, data)											# or RunData.load(path, selectors)
+#   kw = run.get(('TimeStep', None, 'Electricity:Facility'), 'kW')		# J per timestep -> average kW
+#   kwh = run.get(('TimeStep', None, 'Electricity:Facility'), 'kWh')
+#   tons = run.get(key, 'tons')										# report code or selector
+#   run.get(key, 'F', source = 'C')									# variables reported without a unit ([])
+#   run.get(key)													# as reported
+#
+# Units: energy per reporting interval J, kWh, ton-hours, and rates W, kW, tons - each converts to the other group
+# over the reporting interval (e.g. J -> kW is the average power of the timestep) - and temperatures C, F.
+# The J and W factors are the ones the scripts have always used, applied in the same order, so the values are
+# unchanged. Converted arrays are shared between callers and read-only; copy one before changing it in place.
+
+import numpy as np
+
+from esocache import load_eso
+
+J_TO_KWH = 2.77778e-7		# J -> kWh
+W_TO_TONS = 0.0002843451	# W -> tons of refrigeration
+
+# Reporting intervals per hour of the sub-daily frequencies (TimeStep is read from the time records)
+PER_HR = {'Hourly': 1, 'Daily': 1 / 24}
+
+# (from, to) -> f(values, intervals per hour)
+CONVERSIONS = {
+    ('J', 'kWh'): lambda x, per_hr: x * J_TO_KWH,
+    ('J', 'kW'): lambda x, per_hr: x * J_TO_KWH * per_hr,
+    ('J', 'W'): lambda x, per_hr: x * J_TO_KWH * per_hr * 1000,
+    ('J', 'ton-hours'): lambda x, per_hr: x / 3600 * W_TO_TONS,
+    ('J', 'tons'): lambda x, per_hr: x / 3600 * W_TO_TONS * per_hr,
+    ('W', 'kW'): lambda x, per_hr: x / 1000,
+    ('W', 'tons'): lambda x, per_hr: x * W_TO_TONS,
+    ('W', 'J'): lambda x, per_hr: x * 3600 / per_hr,
+    ('W', 'kWh'): lambda x, per_hr: x / 1000 / per_hr,
+    ('W', 'ton-hours'): lambda x, per_hr: x * W_TO_TONS / per_hr,
+    ('C', 'F'): lambda x, per_hr: x * 9 / 5 + 32,
+}
+UNITS = sorted({u for pair in CONVERSIONS for u in pair})
+
+# Conversions that do not depend on the reporting interval
+FIXED = [('J', 'kWh'), ('J', 'ton-hours'), ('W', 'kW'), ('W', 'tons'), ('C', 'F')]
+
+
+class RunData:
+
+    def __init__(self, dd, data):
+        self.dd = dd
+        self.data = data
+        self.cal = dd.time
+        self.ts_per_hr = self.cal.ts_per_hr if self.cal is not None else None
+        self.cache = {}
+
+    @classmethod
+    def load(cls, path, selectors = None, **kwargs):
+        # Load through esocache - kwargs go to esocache.load_eso
+        return cls(*load_eso(path, selectors, **kwargs))
+
+    def code(self, key):
+        # Report code of a code or (frequency, key, variable) selector
+        if isinstance(key, tuple):
+            key = self.dd.index[key]
+        if key not in self.data:
+            raise KeyError(f'Variable {self.dd.variables[key][:3]} was not loaded - add it to the selectors.')
+        return key
+
+    def __contains__(self, key):
+        try:
+            self.code(key)
+        except KeyError:
+            return False
+        return True
+
+    def unit(self, key):
+        # Unit as reported in the data dictionary ('' when the eso has none)
+        return self.dd.variables[self.code(key)][3] or ''
+
+    def per_hr(self, code):
+        frequency = self.dd.variables[code][0]
+        if frequency == 'TimeStep':
+            if self.ts_per_hr is None:
+                raise ValueError(f'Converting TimeStep {self.dd.variables[code][2]} needs the eso time records to '
+                                 'find the timesteps per hour, but this run has none (dd.time is None).')
+            return self.ts_per_hr
+        if frequency not in PER_HR:
+            raise ValueError(f'{frequency} variables have no fixed reporting interval to convert over.')
+        return PER_HR[frequency]
+
+    def get(self, key, unit = None, source = None):
+
+        # Variable in unit (None = as reported); source overrides the reported unit
+        code = self.code(key)
+        source = source or self.unit(code)
+        if unit is None or unit == source:
+            return self.data[code]
+
+        memo = (code, unit, source)
+        if memo not in self.cache:
+            if (source, unit) not in CONVERSIONS:
+                raise ValueError(f"No conversion from '{source}' to '{unit}' ({self.dd.variables[code][2]}). "
+                                 f'Units: {UNITS}.')
+            per_hr = None if (source, unit) in FIXED else self.per_hr(code)
+            values = CONVERSIONS[source, unit](np.asarray(self.data[code], dtype = np.float64), per_hr)
+            values.flags.writeable = False
+            self.cache[memo] = values
+        return self.cache[memo]
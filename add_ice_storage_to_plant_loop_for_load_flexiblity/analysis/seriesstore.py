@@ -0,0 +1,231 @@
+# Shared Series Store
+# Ice measure analysis tools
+
+# This module publishes parsed ESO columns in multiprocessing.shared_memory blocks so several analyses of the same
+# runs (flex.py, the comparison scripts, their pool workers) read one in-memory copy instead of each loading its own.
+# A small registry block (<store>_registry) maps each column key to its block name, shape and dtype, plus the version
+# and time frequency of each published ESO; the data dictionary (JSON) and time records of an ESO are blocks of their
+# own. Readers attach to the blocks and get read-only NumPy views - nothing is copied or parsed.
+#
+#   store = SeriesStore.open('ctes')					# attach, or create if no process has published yet
+#   dd, data = store.load_eso(path, selectors)		# drop-in for esocache.load_eso: publishes misses, then views
+#   x = store.get('SS48I.eso:12345:...:7')			# any published key (store.keys() lists them)
+#   store.publish('derived:kw', kw)					# share derived arrays too
+#   SeriesStore.open('ctes').unlink()				# free every block when the session is done
+#
+# ESO columns are keyed on the file name, size and mtime, so a re-run simulation publishes fresh columns. Misses are
+# loaded through esocache (parse once, then memory-mapped .npy). Blocks outlive the process that published them
+# (they are not registered with the resource tracker) until unlink() is called or the machine restarts. Registry
+# updates are serialized with a lock file where fcntl is available; load_eso reads the registry once and publishes all
+# of its misses in one update.
+
+import os
+import json
+import struct
+import tempfile
+import contextlib
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+from esoread import DataDictionary, select_codes
+from esocache import load_eso
+from timeindex import TimeIndex
+
+REGISTRY_SIZE = 1 << 20		# bytes for the JSON registry
+HEADER = struct.Struct('<Q')	# registry length prefix
+
+# Blocks this process has attached, shared by every store object so views stay valid after the object is gone
+ATTACHED = {}
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def untrack(shm):
+
+    # Keep the block alive after this process exits - the resource tracker would otherwise unlink it
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except (AttributeError, KeyError):
+        pass
+
+
+class SeriesStore:
+
+    def __init__(self, name = 'ctes', create = False):
+        self.name = name
+        self.blocks = ATTACHED
+        self.lock_path = os.path.join(tempfile.gettempdir(), f'{name}_series_store.lock')
+        if create:
+            self.registry = shared_memory.SharedMemory(f'{name}_registry', create = True, size = REGISTRY_SIZE)
+            untrack(self.registry)
+            self.write_registry({'columns': {}, 'meta': {}})
+        else:
+            self.registry = shared_memory.SharedMemory(f'{name}_registry')
+            untrack(self.registry)
+
+    @classmethod
+    def open(cls, name = 'ctes'):
+        try:
+            return cls(name)
+        except FileNotFoundError:
+            try:
+                return cls(name, create = True)
+            except FileExistsError:
+                return cls(name)		# Another process created it in between
+
+    @contextlib.contextmanager
+    def locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read_registry(self):
+        n = HEADER.unpack_from(self.registry.buf, 0)[0]
+        return json.loads(bytes(self.registry.buf[HEADER.size:HEADER.size + n]).decode())
+
+    def write_registry(self, reg):
+        raw = json.dumps(reg).encode()
+        if HEADER.size + len(raw) > self.registry.size:
+            raise ValueError(f'Series store registry is full ({REGISTRY_SIZE} bytes).')
+        self.registry.buf[HEADER.size:HEADER.size + len(raw)] = raw
+        HEADER.pack_into(self.registry.buf, 0, len(raw))
+
+    def keys(self):
+        return list(self.read_registry()['columns'].keys())
+
+    def __contains__(self, key):
+        return key in self.read_registry()['columns']
+
+    def share(self, array):
+
+        # Copy array into a new shared block; returns its registry entry and the shared view
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+        untrack(shm)
+        view = np.ndarray(array.shape, dtype = array.dtype, buffer = shm.buf)
+        view[...] = array
+        self.blocks[shm.name] = shm
+        return [shm.name, list(array.shape), array.dtype.str], view
+
+    def register(self, entries, meta = None):
+
+        # Add column entries (and meta) in one registry update, freeing blocks replaced under the same keys
+        with self.locked():
+            reg = self.read_registry()
+            old = [reg['columns'][key][0] for key in entries if key in reg['columns']]
+            reg['columns'].update(entries)
+            reg['meta'].update(meta or {})
+            self.write_registry(reg)
+        for name in old:
+            self.release(name)
+        return reg
+
+    def publish(self, key, array, meta = None):
+
+        # Copy array into a new shared block (replacing an older block under the same key) and return the shared view
+        entry, view = self.share(array)
+        self.register({key: entry}, None if meta is None else {key: meta})
+        return view
+
+    def get(self, key):
+
+        # Read-only view of a published column (KeyError if it is not in the store)
+        return self.view(self.read_registry()['columns'][key])
+
+    def view(self, entry):
+
+        # Read-only view of the block of a registry entry [name, shape, dtype]
+        name, shape, dtype = entry
+        if name not in self.blocks:
+            shm = shared_memory.SharedMemory(name)
+            untrack(shm)
+            self.blocks[name] = shm
+        view = np.ndarray(tuple(shape), dtype = np.dtype(dtype), buffer = self.blocks[name].buf)
+        view.flags.writeable = False
+        return view
+
+    def meta(self, key):
+        return self.read_registry()['meta'].get(key)
+
+    def set_meta(self, key, meta):
+        with self.locked():
+            reg = self.read_registry()
+            reg['meta'][key] = meta
+            self.write_registry(reg)
+
+    def release(self, name, unlink = True):
+        shm = self.blocks.pop(name, None)
+        try:
+            if shm is None:
+                shm = shared_memory.SharedMemory(name)
+                untrack(shm)
+            if unlink:
+                # unlink() unregisters the block from the resource tracker - register it first to keep that balanced
+                resource_tracker.register(shm._name, 'shared_memory')
+                shm.unlink()
+            shm.close()
+        except (FileNotFoundError, BufferError):
+            pass		# Already freed, or views of it are still alive in this process (freed with the process)
+
+    def close(self):
+        # Detach this process from every block it attached (any store); the blocks stay published
+        for name in list(self.blocks):
+            self.release(name, unlink = False)
+
+    def unlink(self):
+        # Free every published block and the registry
+        with self.locked():
+            for name, _, _ in self.read_registry()['columns'].values():
+                self.release(name)
+            resource_tracker.register(self.registry._name, 'shared_memory')
+            self.registry.unlink()
+            self.registry.close()
+
+    def load_eso(self, path, selectors = None, processes = 1):
+
+        # Same return values as esocache.load_eso, with every column a view into shared memory
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        prefix = f'{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}'
+        reg = self.read_registry()
+        info = reg['meta'].get(prefix)
+
+        if info is None:
+            dd, data = load_eso(path, selectors, processes = processes)
+            info = {'version': dd.version, 'timestamp': dd.timestamp, 'time': None}
+            raw = json.dumps({str(id): v for id, v in dd.variables.items()}).encode()
+            data = dict(data, dd = np.frombuffer(raw, dtype = np.uint8))
+        else:
+            dd = DataDictionary(info['version'], info['timestamp'])
+            raw = bytes(self.view(reg['columns'][f'{prefix}:dd']))
+            dd.variables = {int(id): v for id, v in json.loads(raw.decode()).items()}
+            dd.build_index()
+            dd.ids = set(dd.variables.keys())
+            data = {}
+            missing = [c for c in select_codes(dd, selectors) if f'{prefix}:{c}' not in reg['columns']]
+            if missing:
+                parsed, data = load_eso(path, [tuple(dd.variables[c][:3]) for c in missing], processes = processes)
+                dd.time = parsed.time
+            elif info['time']:
+                dd.time = TimeIndex(self.view(reg['columns'][f'{prefix}:time']), info['time'])
+
+        # Publish what was just loaded in one registry update, then hand out shared views only
+        if dd.time is not None and info['time'] != dd.time.frequency:
+            data['time'] = dd.time.records
+            info = dict(info, time = dd.time.frequency)
+        if data:
+            entries = {f'{prefix}:{key}': self.share(col)[0] for key, col in data.items()}
+            reg = self.register(entries, {prefix: info})
+
+        if dd.time is None and info['time']:
+            dd.time = TimeIndex(self.view(reg['columns'][f'{prefix}:time']), info['time'])
+        return dd, {c: self.view(reg['columns'][f'{prefix}:{c}']) for c in select_codes(dd, selectors)}
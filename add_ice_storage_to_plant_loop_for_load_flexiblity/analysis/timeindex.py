@@ -0,0 +1,105 @@
+# ESO Timestep Index
+# Ice measure analysis tools
+
+# This module turns the report code 2 time records of an eso into a timestep index with precomputed calendar
+# arrays, so scripts build boolean masks once per run instead of calling Timestamp attributes at every timestep.
+#
+# Time record layout (one row per reported timestep, as collected by esoread.parse_data):
+#   [day of simulation, month, day of month, DST, hour (1-24), start minute, end minute, day type code]
+#
+# Calendar arrays follow the pandas conventions the scripts already use: hour 0-23 and minute are the start of the
+# timestep, dow is Monday = 0 ... Sunday = 6. Holidays and design days take their weekday from the day count.
+
+import numpy as np
+import pandas as pd
+
+DAY_TYPES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday',
+             'Holiday', 'SummerDesignDay', 'WinterDesignDay', 'CustomDay1', 'CustomDay2']
+DAY_TYPE_CODES = {d.encode(): i for i, d in enumerate(DAY_TYPES)}
+HOLIDAY = 7
+
+RECORD_FIELDS = 8
+
+
+def parse_time_record(line):
+
+    # '2,1, 1, 1, 0, 1, 0.00,15.00,Sunday' -> int16 row
+    f = line.split(b',')
+    return (int(f[1]), int(f[2]), int(f[3]), int(f[4]), int(f[5]), int(float(f[6])), int(float(f[7])),
+            DAY_TYPE_CODES.get(f[8].strip(), -1))
+
+
+class TimeIndex:
+
+    def __init__(self, records, frequency = 'TimeStep'):
+        records = np.asarray(records, dtype = np.int16).reshape(-1, RECORD_FIELDS)
+        self.records = records
+        self.frequency = frequency
+        self.day_of_sim = records[:, 0]
+        self.month = records[:, 1].astype(np.int8)
+        self.day = records[:, 2].astype(np.int8)
+        self.hour = (records[:, 4] - 1).astype(np.int8)
+        self.minute = records[:, 5].astype(np.int8)
+        self.end_minute = records[:, 6].astype(np.int8)
+        self.day_type = records[:, 7].astype(np.int8)
+        self.holiday = (self.day_type == HOLIDAY).astype(np.int8)
+
+        # Timestep length from the records [min] - the zone timestep is fixed for a run
+        if len(records):
+            self.ts_minutes = int(np.median(self.end_minute - self.minute))
+        else:
+            self.ts_minutes = 60
+        self.ts_per_hr = 60 // self.ts_minutes
+        self.ts_hours = self.ts_minutes / 60
+
+        self.leap = bool(np.any((self.month == 2) & (self.day == 29)))
+        self.day_of_year = self.calc_day_of_year()
+        self.dow = self.calc_dow()
+
+    def __len__(self):
+        return len(self.records)
+
+    def calc_day_of_year(self):
+        days = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30]
+        if self.leap:
+            days[2] = 29
+        first = np.cumsum(days).astype(np.int16)		# Day of year before the 1st of each month
+        return first[self.month - 1] + self.day
+
+    def calc_dow(self):
+        # Weekday day types map directly (Sunday = 0 in E+, 6 in pandas)
+        dow = np.where(self.day_type < 7, (self.day_type + 6) % 7, -1).astype(np.int8)
+
+        # Holidays and design days - count forward from the first weekday record
+        known = np.flatnonzero(dow >= 0)
+        if len(known) and len(known) < len(dow):
+            k = known[0]
+            other = dow < 0
+            offset = self.day_of_sim[other].astype(np.int32) - int(self.day_of_sim[k])
+            dow[other] = (int(dow[k]) + offset) % 7
+        return dow
+
+    def day_number(self):
+        # Consecutive day count from the first record (0-based) - use for per-day grouping across month/year ends
+        return (self.day_of_sim - self.day_of_sim[0]).astype(np.int32)
+
+    def timestamps(self, year = 2006):
+        # Start-of-timestep timestamps, matching the pd.date_range(..., freq = '15min') vectors the scripts used
+        base = np.datetime64(f'{year}-01-01', 'm')
+        minutes = ((self.day_of_year.astype(np.int64) - 1) * 24 + self.hour) * 60 + self.minute
+        return pd.DatetimeIndex((base + minutes.astype('timedelta64[m]')).astype('datetime64[ns]'))
+
+    def days(self, year = 2006):
+        # One timestamp per reported day (midnight), for daily bar and line plots
+        base = np.datetime64(f'{year}-01-01', 'D')
+        doy = self.day_of_year[np.r_[True, np.diff(self.day_of_sim) != 0]]
+        return pd.DatetimeIndex((base + (doy.astype(np.int64) - 1).astype('timedelta64[D]')).astype('datetime64[ns]'))
+
+    def hour_mask(self, start, end):
+        # start <= hour < end, wrapping past midnight when start > end (e.g. charge window [19, 7])
+        if start <= end:
+            return (self.hour >= start) & (self.hour < end)
+        return (self.hour >= start) | (self.hour < end)
+
+    def weekday_mask(self, weekend = (5, 6)):
+        return ~np.isin(self.dow, weekend)
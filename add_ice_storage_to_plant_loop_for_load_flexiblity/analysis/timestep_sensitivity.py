@@ -2,13 +2,16 @@
 # Karl Heine, 9/26/2019
 
 import os
-import esoreader
 import pandas as pd
 import numpy as np
 import plotly
 import plotly.graph_objs as go
 from plotly import subplots
 
+# External Functions
+from esocache import load_eso
+from rundata import RunData
+
 # Empty Trace Variables
 PWR_tr = []
 Chiller_tr = []
@@ -25,25 +28,35 @@ x_1 = pd.date_range(start = pd.datetime(2006,9,10,0), end = pd.datetime(2006,9,2
 # Define Filepath
 filepath = os.getcwd() + '/esos/'
 
+# Variables Required from the ESOs - (Frequency, Key, Variable)
+chill_name = '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON'
+selectors = [('TimeStep', chill_name, 'Chiller Electric Power'),
+			('TimeStep', chill_name, 'Chiller Evaporator Cooling Rate')]
+
+# Worker processes for parsing the 1-minute ESOs (chunked at timestep records)
+processes = os.cpu_count()
+
 ## Baseline Sets-------------------------------------------
 
 ## 60 Min Baseline-----------------------------
-dd, data = esoreader.read(filepath + 'SSB60_short.eso')
+dd, data = load_eso(filepath + 'SSB60_short.eso', selectors)
+run_data = RunData(dd, data)
 # Chiller Power
 key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Electric Power']
-vals = [j / 1000 for j in data[key]]
+vals = run_data.get(key, 'kW')
 Chiller_tr.append(go.Scatter(x = x_60, y = vals, name = 'B60 Chiller Power', legendgroup = 'B60'))
 
 # Chiller Cooling Rate
 key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Evaporator Cooling Rate']
-vals = [w * 0.0002843451 for w in data[key]]	#W to tons
+vals = run_data.get(key, 'tons')
 CRate_tr.append(go.Scatter(x = x_60, y = vals, name = 'B60 Chiller Cooing Rate', legendgroup = 'B60'))
 
 ## 1 Min Baseline---------------------------
 ## Facility Power
-dd, data = esoreader.read(filepath + 'SSB1_short.eso')
+dd, data = load_eso(filepath + 'SSB1_short.eso', selectors, processes = processes)
+run_data = RunData(dd, data)
 #key = dd.index['TimeStep', None, 'Electricity:Facility']
-#vals = [j * 2.77778e-7 * 60 for j in data[key]]
+#vals = run_data.get(key, 'kW')
 #PWR_tr.append(go.Scatter(x = x_1, y = vals, name = 'B1 Facility Power', legendgroup = 1))
 
 # Room Temp(s)
@@ -52,19 +65,20 @@ dd, data = esoreader.read(filepath + 'SSB1_short.eso')
 
 # Chiller Power
 key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Electric Power']
-vals = [j / 1000 for j in data[key]]
+vals = run_data.get(key, 'kW')
 Chiller_tr.append(go.Scatter(x = x_1, y = vals, name = 'B1 Chiller Power', legendgroup = 'B1'))
 
 # Chiller Cooling Rate
 key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Evaporator Cooling Rate']
-vals = [w * 0.0002843451 for w in data[key]]	#W to tons
+vals = run_data.get(key, 'tons')
 CRate_tr.append(go.Scatter(x = x_1, y = vals, name = 'B1 Chiller Cooing Rate', legendgroup = 'B1'))
 
 ## 1 Min w/Cap Baseline
 # Facility Power
-#dd, data = esoreader.read(filepath + 'SSB1CT_short.eso')
+#dd, data = load_eso(filepath + 'SSB1CT_short.eso', selectors, processes = processes)
+#run_data = RunData(dd, data)
 #key = dd.index['TimeStep', None, 'Electricity:Facility']
-#vals = [j * 2.77778e-7 * 60 for j in data[key]]
+#vals = run_data.get(key, 'kW')
 #PWR_tr.append(go.Scatter(x = x_1, y = vals, name = 'B1CT Facility Power', legendgroup = 2))
 
 # Room Temp(s)
@@ -73,7 +87,7 @@ CRate_tr.append(go.Scatter(x = x_1, y = vals, name = 'B1 Chiller Cooing Rate', l
 
 # Chiller Power
 #key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Electric Power']
-#vals = [j / 1000 for j in data[key]]
+#vals = run_data.get(key, 'kW')
 #Chiller_tr.append(go.Scatter(x = x_1, y = vals, name = 'B1CT Chiller Power', legendgroup = 2))
 
 print('Base Complete')
@@ -81,9 +95,10 @@ print('Base Complete')
 ## Ice Sets-----------------------------------------------------------
 ## 1 Min Ice
 # Facility Power
-dd, data = esoreader.read(filepath + 'SS47L1_short.eso')
+dd, data = load_eso(filepath + 'SS47L1_short.eso', selectors, processes = processes)
+run_data = RunData(dd, data)
 #key = dd.index['TimeStep', None, 'Electricity:Facility']
-#vals = [j * 2.77778e-7 * 60 for j in data[key]]
+#vals = run_data.get(key, 'kW')
 #PWR_tr.append(go.Scatter(x = x_1, y = vals, name = 'I1 Facility Power', legendgroup = 3))
 
 # Room Temp(s)
@@ -92,19 +107,20 @@ dd, data = esoreader.read(filepath + 'SS47L1_short.eso')
 
 # Chiller Power
 key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Electric Power']
-vals = [j / 1000 for j in data[key]]
+vals = run_data.get(key, 'kW')
 Chiller_tr.append(go.Scatter(x = x_1, y = vals, name = 'I1 Chiller Power', legendgroup = 'I1'))
 
 # Chiller Cooling Rate
 key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Evaporator Cooling Rate']
-vals = [w * 0.0002843451 for w in data[key]]	#W to tons
+vals = run_data.get(key, 'tons')
 CRate_tr.append(go.Scatter(x = x_1, y = vals, name = 'I1 Chiller Cooing Rate', legendgroup = 'I1'))
 
 ## 1 Min w/Cap Ice
 # Facility Power
-#dd, data = esoreader.read(filepath + 'SS47L1CT_short.eso')
+#dd, data = load_eso(filepath + 'SS47L1CT_short.eso', selectors, processes = processes)
+#run_data = RunData(dd, data)
 #key = dd.index['TimeStep', None, 'Electricity:Facility']
-#vals = [j * 2.77778e-7 * 60 for j in data[key]]
+#vals = run_data.get(key, 'kW')
 #PWR_tr.append(go.Scatter(x = x_1, y = vals, name = 'I1CT Facility Power', legendgroup = 4))
 
 # Room Temp(s)
@@ -113,7 +129,7 @@ CRate_tr.append(go.Scatter(x = x_1, y = vals, name = 'I1 Chiller Cooing Rate', l
 
 # Chiller Power
 #key = dd.index['TimeStep', '90.1-2010 AIRCOOLED WITHCONDENSER  CHILLER 0 456TONS 1.3KW/TON', 'Chiller Electric Power']
-#vals = [j / 1000 for j in data[key]]
+#vals = run_data.get(key, 'kW')
 #Chiller_tr.append(go.Scatter(x = x_1, y = vals, name = 'I1CT Chiller Power', legendgroup = 4))
 
 print('TES Complete')